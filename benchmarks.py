@@ -0,0 +1,643 @@
+"""Benchmark suite for read engines, the HTML renderer, exports and uploads
+
+    python benchmarks.py run [--suite read,render] [--sizes read=5000,20000] [--output results.json]
+    python benchmarks.py load [--concurrency 8] [--iterations 5] [--rows 20000] [--upload raw|base64] [--output load.json]
+    python benchmarks.py compare baseline.json results.json [--threshold 0.10]
+
+Every case is warmed up, then timed over several runs; results report the median
+and p95 wall time, the peak Python allocation (tracemalloc, from one extra run)
+and the peak resident memory growth while the timed runs execute. `compare`
+exits non-zero when a case's median got slower than the baseline's by more than
+the threshold.
+
+`load` drives the app in-process through httpx's ASGI transport: each virtual
+user uploads a generated workbook the way the browser does and exports it
+through /export_data, so request parsing, rendering, serialization and
+event-loop contention are all on the measured path. Uploads send the raw bytes
+to /upload_excel, or content-defined chunks through /upload/init, /upload/chunk
+and /upload/complete for files of 4 MiB or more; `--upload base64` replays the
+/load_excel compatibility route instead. It reports per-route throughput and
+p50/p95/p99 latency, the latency of an index page probe running alongside, and
+the server's RSS over time.
+"""
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+# Benchmarks must parse, not map sheets a previous run left in the server's parse cache
+os.environ.setdefault("PARSE_CACHE_DIR", tempfile.mkdtemp(prefix="lsp-light-bench-parse-cache-"))
+os.environ.setdefault("SCHEMA_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="lsp-light-bench-schemas-"), "schemas.json"))
+
+import httpx
+import numpy as np
+import polars as pl
+import xlsxwriter
+
+import main
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+WARMUP = 1
+REPEATS = 5
+
+# Differences below this are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.002
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where it cannot be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """Samples RSS on a background thread and keeps the peak, and optionally every sample"""
+
+    def __init__(self, interval=0.005, timeline=False):
+        self.interval = interval
+        self.start_bytes = rss_bytes()
+        self.peak_bytes = self.start_bytes
+        self.timeline = [] if timeline else None
+        self._started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def growth_bytes(self):
+        if self.start_bytes is None:
+            return None
+        return self.peak_bytes - self.start_bytes
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = rss_bytes()
+            if current is None:
+                continue
+            if current > self.peak_bytes:
+                self.peak_bytes = current
+            if self.timeline is not None:
+                self.timeline.append([round(time.perf_counter() - self._started, 3), current])
+
+
+def percentile(values, q):
+    """Linearly interpolated percentile of a small sample"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def measure(func, warmup=WARMUP, repeats=REPEATS):
+    """Warm up, time `repeats` runs of `func`, then trace one more run's Python allocations"""
+    for _ in range(warmup):
+        func()
+
+    times = []
+    with RssSampler() as sampler:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_python_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(times),
+        "p95_s": percentile(times, 0.95),
+        "min_s": min(times),
+        "repeats": repeats,
+        "peak_python_bytes": peak_python_bytes,
+        "peak_rss_growth_bytes": sampler.growth_bytes,
+    }
+
+
+def generate_dataset(num_rows, seed=0):
+    """Mixed-type dataset shaped like the sheets the viewer typically loads"""
+    rng = random.Random(seed)
+    cities = ["New York", "London", "Tokyo", "Paris", "Berlin", "Sydney"]
+    return pl.DataFrame({
+        "Name": [f"Speaker_{i:05d}" for i in range(num_rows)],
+        "Age": [rng.randint(18, 80) for _ in range(num_rows)],
+        "City": [rng.choice(cities) for _ in range(num_rows)],
+        "Salary": [rng.randint(30000, 150000) for _ in range(num_rows)],
+        "Email": [f"speaker{i}@company.com" for i in range(num_rows)],
+        "Notes": [None if i % 7 else "R&D <team>" for i in range(num_rows)],
+        "Hire_Date": [f"2020-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for _ in range(num_rows)],
+        "Score": [round(rng.uniform(1.0, 5.0), 2) for _ in range(num_rows)],
+        "Rating": [rng.random() for _ in range(num_rows)],
+        "Active": [rng.choice([True, False]) for _ in range(num_rows)],
+    })
+
+
+def workbook_bytes(df, num_sheets=1):
+    output = io.BytesIO()
+    with xlsxwriter.Workbook(output) as workbook:
+        for i in range(num_sheets):
+            df.write_excel(workbook, worksheet=f"Sheet {i}")
+    return output.getvalue()
+
+
+def legacy_polars_to_html_table(df):
+    """The previous row-by-row renderer, kept here as the render baseline"""
+    if df.is_empty():
+        return "<p>No data to display</p>"
+
+    html = ['<table style="border-collapse: collapse; width: 100%; max-width: 100%; overflow-x: auto;">']
+    html.append('<thead>')
+    html.append('<tr style="background-color: #f2f2f2;">')
+    for col in df.columns:
+        html.append(f'<th style="border: 1px solid #ddd; padding: 8px; text-align: left;">{col}</th>')
+    html.append('</tr>')
+    html.append('</thead>')
+    html.append('<tbody>')
+    for row in df.iter_rows():
+        html.append('<tr>')
+        for value in row:
+            display_value = "" if value is None else str(value)
+            html.append(f'<td style="border: 1px solid #ddd; padding: 8px;">{display_value}</td>')
+        html.append('</tr>')
+    html.append('</tbody>')
+    html.append('</table>')
+
+    return ''.join(html)
+
+
+# Each suite yields (case name, parameters, zero-argument callable); setup is not timed
+
+def read_suite(sizes):
+    """Parse an xlsx with each available engine, and through the engine-picking reader"""
+    for rows in sizes or [5_000, 20_000]:
+        source = workbook_bytes(generate_dataset(rows))
+        yield "read.auto", {"rows": rows}, lambda source=source: main.read_workbook(source)
+        for engine in main.READ_ENGINES['xlsx']:
+            yield f"read.{engine}", {"rows": rows}, \
+                lambda source=source, engine=engine: main.read_with_engine(source, engine)
+
+
+def render_suite(sizes):
+    """Render a whole table with the columnar renderer and the legacy row loop"""
+    for rows in sizes or [1_000, 10_000, 100_000]:
+        df = generate_dataset(rows)
+        yield "render.columnar", {"rows": rows}, lambda df=df: main.polars_to_html_table(df)
+        yield "render.legacy", {"rows": rows}, lambda df=df: legacy_polars_to_html_table(df)
+        yield "render.page", {"rows": rows}, lambda df=df: main.polars_to_html_rows(df.slice(0, main.PAGE_SIZE))
+
+
+def export_suite(sizes):
+    """Write each export format to a temporary file"""
+    directory = tempfile.mkdtemp(prefix="lsp-light-bench-exports-")
+    for rows in sizes or [5_000, 20_000]:
+        df = generate_dataset(rows)
+        for export_format, (extension, _, writer) in main.EXPORT_FORMATS.items():
+            path = os.path.join(directory, f"export.{extension}")
+            yield f"export.{export_format}", {"rows": rows}, \
+                lambda df=df, writer=writer, path=path: writer(df.lazy(), path, {})
+
+
+def upload_suite(sizes):
+    """Decode an upload: base64-in-JSON as /load_excel does, and raw chunks into an UploadBuffer"""
+    for size in sizes or [1024 * 1024, 16 * 1024 * 1024]:
+        payload = np.random.default_rng(0).bytes(size)
+        encoded = base64.b64encode(payload).decode()
+        body = json.dumps({"file_data": encoded, "file_name": "upload.xlsx"})
+        chunks = [payload[i:i + 64 * 1024] for i in range(0, size, 64 * 1024)]
+
+        def decode_base64(body=body):
+            file_bytes = base64.b64decode(json.loads(body)["file_data"])
+            hashlib.sha256(file_bytes).hexdigest()
+
+        def stream_raw(chunks=chunks):
+            with main.UploadBuffer(suffix=".xlsx") as upload:
+                for chunk in chunks:
+                    upload.write(chunk)
+                upload.sha256.hexdigest()
+
+        yield "upload.base64_json", {"bytes": size}, decode_base64
+        yield "upload.raw_stream", {"bytes": size}, stream_raw
+
+
+def sheets_suite(sizes):
+    """Parse every sheet of a workbook sequentially, and with the "all sheets" worker processes"""
+    main.sheet_process_pool().submit(int).result()  # spawn the workers before timing
+    df = generate_dataset(20_000)
+    for num_sheets in sizes or [1, 4, 16]:
+        source = workbook_bytes(df, num_sheets)
+
+        def sequential(source=source):
+            for sheet in main.list_sheets(source, 'xlsx'):
+                main.read_workbook(source, sheet_name=sheet["name"])
+
+        def parallel(source=source):
+            # A fresh content hash each run, so no sheet is served from the parse cache
+            workbook = main.Workbook(source, "bench.xlsx", uuid.uuid4().hex, main.list_sheets(source, 'xlsx'), 'xlsx')
+            try:
+                main.load_all_sheets(workbook)
+            finally:
+                workbook.close()
+
+        params = {"sheets": num_sheets, "rows_per_sheet": df.height, "processes": main.SHEET_PROCESSES}
+        yield "sheets.sequential", params, sequential
+        yield "sheets.parallel", params, parallel
+
+
+def profile_suite(sizes):
+    """Profile every column of a wide frame in one pass"""
+    for rows in sizes or [100_000, 1_000_000]:
+        rng = np.random.default_rng(0)
+        columns = {}
+        for i in range(50):
+            kind = i % 5
+            if kind == 0:
+                columns[f"int_{i}"] = rng.integers(0, 1000, rows)
+            elif kind == 1:
+                columns[f"float_{i}"] = rng.random(rows)
+            elif kind == 2:
+                columns[f"text_{i}"] = pl.Series(rng.integers(0, 5000, rows)).cast(pl.String)
+            elif kind == 3:
+                columns[f"flag_{i}"] = rng.random(rows) > 0.5
+            else:
+                columns[f"time_{i}"] = pl.datetime_range(
+                    pl.datetime(2020, 1, 1), pl.datetime(2020, 1, 1) + pl.duration(seconds=rows - 1),
+                    "1s", eager=True,
+                )
+        df = pl.DataFrame(columns)
+        # A fresh Dataset each run, so the profile kept on the dataset is not reused
+        yield "profile", {"rows": rows, "columns": df.width}, \
+            lambda df=df: main.dataset_profile(main.Dataset(df, None, "bench"))
+
+
+SUITES = {
+    "read": read_suite,
+    "render": render_suite,
+    "export": export_suite,
+    "upload": upload_suite,
+    "sheets": sheets_suite,
+    "profile": profile_suite,
+}
+
+
+def latency_summary(name, params, latencies, errors, elapsed):
+    """Result entry for one route, shaped like a suite result so `compare` can diff load runs"""
+    if not latencies:
+        return {"name": name, "params": params, "requests": 0, "errors": errors}
+    return {
+        "name": name,
+        "params": params,
+        "median_s": statistics.median(latencies),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+        "max_s": max(latencies),
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+    }
+
+
+# The browser's upload constants (see js_code in main.py)
+CHUNKED_UPLOAD_MIN_BYTES = 4 * 1024 * 1024
+CHUNK_MIN_BYTES = 16 * 1024
+CHUNK_MAX_BYTES = 256 * 1024
+CHUNK_BOUNDARY_MASK = 0xFFFF0000
+UPLOAD_CONCURRENCY = 4
+UPLOAD_RETRIES = 5
+
+
+def gear_table():
+    """The browser's fixed rolling hash table (xorshift32)"""
+    table = []
+    x = 0x9E3779B9
+    for _ in range(256):
+        x ^= (x << 13) & 0xFFFFFFFF
+        x ^= x >> 17
+        x ^= (x << 5) & 0xFFFFFFFF
+        table.append(x)
+    return table
+
+
+def chunk_boundaries(data):
+    """Chunk ends exactly as the browser's chunkBoundaries computes them"""
+    gear = gear_table()
+    ends = []
+    start = 0
+    rolling = 0
+    for i, byte in enumerate(data):
+        rolling = ((rolling << 1) + gear[byte]) & 0xFFFFFFFF
+        size = i + 1 - start
+        if (size >= CHUNK_MIN_BYTES and not rolling & CHUNK_BOUNDARY_MASK) or size >= CHUNK_MAX_BYTES:
+            ends.append(i + 1)
+            start = i + 1
+            rolling = 0
+    if start < len(data):
+        ends.append(len(data))
+    return ends
+
+
+def upload_payload(seed, data, mode, chunked_min_bytes):
+    """What one upload sends: the raw bytes, their chunks and manifest, or a /load_excel JSON body"""
+    file_name = f"load_{seed}.xlsx"
+    if mode == "base64":
+        body = json.dumps({"file_data": base64.b64encode(data).decode(), "file_name": file_name}).encode()
+        return {"file_name": file_name, "body": body}
+    payload = {"file_name": file_name, "body": data}
+    if len(data) >= chunked_min_bytes:
+        chunks = {}
+        start = 0
+        for end in chunk_boundaries(data):
+            chunks[hashlib.sha256(data[start:end]).hexdigest()] = data[start:end]
+            start = end
+        payload["chunks"] = chunks
+        payload["manifest"] = json.dumps({"chunks": list(chunks)}).encode()
+    return payload
+
+
+async def timed_post(http, records, route, url, retry=False, **kwargs):
+    """POST and record each attempt's latency under `route`; returns the last response and whether it was ok
+
+    With `retry`, 5xx answers are retried like the browser's postWithRetry, honouring Retry-After.
+    """
+    for attempt in range(UPLOAD_RETRIES + 1):
+        start = time.perf_counter()
+        response = await http.post(url, **kwargs)
+        ok = response.status_code == 200 and (
+            not response.headers["content-type"].startswith("application/json") or "error" not in response.json()
+        )
+        records[route].append((time.perf_counter() - start, ok))
+        if ok or not retry or response.status_code < 500 or attempt == UPLOAD_RETRIES:
+            return response, ok
+        await asyncio.sleep(float(response.headers.get("retry-after") or 0.5 * 2 ** attempt))
+
+
+async def upload_in_chunks(http, records, payload):
+    """Mirror the browser's uploadInChunks: send the chunks the server lacks, then complete"""
+    json_headers = {"Content-Type": "application/json"}
+    init, ok = await timed_post(http, records, "upload_init", "/upload/init", retry=True,
+                                content=payload["manifest"], headers=json_headers)
+    if not ok:
+        return False
+    missing = init.json()["missing"]
+    for _ in range(UPLOAD_RETRIES):
+        queue = list(dict.fromkeys(missing))
+
+        async def sender():
+            while queue:
+                chunk_hash = queue.pop()
+                await timed_post(http, records, "upload_chunk", f"/upload/chunk?hash={chunk_hash}", retry=True,
+                                 content=payload["chunks"][chunk_hash],
+                                 headers={"Content-Type": "application/octet-stream"})
+
+        await asyncio.gather(*(sender() for _ in range(UPLOAD_CONCURRENCY)))
+        response, ok = await timed_post(http, records, "upload_complete",
+                                        f"/upload/complete?file_name={payload['file_name']}&preview=1", retry=True,
+                                        content=payload["manifest"], headers=json_headers)
+        if response.status_code != 409:
+            return ok
+        # Chunks evicted (or refused) before the file was assembled: send them again
+        missing = response.json()["missing"]
+    return False
+
+
+async def upload(http, records, payload, mode):
+    """One upload through the route the browser (or, for base64, an older client) would use; True if it loaded"""
+    if mode == "base64":
+        _, ok = await timed_post(http, records, "load_excel", "/load_excel",
+                                 content=payload["body"], headers={"Content-Type": "application/json"})
+        return ok
+    if "chunks" in payload:
+        return await upload_in_chunks(http, records, payload)
+    _, ok = await timed_post(http, records, "upload_excel",
+                             f"/upload_excel?file_name={payload['file_name']}&preview=1", retry=True,
+                             content=payload["body"], headers={"Content-Type": "application/octet-stream"})
+    return ok
+
+
+async def virtual_user(user, args, payloads, records):
+    """Upload and export through the app's routes, `args.iterations` times, with its own session"""
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=None) as http:
+        for iteration in range(args.iterations):
+            payload = payloads[(user + iteration) % len(payloads)]
+            if not await upload(http, records, payload, args.upload):
+                continue
+            await timed_post(http, records, "export_data", "/export_data", json={"format": args.export_format})
+
+
+async def index_probe(done, interval, records):
+    """Time index page requests while the virtual users run, to expose event-loop stalls"""
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+        while not done.is_set():
+            start = time.perf_counter()
+            response = await http.get("/")
+            records["index"].append((time.perf_counter() - start, response.status_code == 200))
+            await asyncio.sleep(interval)
+
+
+async def drive_load(args, payloads):
+    records = collections.defaultdict(list)
+    done = asyncio.Event()
+    probe = asyncio.create_task(index_probe(done, args.probe_interval, records))
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(user, args, payloads, records) for user in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe
+    return records, elapsed
+
+
+def load(args):
+    # Distinct workbooks, so uploads beyond the first few are not all parse cache hits
+    payloads = [
+        upload_payload(seed, workbook_bytes(generate_dataset(args.rows, seed)), args.upload, args.chunked_min_bytes)
+        for seed in range(args.workbooks)
+    ]
+    how = f"in {len(payloads[0]['chunks'])} chunks" if "chunks" in payloads[0] else f"as {args.upload} bodies"
+    print(f"{args.concurrency} users x {args.iterations} iterations over {args.workbooks} workbook(s) "
+          f"of {args.rows:,} rows ({len(payloads[0]['body']) / 1024 / 1024:.1f} MB {how})", file=sys.stderr)
+
+    with RssSampler(interval=args.rss_interval, timeline=True) as sampler:
+        records, elapsed = asyncio.run(drive_load(args, payloads))
+
+    params = {
+        "rows": args.rows,
+        "concurrency": args.concurrency,
+        "iterations": args.iterations,
+        "export_format": args.export_format,
+        "upload": args.upload,
+    }
+    results = []
+    for route, samples in records.items():
+        latencies = [latency for latency, ok in samples if ok]
+        errors = sum(1 for _, ok in samples if not ok)
+        result = latency_summary(f"load.{route}", params, latencies, errors, elapsed)
+        results.append(result)
+        if latencies:
+            print(f"{route:<15} {len(latencies):>5} ok {errors:>4} err {result['throughput_rps']:>7.2f} req/s  "
+                  f"p50 {result['median_s']:7.3f}s  p95 {result['p95_s']:7.3f}s  p99 {result['p99_s']:7.3f}s",
+                  file=sys.stderr)
+    print(f"elapsed {elapsed:.2f}s, peak RSS growth {(sampler.growth_bytes or 0) / 1024 / 1024:.1f} MB",
+          file=sys.stderr)
+
+    write_report(args, results, {
+        "elapsed_s": elapsed,
+        "rss": {
+            "start_bytes": sampler.start_bytes,
+            "peak_bytes": sampler.peak_bytes,
+            "timeline": sampler.timeline,
+        },
+    })
+
+
+def write_report(args, results, extra=None):
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "polars": pl.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "worker_threads": main.WORKER_THREADS,
+            "warmup": getattr(args, "warmup", 0),
+        },
+        **(extra or {}),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def case_key(result):
+    return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+
+def run(args):
+    suites = args.suite.split(",") if args.suite else list(SUITES)
+    unknown = [suite for suite in suites if suite not in SUITES]
+    if unknown:
+        sys.exit(f"Unknown suite(s): {', '.join(unknown)}; choose from {', '.join(SUITES)}")
+    sizes = {}
+    for option in args.sizes:
+        suite, _, values = option.partition("=")
+        if suite not in SUITES or not values:
+            sys.exit(f"--sizes takes SUITE=N[,N...], e.g. read=5000,20000; got {option!r}")
+        sizes[suite] = [int(value) for value in values.split(",")]
+
+    results = []
+    for suite in suites:
+        for name, params, func in SUITES[suite](sizes.get(suite)):
+            result = {"name": name, "params": params, **measure(func, args.warmup, args.repeats)}
+            results.append(result)
+            print(f"{case_key(result):<60} median {result['median_s']:8.4f}s  p95 {result['p95_s']:8.4f}s",
+                  file=sys.stderr)
+
+    write_report(args, results)
+
+
+def compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = {case_key(result): result for result in json.load(f)["results"]}
+    with open(args.current, encoding='utf-8') as f:
+        current = {case_key(result): result for result in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"{'case':<60} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, result in current.items():
+        before = baseline.get(key)
+        if "median_s" not in result or (before is not None and "median_s" not in before):
+            continue  # a load route with no successful requests
+        if before is None:
+            print(f"{key:<60} {'-':>10} {result['median_s']:>9.4f}s {'new':>8}")
+            continue
+        ratio = result["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+        regressed = (ratio > 1 + args.threshold
+                     and result["median_s"] - before["median_s"] > MIN_REGRESSION_SECONDS)
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{key:<60} {before['median_s']:>9.4f}s {result['median_s']:>9.4f}s {ratio - 1:>+7.1%}{flag}")
+
+    if regressions:
+        sys.exit(f"{regressions} case(s) regressed by more than {args.threshold:.0%}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmark suites and emit JSON results")
+    run_parser.add_argument("--suite", help=f"comma-separated suites (default: all of {', '.join(SUITES)})")
+    run_parser.add_argument("--sizes", action="append", default=[], metavar="SUITE=N[,N...]",
+                            help="sizes overriding a suite's defaults (rows, bytes or sheets); repeatable")
+    run_parser.add_argument("--warmup", type=int, default=WARMUP)
+    run_parser.add_argument("--repeats", type=int, default=REPEATS)
+    run_parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    run_parser.set_defaults(handler=run)
+
+    load_parser = commands.add_parser("load", help="replay uploads and exports against the app at some concurrency")
+    load_parser.add_argument("--concurrency", type=int, default=8, help="virtual users, each with its own session")
+    load_parser.add_argument("--iterations", type=int, default=5, help="upload + export rounds per user")
+    load_parser.add_argument("--rows", type=int, default=20_000, help="rows per generated workbook")
+    load_parser.add_argument("--workbooks", type=int, default=4, help="distinct workbooks the users cycle through")
+    load_parser.add_argument("--upload", default="raw", choices=["raw", "base64"],
+                             help="raw bytes through /upload_excel and /upload/* like the browser (default), "
+                                  "or base64 JSON through /load_excel")
+    load_parser.add_argument("--chunked-min-bytes", type=int, default=CHUNKED_UPLOAD_MIN_BYTES,
+                             help="raw uploads of at least this size go in chunks (default: the browser's 4 MiB)")
+    load_parser.add_argument("--export-format", default="csv", choices=sorted(main.EXPORT_FORMATS))
+    load_parser.add_argument("--probe-interval", type=float, default=0.05,
+                             help="seconds between index page probes")
+    load_parser.add_argument("--rss-interval", type=float, default=0.25, help="seconds between RSS samples")
+    load_parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    load_parser.set_defaults(handler=load)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions against a stored baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="allowed slowdown of the median before flagging (default: 0.10)")
+    compare_parser.set_defaults(handler=compare)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.handler(args)
@@ -0,0 +1,55 @@
+import io
+import os
+import tempfile
+
+# Keep the parse and schema caches of test runs away from the server's, and fresh for every run
+os.environ.setdefault("PARSE_CACHE_DIR", tempfile.mkdtemp(prefix="lsp-light-test-parse-cache-"))
+os.environ.setdefault("SCHEMA_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="lsp-light-test-schemas-"), "schemas.json"))
+
+import httpx
+import polars as pl
+import pytest
+import xlsxwriter
+
+import main
+
+
+@pytest.fixture
+def client():
+    """Factory of in-process HTTP clients for the app; each client keeps its own session cookie"""
+    def make():
+        transport = httpx.ASGITransport(app=main.app)
+        return httpx.AsyncClient(transport=transport, base_url="http://testserver")
+    return make
+
+
+@pytest.fixture
+def workbook_bytes():
+    """Factory of xlsx file bytes: of a frame or a dict of columns, else of `rows` id/name/score rows
+
+    Keyword options go to DataFrame.write_excel, e.g. worksheet or position.
+    """
+    def make(data=None, rows=None, **options):
+        if data is None:
+            data = {
+                "id": range(rows),
+                "name": [f"Speaker_{i:05d}" for i in range(rows)],
+                "score": [i * 0.5 for i in range(rows)],
+            }
+        output = io.BytesIO()
+        pl.DataFrame(data).write_excel(output, **options)
+        return output.getvalue()
+    return make
+
+
+@pytest.fixture
+def sheets_workbook_bytes():
+    """Factory of xlsx file bytes with one sheet per row count, "Sheet 0" onwards, of id/sheet rows"""
+    def make(rows_per_sheet):
+        output = io.BytesIO()
+        with xlsxwriter.Workbook(output) as workbook:
+            for i, rows in enumerate(rows_per_sheet):
+                df = pl.DataFrame({"id": range(rows), "sheet": [f"Sheet {i}"] * rows})
+                df.write_excel(workbook, worksheet=f"Sheet {i}")
+        return output.getvalue()
+    return make
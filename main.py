@@ -2,21 +2,202 @@
 from fasthtml.common import *
 import uvicorn
 import polars as pl
-import io
+import xlsxwriter
+from watchfiles import awatch
+import asyncio
+import atexit
 import base64
+import datetime
+import decimal
+import hashlib
+import html
+import importlib.util
+import io
+import json
+import logging
+import math
+import multiprocessing
 import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import count
 from pathlib import Path
+from xml.etree import ElementTree
+
+import sheet_worker
+
+# Session cookies are signed with this key; without it FastHTML keeps one in ./.sesskey
+app, rt = fast_app(secret_key=os.environ.get("SESSION_SECRET_KEY"))
+
+# Uploads larger than this are spooled to a temporary file instead of memory
+UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get("UPLOAD_SPOOL_MAX_BYTES", 16 * 1024 * 1024))
+
+# Rolled-over uploads live here while their workbook is stored; removed on shutdown
+UPLOAD_DIR = tempfile.mkdtemp(prefix="lsp-light-uploads-")
+atexit.register(shutil.rmtree, UPLOAD_DIR, True)
+
+# Chunked uploads: the largest chunk accepted, and the disk kept for chunks so re-syncs
+# and interrupted uploads only send what the server does not already hold
+UPLOAD_CHUNK_MAX_BYTES = 4 * 1024 * 1024
+CHUNK_STORE_MAX_BYTES = int(os.environ.get("CHUNK_STORE_MAX_BYTES", 1024 * 1024 * 1024))
+CHUNK_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# Rows per page sent to the virtual-scrolling grid, and the most a client may ask for
+PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+# CPU-bound parse/export work runs in a bounded thread pool off the event loop.
+# Jobs beyond WORKER_QUEUE_LIMIT (running + waiting) are refused with 503/Retry-After.
+WORKER_THREADS = int(os.environ.get("WORKER_THREADS", min(8, os.cpu_count() or 4)))
+WORKER_QUEUE_LIMIT = int(os.environ.get("WORKER_QUEUE_LIMIT", 4 * WORKER_THREADS))
+WORKER_JOB_TIMEOUT = float(os.environ.get("WORKER_JOB_TIMEOUT", 300))
+WORKER_RETRY_AFTER = 5
+
+# Exported files are cached on disk per dataset version and streamed back in chunks
+EXPORT_CHUNK_BYTES = 1024 * 1024
+EXPORT_CACHE_DIR = os.environ.get("EXPORT_CACHE_DIR", tempfile.gettempdir())
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+# Parsed sheets are kept as Arrow IPC files across restarts, keyed by workbook content hash;
+# the directory is made private to the server's user, and refused if another user owns it
+PARSE_CACHE_DIR = os.environ.get("PARSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lsp-light-parse-cache"))
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", 4 * 1024 * 1024 * 1024))
+
+# Streaming xlsx exports: data rows per worksheet (Excel's 1,048,576 less the header) before
+# continuing on another sheet, and rows turned into Python values at a time
+XLSX_MAX_DATA_ROWS = 1_048_575
+XLSX_STREAM_BATCH_ROWS = 10_000
+
+# Column dtypes remembered per workbook file name and sheet (while its header stays the same),
+# plus dtypes users pinned; one JSON file, so recurring reports keep their dtypes across restarts.
+# Its directory is made private like the parse cache's.
+SCHEMA_CACHE_PATH = os.environ.get(
+    "SCHEMA_CACHE_PATH", os.path.join(tempfile.gettempdir(), "lsp-light-schemas", "schemas.json")
+)
+SCHEMA_CACHE_ENTRIES = int(os.environ.get("SCHEMA_CACHE_ENTRIES", 1024))
+
+# Dtypes that can be remembered or pinned, by the names the /schema API uses
+SCHEMA_DTYPES = {
+    "Int64": pl.Int64, "Float64": pl.Float64, "String": pl.String, "Boolean": pl.Boolean,
+    "Date": pl.Date, "Datetime": pl.Datetime("ms"), "Duration": pl.Duration("ms"),
+}
+
+# Formats built in the background right after a load, e.g. "csv,parquet" (off by default)
+EXPORT_PREBUILD_FORMATS = [f for f in os.environ.get("EXPORT_PREBUILD_FORMATS", "").split(",") if f]
+
+# Leading bytes of the containers spreadsheets come in, and the OpenDocument sheet mimetype
+ZIP_MAGIC = b"PK\x03\x04"
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ODS_MIMETYPE = b"application/vnd.oasis.opendocument.spreadsheet"
 
-app, rt = fast_app()
+# Namespaces of xlsx workbook.xml, and how much of each sheet XML to scan for <dimension>
+XLSX_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XLSX_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+SHEET_XML_PEEK_BYTES = 4096
 
-# Global variable to store the current data and file info
-current_data = None
-current_file_path = None
+# Built-in xlsx number formats that show a serial number as a date (no time of day) or a time,
+# and day 0 of the serials
+XLSX_DATE_FORMAT_IDS = frozenset(range(14, 18))
+XLSX_TIME_FORMAT_IDS = frozenset([*range(18, 23), 45, 46, 47])
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+# Parse the sheets either side of a selected sheet in the background
+PREFETCH_ADJACENT_SHEETS = os.environ.get("PREFETCH_ADJACENT_SHEETS", "1") == "1"
+
+# Loads that ask for a preview answer with the first PREVIEW_ROWS rows of an xlsx sheet and
+# parse the whole sheet in the background; /load_status holds a poll open this long for it
+PREVIEW_ROWS = int(os.environ.get("PREVIEW_ROWS", 1000))
+LOAD_STATUS_WAIT_SECONDS = float(os.environ.get("LOAD_STATUS_WAIT_SECONDS", 20))
+
+# Directories (os.pathsep-separated) whose workbooks clients may ask the server to watch;
+# watch mode is off unless set. Write bursts within WATCH_DEBOUNCE_MS count as one change.
+WATCH_ROOTS = [os.path.realpath(root) for root in os.environ.get("WATCH_ROOTS", "").split(os.pathsep) if root]
+WATCH_DEBOUNCE_MS = int(os.environ.get("WATCH_DEBOUNCE_MS", 500))
+WATCH_KEEPALIVE_SECONDS = 15
+
+# Worker processes that parse the sheets of an "all sheets" load in parallel
+SHEET_PROCESSES = int(os.environ.get("SHEET_PROCESSES", os.cpu_count() or 2))
+
+# Engines tried for each workbook format, fastest first, and the package each one needs
+READ_ENGINES = {
+    'xlsx': ['calamine', 'openpyxl'],
+    'xlsb': ['calamine'],
+    'xls': ['calamine', 'xlrd'],
+    'ods': ['calamine'],
+}
+ENGINE_MODULES = {'calamine': 'fastexcel', 'openpyxl': 'openpyxl', 'xlrd': 'xlrd'}
+
+# Sync patches larger than this are replaced by a full reload of the grid
+PATCH_MAX_ROWS = 10_000
+PATCH_MAX_CELLS = 50_000
+
+# Column names tried first when looking for a key to diff re-synced sheets by
+KEY_COLUMN_HINTS = ("id", "key", "code", "sku", "uuid")
+
+# Filtered/sorted views whose matching row positions are kept for paging, least-recently-used out
+QUERY_CACHE_ENTRIES = int(os.environ.get("QUERY_CACHE_ENTRIES", 64))
+
+# Column profiles: quantiles and histogram bins of numeric columns, top values of the others
+PROFILE_QUANTILES = (0.25, 0.5, 0.75)
+PROFILE_HISTOGRAM_BINS = 10
+PROFILE_TOP_VALUES = 5
+
+# Row-position column added to query plans; dataset columns may not use this name
+QUERY_ROW_INDEX = "__row_position"
+
+# Upper bounds (seconds) of the latency histograms served on /metrics
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Total estimated size of all sessions' datasets kept in memory before LRU eviction
+STORE_BUDGET_BYTES = int(os.environ.get("STORE_BUDGET_BYTES", 1024 * 1024 * 1024))
 
 # JavaScript for Excel file handling and sync functionality
 js_code = """
     let fileHandle; // This will store the handle to the opened Excel file
     let currentFileName = '';
+    let currentSheet = null; // sheet shown in the grid; other sheets are parsed when selected
+    let lastFingerprint = null; // size, mtime and SHA-256 of the last file the server parsed
+
+    // Virtual-scrolling grid state: only the pages around the viewport are in the DOM
+    const OVERSCAN_ROWS = 20;
+    let grid = null;
+    let diffKeyColumn = null; // optional column to match rows by when diffing a sync
+    let gridView = { sort: [], search: '' }; // server-side sort keys and search applied to the grid
+    let searchTimer = null;
+    let watchEvents = null; // EventSource pushing changes of a server-side file being watched
+
+    // Arrow transport: pages come as Arrow IPC and only the visible rows are drawn from them.
+    // The reader is imported on first use; without it the grid stays on HTML pages.
+    const ARROW_MODULE_URL = 'https://cdn.jsdelivr.net/npm/apache-arrow@17.0.0/+esm';
+    let arrowModule = null;
+
+    // Chunked uploads: content-defined chunks of 16 KiB to 256 KiB (64 KiB on average)
+    const CHUNKED_UPLOAD_MIN_BYTES = 4 * 1024 * 1024;
+    const CHUNK_MIN_BYTES = 16 * 1024;
+    const CHUNK_MAX_BYTES = 256 * 1024;
+    const CHUNK_BOUNDARY_MASK = 0xFFFF0000; // 16 bits that must be zero: 1 in 64 Ki positions
+    const UPLOAD_CONCURRENCY = 4;
+    const UPLOAD_RETRIES = 5;
+    const GEAR = (() => {
+        // Fixed pseudo-random byte table for the rolling hash (xorshift32)
+        const table = new Uint32Array(256);
+        let x = 0x9E3779B9;
+        for (let i = 0; i < 256; i++) {
+            x ^= x << 13;
+            x ^= x >>> 17;
+            x ^= x << 5;
+            table[i] = x >>> 0;
+        }
+        return table;
+    })();
 
     // Function to create and remove a popup dynamically
     function showTemporaryMessage(message, isError = false) {
@@ -53,13 +234,16 @@ js_code = """
                 types: [{
                     description: 'Excel files',
                     accept: {
-                        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx'],
-                        'application/vnd.ms-excel': ['.xls']
+                        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx', '.xlsm'],
+                        'application/vnd.ms-excel.sheet.binary.macroEnabled.12': ['.xlsb'],
+                        'application/vnd.ms-excel': ['.xls'],
+                        'application/vnd.oasis.opendocument.spreadsheet': ['.ods']
                     }
                 }]
             });
             
             if (fileHandle) {
+                stopWatching();
                 await loadExcelData();
             }
         } catch (err) {
@@ -70,7 +254,7 @@ js_code = """
         }
     }
 
-    async function loadExcelData() {
+    async function loadExcelData(isSync = false) {
         if (!fileHandle) {
             showTemporaryMessage('No file selected.', true);
             return;
@@ -80,21 +264,28 @@ js_code = """
             const file = await fileHandle.getFile();
             currentFileName = file.name;
             
-            // Convert file to base64 for sending to server
-            const arrayBuffer = await file.arrayBuffer();
-            const base64String = btoa(String.fromCharCode(...new Uint8Array(arrayBuffer)));
-            
-            // Send to server for processing
-            const response = await fetch('/load_excel', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    file_data: base64String,
-                    file_name: currentFileName
-                })
-            });
+            // Send the raw file bytes to the server; no base64/JSON wrapping.
+            // On sync the server may answer with a patch against the rows we already show.
+            let query = `file_name=${encodeURIComponent(currentFileName)}`;
+            if (isSync && grid) {
+                query += '&sync=1';
+                if (diffKeyColumn) query += `&key=${encodeURIComponent(diffKeyColumn)}`;
+            }
+            if (isSync && currentSheet) query += `&sheet=${encodeURIComponent(currentSheet)}`;
+            if (document.getElementById('all-sheets').checked) query += '&all_sheets=1';
+            if (await rowTransport() === 'arrow') query += '&transport=arrow';
+            query += '&preview=1'; // long sheets show their first rows while the rest is parsed
+
+            // Large files go in chunks, so a re-sync only sends the chunks that changed
+            const response = file.size >= CHUNKED_UPLOAD_MIN_BYTES
+                ? await uploadInChunks(file, query)
+                : await fetch(`/upload_excel?${query}`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                    },
+                    body: file
+                });
 
             const result = await response.json();
             
@@ -104,18 +295,14 @@ js_code = """
                     return;
                 }
                 
-                // Update UI
-                document.getElementById('data-container').innerHTML = result.html || 'No data received';
-                document.getElementById('sync-button').disabled = false;
-                document.getElementById('export-csv').disabled = false;
-                document.getElementById('export-excel').disabled = false;
-                document.getElementById('export-parquet').disabled = false;
-                
-                const rows = result.rows !== undefined ? result.rows : 'unknown';
-                const columns = result.columns !== undefined ? result.columns : 'unknown';
+                lastFingerprint = {
+                    size: file.size,
+                    last_modified: file.lastModified,
+                    sha256: result.content_hash
+                };
                 
-                document.getElementById('status').textContent = `Loaded: ${currentFileName} (${rows} rows, ${columns} columns)`;
-                showTemporaryMessage('Excel file loaded successfully!');
+                // Update UI
+                showLoadResult(result);
             } else {
                 showTemporaryMessage(result.error || 'Error loading file', true);
             }
@@ -125,14 +312,764 @@ js_code = """
         }
     }
 
+    // Chunk ends where a rolling hash of the last 32 bytes hits the mask, so an edit only
+    // changes the chunks around it: unchanged ZIP members of an xlsx chunk the same as before
+    function chunkBoundaries(bytes) {
+        const ends = [];
+        let start = 0;
+        let hash = 0;
+        for (let i = 0; i < bytes.length; i++) {
+            hash = ((hash << 1) + GEAR[bytes[i]]) >>> 0;
+            const size = i + 1 - start;
+            if ((size >= CHUNK_MIN_BYTES && (hash & CHUNK_BOUNDARY_MASK) === 0) || size >= CHUNK_MAX_BYTES) {
+                ends.push(i + 1);
+                start = i + 1;
+                hash = 0;
+            }
+        }
+        if (start < bytes.length) ends.push(bytes.length);
+        return ends;
+    }
+
+    function hexDigest(digest) {
+        return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+    // POST with retries: network errors and 5xx back off exponentially, honouring Retry-After
+    async function postWithRetry(url, options) {
+        for (let attempt = 0; ; attempt++) {
+            try {
+                const response = await fetch(url, { method: 'POST', ...options });
+                if (response.status < 500 || attempt >= UPLOAD_RETRIES) return response;
+                const retryAfter = Number(response.headers.get('Retry-After'));
+                await sleep(retryAfter ? retryAfter * 1000 : 500 * 2 ** attempt);
+            } catch (err) {
+                if (attempt >= UPLOAD_RETRIES) throw err;
+                await sleep(500 * 2 ** attempt);
+            }
+        }
+    }
+
+    async function sendChunks(chunks, bytes) {
+        const queue = [...chunks];
+        const sender = async () => {
+            while (queue.length) {
+                const chunk = queue.shift();
+                const response = await postWithRetry(`/upload/chunk?hash=${chunk.hash}`, {
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                    },
+                    body: bytes.subarray(chunk.start, chunk.end)
+                });
+                if (!response.ok) throw new Error(`Chunk upload failed (${response.status})`);
+            }
+        };
+        await Promise.all(Array.from({ length: UPLOAD_CONCURRENCY }, sender));
+    }
+
+    // Upload a file as content-addressed chunks, sending only those the server lacks.
+    // Resolves to the /upload/complete response, which matches /upload_excel's.
+    async function uploadInChunks(file, query) {
+        const bytes = new Uint8Array(await file.arrayBuffer());
+        const chunks = [];
+        let start = 0;
+        for (const end of chunkBoundaries(bytes)) {
+            const digest = await crypto.subtle.digest('SHA-256', bytes.subarray(start, end));
+            chunks.push({ hash: hexDigest(digest), start: start, end: end });
+            start = end;
+        }
+        const manifest = JSON.stringify({ chunks: chunks.map(chunk => chunk.hash) });
+        const jsonOptions = {
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: manifest
+        };
+
+        // Ask which chunks are missing; a resumed or re-synced upload skips the rest
+        const init = await postWithRetry('/upload/init', jsonOptions);
+        let missing = new Set((await init.json()).missing || []);
+        for (let attempt = 0; attempt < UPLOAD_RETRIES; attempt++) {
+            const toSend = new Map(chunks.filter(chunk => missing.has(chunk.hash)).map(chunk => [chunk.hash, chunk]));
+            await sendChunks([...toSend.values()], bytes);
+            const response = await postWithRetry(`/upload/complete?${query}`, jsonOptions);
+            if (response.status !== 409) return response;
+            // Chunks evicted before the file was assembled: send them again
+            missing = new Set((await response.json()).missing);
+        }
+        throw new Error('Upload could not be completed');
+    }
+
+    // Show a freshly loaded or synced dataset: a patch for the sheet on screen, else a new grid
+    function showLoadResult(result) {
+        if (result.patch && result.sheet === currentSheet) {
+            // Patch positions are in sheet order; a sorted or searched view is re-run instead
+            if (isGridViewActive()) {
+                runGridQuery();
+            } else {
+                applyGridPatch(result.patch);
+            }
+        } else {
+            renderGrid(result);
+        }
+        document.getElementById('sync-button').disabled = false;
+        document.getElementById('export-csv').disabled = false;
+        document.getElementById('export-excel').disabled = false;
+        document.getElementById('export-excel-fast').disabled = false;
+        document.getElementById('export-parquet').disabled = false;
+        document.getElementById('grid-search').disabled = false;
+        document.getElementById('profile-button').disabled = false;
+        document.getElementById('profile-container').style.display = 'none';
+
+        showSheet(result);
+        if (result.patch) {
+            const cells = result.patch.updated.length;
+            const inserted = result.patch.inserted.length;
+            const deleted = result.patch.deleted.length;
+            showTemporaryMessage(`Synced: ${cells} cells updated, ${inserted} rows added, ${deleted} rows removed`);
+        } else {
+            showTemporaryMessage('Excel file loaded successfully!');
+        }
+    }
+
+    function showSheet(result) {
+        currentSheet = result.sheet;
+
+        // Sheet picker: every sheet with its dimensions, parsed or not
+        const select = document.getElementById('sheet-select');
+        const sheets = result.sheets || [];
+        select.innerHTML = '';
+        for (const sheet of sheets) {
+            const option = document.createElement('option');
+            option.value = sheet.name;
+            const rows = sheet.rows ?? '?';
+            const columns = sheet.columns ?? '?';
+            option.textContent = `${sheet.name} (${rows} × ${columns})`;
+            option.selected = sheet.name === result.sheet;
+            select.appendChild(option);
+        }
+        select.style.display = sheets.length > 1 ? 'inline-block' : 'none';
+
+        const rows = result.rows !== undefined ? result.rows : 'unknown';
+        const columns = result.columns !== undefined ? result.columns : 'unknown';
+        const sheetLabel = sheets.length > 1 ? ` [${result.sheet}]` : '';
+        document.getElementById('status').textContent = `Loaded: ${currentFileName}${sheetLabel} (${rows} rows, ${columns} columns)`;
+        if (result.loading) {
+            // A preview: the sheet's row count in the workbook is an estimate until the full parse is in
+            const sheet = sheets.find(sheet => sheet.name === result.sheet);
+            const total = sheet && sheet.rows !== null ? `~${sheet.rows}` : 'all';
+            document.getElementById('status').textContent =
+                `Loading: ${currentFileName}${sheetLabel} (first ${rows} of ${total} rows, ${columns} columns)`;
+            awaitFullLoad(result.sheet, result.schema);
+        }
+    }
+
+    // Poll until the server has parsed the whole of a previewed sheet, then show all of it
+    async function awaitFullLoad(sheet, previewSchema) {
+        const current = grid;
+        try {
+            let result;
+            do {
+                const transport = await rowTransport();
+                const response = await fetch(`/load_status?sheet=${encodeURIComponent(sheet)}&transport=${transport}`);
+                result = await response.json();
+                if (grid !== current || currentSheet !== sheet) return; // another load replaced the preview
+                if (!response.ok || result.error) {
+                    showTemporaryMessage(result.error || 'Could not load the whole sheet', true);
+                    return;
+                }
+            } while (result.loading);
+
+            if (!current || JSON.stringify(result.schema) !== JSON.stringify(previewSchema)) {
+                // Other columns or dtypes than the preview's: headers, sort keys and formatters change too
+                renderGrid(result);
+            } else if (isGridViewActive()) {
+                runGridQuery(); // sorted and searched views already waited for the full sheet
+            } else {
+                // Keep the scroll position; pages are refetched, as cells may render differently
+                current.total = result.rows;
+                current.pages = new Map();
+                current.pending = new Set();
+                current.viewId++;
+                renderGridWindow();
+            }
+            showSheet(result);
+        } catch (err) {
+            console.error('Error waiting for the full sheet:', err);
+        }
+    }
+
+    async function selectSheet(name) {
+        try {
+            showTemporaryMessage(`Loading sheet ${name}...`);
+            const response = await fetch('/sheet', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ name: name, transport: await rowTransport() })
+            });
+            const result = await response.json();
+            if (!response.ok || result.error) {
+                showTemporaryMessage(result.error || 'Could not load sheet', true);
+                document.getElementById('sheet-select').value = currentSheet;
+                return;
+            }
+            renderGrid(result);
+            showSheet(result);
+            document.getElementById('profile-container').style.display = 'none';
+        } catch (err) {
+            console.error('Error selecting sheet:', err);
+            showTemporaryMessage('Could not load sheet.', true);
+        }
+    }
+
+    // Columns a re-sync can match rows by; "auto" leaves the choice to the server
+    function updateKeyPicker(schema) {
+        const select = document.getElementById('diff-key');
+        const names = (schema || []).map(column => column.name);
+        if (!names.includes(diffKeyColumn)) diffKeyColumn = null;
+        select.replaceChildren(
+            new Option('Match synced rows: auto', ''),
+            ...names.map(name => new Option(`Match synced rows by ${name}`, name))
+        );
+        select.value = diffKeyColumn || '';
+        select.style.display = names.length ? '' : 'none';
+    }
+
+    function renderGrid(result) {
+        const container = document.getElementById('data-container');
+        updateKeyPicker(result.schema);
+        container.onscroll = null;
+        grid = null;
+        gridView = { sort: [], search: '' };
+        document.getElementById('grid-search').value = '';
+        document.getElementById('match-count').textContent = '';
+
+        const arrow = result.transport === 'arrow';
+        if (arrow && result.rows) {
+            // No rows in the load response; the first page is fetched as Arrow like the rest
+            container.replaceChildren(arrowTableSkeleton(result.schema));
+        } else if (!result.html || !result.rows) {
+            container.innerHTML = result.html || (result.success ? 'No data to display' : 'No data received');
+            return;
+        } else {
+            // The first page arrives with the load response; later pages come from /rows
+            container.innerHTML = result.html;
+        }
+        const tbody = container.querySelector('tbody');
+        const firstRow = tbody.rows[0];
+        grid = {
+            sheet: result.sheet,
+            arrow: arrow,
+            total: result.rows,
+            pageSize: result.page_size,
+            rowHeight: firstRow ? firstRow.getBoundingClientRect().height || 35 : 35,
+            pages: arrow ? new Map() : new Map([[0, tbody.innerHTML]]),
+            pending: new Set(),
+            tbody: tbody,
+            frame: null,
+            firstPage: 0,
+            lastPage: 0,
+            rowOffset: 0,
+            columns: (result.schema || []).map(column => column.name),
+            viewId: 0
+        };
+        container.querySelectorAll('thead th').forEach((th, index) => {
+            th.onclick = (event) => toggleSort(grid.columns[index], event.shiftKey);
+        });
+        container.onscroll = scheduleGridRender;
+        renderGridWindow();
+    }
+
+    function isGridViewActive() {
+        return gridView.sort.length > 0 || gridView.search !== '';
+    }
+
+    // Click a header to sort by it (ascending, descending, off); shift-click to add a sort key
+    function toggleSort(column, addKey) {
+        const existing = gridView.sort.find(key => key.column === column);
+        const sort = addKey ? gridView.sort.filter(key => key.column !== column) : [];
+        if (!existing) {
+            sort.push({ column: column, descending: false });
+        } else if (!existing.descending) {
+            sort.push({ column: column, descending: true });
+        }
+        gridView.sort = sort;
+        runGridQuery();
+    }
+
+    function searchGrid(value) {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => {
+            gridView.search = value.trim();
+            runGridQuery();
+        }, 300);
+    }
+
+    // One page of the current view: { page, rows, total_rows } where page is HTML or Arrow columns
+    async function fetchGridRows(current, offset) {
+        const transport = current.arrow ? 'arrow' : 'html';
+        let response;
+        if (!isGridViewActive()) {
+            const sheet = encodeURIComponent(current.sheet);
+            response = await fetch(
+                `/rows?offset=${offset}&limit=${current.pageSize}&sheet=${sheet}&transport=${transport}`
+            );
+        } else {
+            response = await fetch('/query', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    sheet: current.sheet,
+                    sort: gridView.sort,
+                    search: gridView.search,
+                    offset: offset,
+                    limit: current.pageSize,
+                    transport: transport
+                })
+            });
+        }
+        if (!current.arrow || !response.ok
+                || !(response.headers.get('Content-Type') || '').startsWith('application/vnd.apache.arrow')) {
+            const result = await response.json();
+            return { ...result, page: result.html };
+        }
+        return {
+            page: arrowPage(arrowModule.tableFromIPC(await response.arrayBuffer())),
+            rows: Number(response.headers.get('X-Rows')),
+            total_rows: Number(response.headers.get('X-Total-Rows'))
+        };
+    }
+
+    // 'arrow' when the Arrow option is on and its reader could be loaded, else 'html'
+    async function rowTransport() {
+        if (!document.getElementById('arrow-transport').checked) return 'html';
+        if (!arrowModule) {
+            try {
+                arrowModule = await import(ARROW_MODULE_URL);
+            } catch (err) {
+                console.error('Could not load the Arrow reader:', err);
+                showTemporaryMessage('Arrow reader unavailable; showing HTML rows.', true);
+                document.getElementById('arrow-transport').checked = false;
+                return 'html';
+            }
+        }
+        return 'arrow';
+    }
+
+    function arrowTableSkeleton(schema) {
+        const table = document.createElement('table');
+        table.className = 'data-table';
+        const headerRow = table.createTHead().insertRow();
+        for (const column of schema) {
+            const th = document.createElement('th');
+            th.textContent = column.name;
+            headerRow.appendChild(th);
+        }
+        table.createTBody();
+        return table;
+    }
+
+    // Format cells the way the server's HTML pages do (Polars' string cast)
+    function arrowCellFormatter(type) {
+        const { DataType } = arrowModule;
+        if (DataType.isFloat(type)) {
+            return value => {
+                if (Number.isInteger(value) && Math.abs(value) < 1e16) return value.toFixed(1);
+                if (value === Infinity || value === -Infinity) return value > 0 ? 'inf' : '-inf';
+                return String(value);
+            };
+        }
+        if (DataType.isDate(type)) return value => arrowTimestampText(value, 0).slice(0, 10);
+        if (DataType.isTimestamp(type)) return value => arrowTimestampText(value, [0, 3, 6, 9][type.unit]);
+        return value => String(value);
+    }
+
+    function arrowTimestampText(value, fractionDigits) {
+        const millis = value instanceof Date ? value.getTime() : Number(value);
+        const iso = new Date(Math.floor(millis)).toISOString();
+        const text = `${iso.slice(0, 10)} ${iso.slice(11, 19)}`;
+        return fractionDigits ? `${text}.${(iso.slice(20, 23) + '000000').slice(0, fractionDigits)}` : text;
+    }
+
+    // Column vectors of one page with their formatters; cells are only formatted when drawn
+    function arrowPage(table) {
+        return {
+            length: table.numRows,
+            columns: table.schema.fields.map((field, index) => ({
+                vector: table.getChildAt(index),
+                format: arrowCellFormatter(field.type)
+            }))
+        };
+    }
+
+    function arrowRows(start, end) {
+        const fragment = document.createDocumentFragment();
+        for (let row = start; row < end; row++) {
+            const page = grid.pages.get(Math.floor(row / grid.pageSize));
+            const index = row % grid.pageSize;
+            if (index >= page.length) break;
+            const tr = document.createElement('tr');
+            for (const column of page.columns) {
+                const value = column.vector.get(index);
+                tr.insertCell().textContent = value === null || value === undefined ? '' : column.format(value);
+            }
+            fragment.appendChild(tr);
+        }
+        return fragment;
+    }
+
+    function spacerRow(rows) {
+        const tr = document.createElement('tr');
+        tr.style.height = `${rows * grid.rowHeight}px`;
+        return tr;
+    }
+
+    // Re-run the current view from the first page; later pages are fetched on scroll
+    async function runGridQuery() {
+        if (!grid) return;
+        const current = grid;
+        const view = ++current.viewId;
+        try {
+            const result = await fetchGridRows(current, 0);
+            if (result.error) {
+                showTemporaryMessage(result.error, true);
+                return;
+            }
+            if (grid !== current || current.viewId !== view) return; // superseded meanwhile
+            current.total = result.rows;
+            current.pages = new Map([[0, result.page]]);
+            current.pending = new Set();
+            document.getElementById('data-container').scrollTop = 0;
+
+            current.tbody.closest('table').querySelectorAll('thead th').forEach((th, index) => {
+                const sortKey = gridView.sort.find(key => key.column === current.columns[index]);
+                if (sortKey) {
+                    th.dataset.sort = sortKey.descending ? 'desc' : 'asc';
+                } else {
+                    delete th.dataset.sort;
+                }
+            });
+            document.getElementById('match-count').textContent =
+                gridView.search ? `${result.rows} of ${result.total_rows} rows match` : '';
+            renderGridWindow();
+        } catch (err) {
+            console.error('Error querying rows:', err);
+            showTemporaryMessage('Could not sort or search the data.', true);
+        }
+    }
+
+    function scheduleGridRender() {
+        if (grid && !grid.frame) {
+            grid.frame = requestAnimationFrame(() => {
+                grid.frame = null;
+                renderGridWindow();
+            });
+        }
+    }
+
+    function renderGridWindow() {
+        if (!grid) return;
+        const container = document.getElementById('data-container');
+        const firstVisible = Math.floor(container.scrollTop / grid.rowHeight);
+        const visibleCount = Math.ceil(container.clientHeight / grid.rowHeight);
+        const start = Math.max(0, firstVisible - OVERSCAN_ROWS);
+        const end = Math.min(grid.total, firstVisible + visibleCount + OVERSCAN_ROWS);
+        const firstPage = Math.floor(start / grid.pageSize);
+        const lastPage = Math.floor(Math.max(end - 1, 0) / grid.pageSize);
+
+        const missing = [];
+        for (let page = firstPage; page <= lastPage; page++) {
+            if (!grid.pages.has(page)) missing.push(page);
+        }
+        if (missing.length) {
+            missing.forEach(fetchGridPage);
+            return;
+        }
+
+        if (grid.arrow) {
+            // Only the visible rows (plus overscan) become DOM; pages stay as column vectors
+            const measure = grid.tbody.rows.length === 0;
+            grid.tbody.replaceChildren(
+                ...(start ? [spacerRow(start)] : []),
+                arrowRows(start, end),
+                ...(end < grid.total ? [spacerRow(grid.total - end)] : [])
+            );
+            const firstRow = grid.tbody.rows[start ? 1 : 0];
+            if (measure && firstRow) grid.rowHeight = firstRow.getBoundingClientRect().height || grid.rowHeight;
+            grid.firstPage = firstPage;
+            grid.lastPage = lastPage;
+            return;
+        }
+
+        // Spacer rows keep the scrollbar proportional to the full row count
+        const topRows = firstPage * grid.pageSize;
+        const bottomRows = Math.max(0, grid.total - (lastPage + 1) * grid.pageSize);
+        let html = topRows ? `<tr style="height: ${topRows * grid.rowHeight}px"></tr>` : '';
+        for (let page = firstPage; page <= lastPage; page++) {
+            html += grid.pages.get(page);
+        }
+        if (bottomRows) html += `<tr style="height: ${bottomRows * grid.rowHeight}px"></tr>`;
+        grid.tbody.innerHTML = html;
+        grid.firstPage = firstPage;
+        grid.lastPage = lastPage;
+        grid.rowOffset = topRows ? 1 : 0;
+    }
+
+    function applyGridPatch(patch) {
+        if (!grid) return;
+        const oldTotal = grid.total;
+
+        // Rows at and after the first insert/delete moved: drop those pages and refetch on demand
+        if (patch.shift_from !== null) {
+            const shiftPage = Math.floor(patch.shift_from / grid.pageSize);
+            for (const page of [...grid.pages.keys()]) {
+                if (page >= shiftPage) grid.pages.delete(page);
+            }
+        }
+
+        // Arrow pages are column vectors: drop the ones with changed cells and refetch them
+        if (grid.arrow) {
+            for (const [row] of patch.updated) grid.pages.delete(Math.floor(row / grid.pageSize));
+            grid.total = patch.rows;
+            renderGridWindow();
+            return;
+        }
+
+        // Update cells in place in rendered pages; cached off-screen pages are simply dropped
+        const touched = new Set();
+        for (const [row, col, html] of patch.updated) {
+            const page = Math.floor(row / grid.pageSize);
+            if (!grid.pages.has(page)) continue;
+            if (page < grid.firstPage || page > grid.lastPage) {
+                grid.pages.delete(page);
+                continue;
+            }
+            const tr = grid.tbody.rows[row - grid.firstPage * grid.pageSize + grid.rowOffset];
+            tr.cells[col].innerHTML = html;
+            touched.add(page);
+        }
+        for (const page of touched) {
+            const start = (page - grid.firstPage) * grid.pageSize + grid.rowOffset;
+            const count = Math.min(grid.pageSize, oldTotal - page * grid.pageSize);
+            const rows = Array.from(grid.tbody.rows).slice(start, start + count);
+            grid.pages.set(page, rows.map(tr => tr.outerHTML).join(''));
+        }
+
+        grid.total = patch.rows;
+        renderGridWindow();
+    }
+
+    async function fetchGridPage(page) {
+        if (grid.pending.has(page)) return;
+        const current = grid;
+        const view = current.viewId;
+        const pending = current.pending;
+        pending.add(page);
+        try {
+            const result = await fetchGridRows(current, page * current.pageSize);
+            if (result.error) {
+                showTemporaryMessage(result.error, true);
+                return;
+            }
+            // A newer load replaced the grid, or a new sort/search replaced its rows
+            if (grid !== current || current.viewId !== view) return;
+            current.pages.set(page, result.page);
+            renderGridWindow();
+        } catch (err) {
+            console.error('Error fetching rows:', err);
+        } finally {
+            pending.delete(page);
+        }
+    }
+
+    async function fileFingerprint(file) {
+        const fingerprint = { size: file.size, last_modified: file.lastModified };
+        // Only read and hash the file when its size or mtime moved since the last load
+        if (lastFingerprint && lastFingerprint.size === fingerprint.size
+                && lastFingerprint.last_modified === fingerprint.last_modified) {
+            fingerprint.sha256 = lastFingerprint.sha256;
+        } else {
+            const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+            fingerprint.sha256 = hexDigest(digest);
+        }
+        return fingerprint;
+    }
+
     async function syncData() {
+        if (watchEvents) {
+            await syncWatchedFile();
+            return;
+        }
         if (!fileHandle) {
             showTemporaryMessage('No file to sync with.', true);
             return;
         }
 
         showTemporaryMessage('Syncing data...');
-        await loadExcelData();
+        try {
+            // Ask the server whether it already holds this exact file before uploading it
+            const file = await fileHandle.getFile();
+            const fingerprint = await fileFingerprint(file);
+            const response = await fetch('/sync_check', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(fingerprint)
+            });
+            const result = await response.json();
+            if (result.unchanged) {
+                lastFingerprint = fingerprint;
+                showTemporaryMessage('Data is already up to date.');
+                return;
+            }
+        } catch (err) {
+            console.error('Sync check failed, reloading file:', err);
+        }
+        await loadExcelData(true);
+    }
+
+    // Watch mode: the server reads a workbook it can see directly and pushes changes over SSE
+    async function watchServerFile() {
+        const path = document.getElementById('watch-path').value.trim();
+        if (!path) {
+            showTemporaryMessage('Enter the path of a workbook on the server.', true);
+            return;
+        }
+        try {
+            const response = await fetch('/watch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ path: path })
+            });
+            const result = await response.json();
+            if (!response.ok || result.error) {
+                showTemporaryMessage(result.error || 'Could not watch the file', true);
+                return;
+            }
+            fileHandle = null;
+            lastFingerprint = null;
+            currentFileName = result.file_name;
+            showLoadResult(result);
+
+            stopWatching();
+            watchEvents = new EventSource('/events');
+            watchEvents.addEventListener('changed', syncWatchedFile);
+        } catch (err) {
+            console.error('Error watching file:', err);
+            showTemporaryMessage('Could not watch the file.', true);
+        }
+    }
+
+    function stopWatching() {
+        if (watchEvents) {
+            watchEvents.close();
+            watchEvents = null;
+        }
+    }
+
+    async function syncWatchedFile() {
+        try {
+            const response = await fetch('/watch/sync', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    sheet: currentSheet,
+                    key: diffKeyColumn,
+                    diff: grid !== null
+                })
+            });
+            const result = await response.json();
+            if (!response.ok || result.error) {
+                showTemporaryMessage(result.error || 'Could not reload the watched file', true);
+                return;
+            }
+            if (!result.unchanged) showLoadResult(result);
+        } catch (err) {
+            console.error('Error syncing watched file:', err);
+        }
+    }
+
+    function formatStat(value) {
+        if (value === undefined || value === null) return '';
+        return typeof value === 'number' && !Number.isInteger(value) ? value.toPrecision(4) : String(value);
+    }
+
+    // Histogram bars for numeric columns, the most frequent values for the rest
+    function profileDistribution(column) {
+        const cell = document.createElement('td');
+        if (column.histogram) {
+            const peak = Math.max(1, ...column.histogram.map(bin => bin.count));
+            for (const bin of column.histogram) {
+                const bar = document.createElement('span');
+                Object.assign(bar.style, {
+                    display: 'inline-block',
+                    width: '6px',
+                    marginRight: '1px',
+                    height: `${Math.max(1, Math.round(24 * bin.count / peak))}px`,
+                    backgroundColor: '#008CBA',
+                    verticalAlign: 'bottom'
+                });
+                bar.title = `≤ ${formatStat(bin.breakpoint)}: ${bin.count}`;
+                cell.appendChild(bar);
+            }
+        } else if (column.top_values) {
+            cell.textContent = column.top_values.map(top => `${top.value} (${top.count})`).join(', ');
+        }
+        return cell;
+    }
+
+    async function showProfile() {
+        const container = document.getElementById('profile-container');
+        if (container.style.display !== 'none') {
+            container.style.display = 'none';
+            return;
+        }
+        try {
+            const response = await fetch(`/profile?sheet=${encodeURIComponent(currentSheet)}`);
+            const result = await response.json();
+            if (!response.ok || result.error) {
+                showTemporaryMessage(result.error || 'Could not profile the data', true);
+                return;
+            }
+
+            const table = document.createElement('table');
+            table.className = 'data-table';
+            const header = table.createTHead().insertRow();
+            for (const label of ['Column', 'Type', 'Nulls', 'Distinct', 'Min', 'Max', 'Mean', 'Quartiles', 'Distribution']) {
+                const th = document.createElement('th');
+                th.textContent = label;
+                header.appendChild(th);
+            }
+            const body = table.createTBody();
+            for (const column of result.columns) {
+                const row = body.insertRow();
+                const quartiles = column.p25 !== undefined
+                    ? [column.p25, column.p50, column.p75].map(formatStat).join(' / ')
+                    : '';
+                for (const value of [column.name, column.dtype, column.nulls, column.distinct,
+                                     column.min, column.max, column.mean]) {
+                    row.insertCell().textContent = formatStat(value);
+                }
+                row.insertCell().textContent = quartiles;
+                row.appendChild(profileDistribution(column));
+            }
+            container.replaceChildren(table);
+            container.style.display = 'block';
+        } catch (err) {
+            console.error('Profile error:', err);
+            showTemporaryMessage('Could not profile the data.', true);
+        }
     }
 
     async function exportData(format) {
@@ -145,7 +1082,10 @@ js_code = """
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({
-                    format: format
+                    format: format,
+                    sheet: currentSheet,
+                    // Only the rows of the sorted/searched view, in its order
+                    ...(document.getElementById('export-view').checked ? gridView : {})
                 })
             });
 
@@ -185,170 +1125,2939 @@ js_code = """
 """
 
 
+# Table styling lives in one class instead of an inline style on every cell.
+# Rows of the virtual-scrolling grid must keep a fixed height for the scroll maths.
+table_css = """
+    .data-table { border-collapse: collapse; width: 100%; max-width: 100%; }
+    .data-table th, .data-table td { border: 1px solid #ddd; padding: 8px; white-space: nowrap; }
+    .data-table th { text-align: left; position: sticky; top: 0; background-color: #f2f2f2; cursor: pointer; }
+    .data-table th[data-sort="asc"]::after { content: " \\25B2"; }
+    .data-table th[data-sort="desc"]::after { content: " \\25BC"; }
+"""
+
+# Arrow IPC pages: the media type, and the body compressions a client may ask for. Browser
+# Arrow readers decode numbers, text, dates and booleans; other dtypes are sent as text.
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_COMPRESSIONS = ("uncompressed", "lz4", "zstd")
+ROW_TRANSPORTS = ("html", "arrow")
+
+# Characters escaped in cell values, applied in this order so '&' is not double-escaped
+HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"))
+
+
+def cell_text_expr(name, dtype):
+    """Polars expression rendering one column as (unescaped) cell text; nulls stay null"""
+    if isinstance(dtype, pl.Struct):
+        expr = pl.when(pl.col(name).is_not_null()).then(pl.col(name).struct.json_encode())
+    elif isinstance(dtype, pl.List):
+        items = pl.col(name).list.eval(pl.element().cast(pl.String)).list.join(", ")
+        expr = pl.format("[{}]", items)
+    elif dtype.is_nested() or dtype == pl.Object:
+        # No native string cast for these; fall back to the Python repr
+        expr = pl.col(name).map_elements(str, return_dtype=pl.String)
+    else:
+        expr = pl.col(name).cast(pl.String)
+    return expr
+
+
+def html_cell_expr(name, dtype):
+    """Polars expression rendering one column as escaped cell text"""
+    expr = cell_text_expr(name, dtype)
+    
+    # Numbers, booleans and dates can never contain markup characters
+    if not (dtype.is_numeric() or dtype.is_temporal() or dtype == pl.Boolean):
+        for char, entity in HTML_ESCAPES:
+            expr = expr.str.replace_all(char, entity, literal=True)
+    
+    return expr.fill_null("")
+
+
+def polars_to_html_rows(df):
+    """Convert Polars DataFrame rows to HTML table rows (no table or header markup)"""
+    if df.is_empty():
+        return ""
+    
+    # Build every cell column-wise, then join each row and all rows in a single pass
+    parts = [pl.lit("<tr><td>")]
+    for i, (name, dtype) in enumerate(df.schema.items()):
+        if i:
+            parts.append(pl.lit("</td><td>"))
+        parts.append(html_cell_expr(name, dtype))
+    parts.append(pl.lit("</td></tr>"))
+    
+    return df.select(pl.concat_str(parts).str.join("")).item()
+
+
 def polars_to_html_table(df):
     """Convert Polars DataFrame to HTML table"""
     if df.is_empty():
         return "<p>No data to display</p>"
     
-    # Start building HTML table
-    html = ['<table style="border-collapse: collapse; width: 100%; max-width: 100%; overflow-x: auto;">']
+    header = ''.join(f'<th>{html.escape(str(col))}</th>' for col in df.columns)
+    
+    return (
+        '<table class="data-table">'
+        f'<thead><tr>{header}</tr></thead>'
+        f'<tbody>{polars_to_html_rows(df)}</tbody>'
+        '</table>'
+    )
+
+
+def arrow_native(dtype):
+    """Whether browser Arrow readers decode this dtype; the rest is sent as cell text"""
+    return (dtype.is_integer() or dtype.is_float() or dtype in (pl.String, pl.Boolean, pl.Date, pl.Null)
+            or isinstance(dtype, (pl.Datetime, pl.Categorical, pl.Enum)))
+
+
+def arrow_ipc_bytes(df, compression="uncompressed"):
+    """A window of rows as one Arrow IPC stream: column buffers as they are, no per-cell formatting"""
+    text = [cell_text_expr(name, dtype).alias(name) for name, dtype in df.schema.items() if not arrow_native(dtype)]
+    if text:
+        df = df.with_columns(text)
+    
+    # The oldest compat level writes plain (large) strings, not the string views JS readers lack
+    output = io.BytesIO()
+    df.write_ipc_stream(output, compression=compression, compat_level=pl.CompatLevel.oldest())
+    return output.getvalue()
+
+
+def arrow_response(df, compression, **counts):
+    """Arrow IPC response for a window of rows; row counts travel in X-* headers"""
+    headers = {f"X-{name.replace('_', '-').title()}": str(value) for name, value in counts.items()}
+    return Response(arrow_ipc_bytes(df, compression), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
+
+
+def transport_error(transport, compression="uncompressed"):
+    """Error message for an unknown row transport or Arrow compression, else None"""
+    if transport not in ROW_TRANSPORTS:
+        return f"Unknown transport: {transport} (choose from {', '.join(ROW_TRANSPORTS)})"
+    if compression not in ARROW_COMPRESSIONS:
+        return f"Unknown compression: {compression} (choose from {', '.join(ARROW_COMPRESSIONS)})"
+    return None
+
+
+class UploadBuffer:
+    """Spooled upload body: kept in memory while small, rolled to a named temp file when large"""
+
+    def __init__(self, suffix='', max_size=None):
+        self.suffix = suffix
+        self.max_size = UPLOAD_SPOOL_MAX_BYTES if max_size is None else max_size
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self._file = None
+        self.path = None
+
+    def write(self, chunk):
+        if self._file is None and self.size + len(chunk) > self.max_size:
+            # Roll over to disk; Excel readers can then open the file by path
+            metrics.inc("lsp_upload_spills_total")
+            self._file = tempfile.NamedTemporaryFile(delete=False, suffix=self.suffix, dir=UPLOAD_DIR)
+            self.path = self._file.name
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+        self.size += len(chunk)
+        self.sha256.update(chunk)
+
+    def detach(self):
+        """Hand the upload over to the caller: its bytes, or the path of the rolled-over temp file
+        
+        The caller then owns that temp file; closing the buffer no longer deletes it.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            path, self.path = self.path, None
+            return path
+        data = self._buffer.getvalue()
+        self._buffer = None
+        return data
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self.path)
+            self._file = None
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Dataset:
+    """One parsed sheet of a session's workbook"""
+
+    def __init__(self, df, workbook, sheet_name, read_info=None):
+        self.df = df
+        self.workbook = workbook
+        self.sheet_name = sheet_name
+        self.read_info = read_info
+        self.version = next(dataset_versions)
+        self.size = df.estimated_size()
+        self.profile = None  # column profile, computed on the first /profile request
+
+    @property
+    def file_name(self):
+        return self.workbook.file_name
+
+    @property
+    def preview(self):
+        """True for the first rows of a sheet, standing in until its full parse is swapped in"""
+        return bool(self.read_info and self.read_info.get("preview"))
+
+
+class Workbook:
+    """An uploaded workbook held for one session
+    
+    Only sheet names and dimensions are read up front. Each sheet is parsed the
+    first time it is selected and then kept as a Dataset.
+    """
+
+    def __init__(self, source, file_name, content_hash, sheets, workbook_format=None, owner=None):
+        self.source = source  # bytes, the path of a temp file this workbook owns, or None once restored from cache
+        self.owner = owner  # session id whose pinned dtypes apply
+        self.file_name = file_name
+        self.content_hash = content_hash
+        self.sheets = sheets  # [{"name", "rows", "columns"}] in workbook order
+        self.format = workbook_format
+        self.active_sheet = sheets[0]["name"]
+        self.datasets = {}
+        self.loading = {}  # sheet name -> Future of the full parse replacing its preview
+        self._lock = threading.Lock()
+        self._sheet_locks = {}
+
+    @property
+    def size(self):
+        source_bytes = len(self.source) if isinstance(self.source, bytes) else 0
+        return source_bytes + sum(dataset.size for dataset in list(self.datasets.values()))
+
+    @property
+    def active(self):
+        return self.datasets.get(self.active_sheet)
+
+    def sheet_names(self):
+        return [sheet["name"] for sheet in self.sheets]
+
+    def sheet_lock(self, name):
+        with self._lock:
+            return self._sheet_locks.setdefault(name, threading.Lock())
+
+    def load_sheet(self, name):
+        """The Dataset for one sheet, parsing it on first use"""
+        # Concurrent requests for the same sheet share a single parse
+        with self.sheet_lock(name):
+            dataset = self.datasets.get(name)
+            if dataset is None:
+                df, read_info = self.read_sheet(name)
+                dataset = self._add_dataset(name, df, read_info)
+            return dataset
+
+    def read_sheet(self, name):
+        """Memory-map one sheet from the parse cache, or parse it and cache the result"""
+        cache_name = self.cache_name(name)
+        start = time.perf_counter()
+        df = parse_cache.load_sheet(self.content_hash, cache_name) if self.content_hash else None
+        if df is not None:
+            read_ms = round((time.perf_counter() - start) * 1000, 1)
+            return df, {"format": self.format, "engine": "ipc-cache", "parse_ms": read_ms,
+                        "fallbacks": [], "cached": True}
+        
+        if self.source is None:
+            raise WorkbookReadError("The workbook is no longer on the server. Please open the Excel file again.")
+        df, read_info = read_with_schema(self.source, self.file_name, name, self.owner)
+        if self.content_hash:
+            parse_cache.store_sheet(self.content_hash, cache_name, df)
+        return df, read_info
+
+    def preview_sheet(self, name):
+        """A Dataset of the first PREVIEW_ROWS rows of a sheet, or None where a preview gains nothing
+        
+        Only xlsx sheets can be read partway. A sheet already in the parse cache, or known
+        to be no longer than the preview, is quicker to load whole.
+        """
+        if PREVIEW_ROWS <= 0 or self.format != 'xlsx' or self.source is None:
+            return None
+        rows = next(sheet["rows"] for sheet in self.sheets if sheet["name"] == name)
+        if (rows is not None and rows <= PREVIEW_ROWS) or name in self.datasets \
+                or (self.content_hash and parse_cache.contains(self.content_hash, self.cache_name(name))):
+            return None
+        
+        start = time.perf_counter()
+        try:
+            df = read_xlsx_preview(self.source, name, PREVIEW_ROWS)
+        except Exception as e:
+            # A preview only saves time; anything it cannot read the engines still can
+            background_failure("preview", "Previewing sheet %r failed: %s", name, e)
+            return None
+        read_info = {"format": self.format, "engine": "preview", "fallbacks": [], "preview": True,
+                     "parse_ms": round((time.perf_counter() - start) * 1000, 1)}
+        with self.sheet_lock(name):
+            dataset = self.datasets.get(name)
+            if dataset is None:
+                dataset = self._add_dataset(name, df, read_info)
+            return dataset
+
+    def track_loading(self, name, future):
+        """Hold the background full parse of a previewed sheet, for requests to wait on, until it succeeds"""
+        self.loading[name] = future
+        
+        def finished(done):
+            # A failed load stays, so waiting requests get its error rather than the preview
+            if done.exception() is None and self.loading.get(name) is done:
+                del self.loading[name]
+        future.add_done_callback(finished)
+
+    def cache_name(self, name):
+        """The name a sheet is parse-cached under; pinned dtypes change what its parse holds"""
+        pinned = schema_cache.pinned(self.file_name, name, self.owner)
+        return f"{name}\x00{json.dumps(pinned, sort_keys=True)}" if pinned else name
+
+    def reload_sheet(self, name):
+        """Parse a sheet again, e.g. after its pinned dtypes changed, replacing its Dataset"""
+        with self.sheet_lock(name):
+            df, read_info = self.read_sheet(name)
+            previous = self.datasets.get(name)
+            dataset = self._add_dataset(name, df, read_info)
+        if previous is not None:
+            export_cache.invalidate(previous.version)
+            query_cache.invalidate(previous.version)
+        return dataset
+
+    def add_parsed_sheet(self, name, df, read_info):
+        """Keep a sheet parsed outside this workbook, unless it was parsed here meanwhile"""
+        with self.sheet_lock(name):
+            dataset = self.datasets.get(name)
+            if dataset is None:
+                dataset = self._add_dataset(name, df, read_info)
+            return dataset
+
+    def _add_dataset(self, name, df, read_info):
+        dataset = Dataset(df, self, name, read_info)
+        self.datasets[name] = dataset
+        record_parse(df, read_info)
+        
+        # Metadata dimensions are estimates; the parsed frame is exact, unless it is a preview
+        if dataset.preview:
+            return dataset
+        for sheet in self.sheets:
+            if sheet["name"] == name:
+                sheet.update(rows=df.height, columns=df.width)
+        return dataset
+
+    def source_path(self):
+        """The workbook's path on disk, writing in-memory bytes to a temp file the first time"""
+        with self._lock:
+            if isinstance(self.source, bytes):
+                metrics.inc("lsp_source_spills_total")
+                with tempfile.NamedTemporaryFile(
+                    dir=UPLOAD_DIR, suffix=Path(self.file_name).suffix, delete=False
+                ) as f:
+                    f.write(self.source)
+                self.source = f.name
+            return self.source
+
+    def close(self):
+        """Delete the temp file backing a large upload"""
+        if isinstance(self.source, str) and os.path.exists(self.source):
+            os.unlink(self.source)
+
+
+class DatasetStore:
+    """Session-keyed workbooks with least-recently-used eviction past a memory budget"""
+
+    def __init__(self, budget_bytes, on_discard=None):
+        self.budget_bytes = budget_bytes
+        self.on_discard = on_discard
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._datasets = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            workbook = self._datasets.get(key)
+            if workbook is None:
+                self.misses += 1
+                return None
+            self._datasets.move_to_end(key)
+            self.hits += 1
+            return workbook
+
+    def put(self, key, workbook):
+        discarded = []
+        with self._lock:
+            previous = self._datasets.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= self._sizes.pop(key)
+                discarded.append(previous)
+            self._datasets[key] = workbook
+            self._sizes[key] = workbook.size
+            self.total_bytes += self._sizes[key]
+            discarded.extend(self._evict())
+        self._discard(discarded)
+
+    def refresh(self, key):
+        """Re-measure a stored workbook after more of its sheets were parsed"""
+        with self._lock:
+            workbook = self._datasets.get(key)
+            if workbook is None:
+                return
+            self._datasets.move_to_end(key)
+            size = workbook.size
+            self.total_bytes += size - self._sizes[key]
+            self._sizes[key] = size
+            discarded = self._evict()
+        self._discard(discarded)
+
+    def _evict(self):
+        # Evict the oldest workbooks, but never the most recently used one
+        evicted = []
+        while self.total_bytes > self.budget_bytes and len(self._datasets) > 1:
+            key, workbook = self._datasets.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(key)
+            self.evictions += 1
+            evicted.append(workbook)
+        return evicted
+
+    def _discard(self, workbooks):
+        if self.on_discard is not None:
+            for workbook in workbooks:
+                self.on_discard(workbook)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "datasets": len(self._datasets),
+                "total_bytes": self.total_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class PoolSaturated(Exception):
+    """The worker pool queue is full"""
+
+
+class JobTimeout(Exception):
+    """A worker pool job ran past its deadline"""
+
+
+class WorkerPool:
+    """Bounded thread pool for blocking parse, render and export work
+    
+    Polars and the Excel engines release the GIL while they work, so threads give
+    real parallelism here and keep the event loop free for light requests.
+    """
+
+    def __init__(self, threads, queue_limit, timeout):
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.active = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="worker")
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue a job, or raise PoolSaturated when the queue is full"""
+        with self._lock:
+            if self.active >= self.queue_limit:
+                self.rejected += 1
+                raise PoolSaturated()
+            self.active += 1
+        
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a job in the pool and await its result, raising JobTimeout past the deadline"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            # A running thread cannot be interrupted; its queue slot frees when it finishes
+            with self._lock:
+                self.timeouts += 1
+            raise JobTimeout() from None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": self.active,
+                "queue_limit": self.queue_limit,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    def _release(self, future):
+        with self._lock:
+            self.active -= 1
+
+
+worker_pool = WorkerPool(WORKER_THREADS, WORKER_QUEUE_LIMIT, WORKER_JOB_TIMEOUT)
+
+
+def pool_error_response(error):
+    """503 with Retry-After when the worker pool is full, 504 when a job timed out"""
+    if isinstance(error, PoolSaturated):
+        return JSONResponse(
+            {"error": "The server is busy processing other files. Please retry shortly."},
+            status_code=503,
+            headers={"Retry-After": str(WORKER_RETRY_AFTER)}
+        )
+    return JSONResponse({"error": "Processing took too long and was abandoned."}, status_code=504)
+
+
+# Metric name -> (type, help) of everything served on /metrics
+METRICS = {
+    "lsp_requests_total": ("counter", "Requests handled, by route and status code"),
+    "lsp_request_seconds": ("histogram", "Time from handler start to response, by route"),
+    "lsp_stage_seconds": ("histogram", "Time spent in each stage of a request, by route and stage"),
+    "lsp_request_bytes_total": ("counter", "Request body bytes received, by route"),
+    "lsp_response_bytes_total": ("counter", "Response body bytes sent, by route"),
+    "lsp_sheets_parsed_total": ("counter", "Sheets loaded into datasets, by format and engine (ipc-cache: mapped from the parse cache)"),
+    "lsp_parse_seconds": ("histogram", "Time to parse or map one sheet, by format and engine"),
+    "lsp_rows_parsed_total": ("counter", "Rows of the sheets loaded into datasets"),
+    "lsp_columns_parsed_total": ("counter", "Columns of the sheets loaded into datasets"),
+    "lsp_engine_fallbacks_total": ("counter", "Engines skipped or failed before another parsed the sheet, by format and engine"),
+    "lsp_upload_spills_total": ("counter", "Uploads rolled over from memory to a temp file"),
+    "lsp_source_spills_total": ("counter", "In-memory workbooks written to a temp file for path-only readers"),
+    "lsp_background_failures_total": ("counter", "Failures in work no request waits on, by job"),
+}
+
+
+class Metrics:
+    """Process-wide counters and histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [count per bucket..., sum, count]
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+        
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{metric_labels(labels)} {value}")
+                continue
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, values):
+                    lines.append(f"{name}_bucket{metric_labels(labels + (('le', str(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{metric_labels(labels + (('le', '+Inf'),))} {values[-1]}")
+                lines.append(f"{name}_sum{metric_labels(labels)} {values[-2]}")
+                lines.append(f"{name}_count{metric_labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def metric_labels(labels):
+    """Prometheus label set, escaping backslashes, quotes and newlines in the values"""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+metrics = Metrics(METRICS_BUCKETS)
+logger = logging.getLogger("lsp")
+
+
+def background_failure(job, message, *args):
+    """Log a failure that no response reports, and count it on /metrics"""
+    logger.warning(message, *args)
+    metrics.inc("lsp_background_failures_total", job=job)
+
+
+class StageEntry:
+    """Handle yielded by StageTimer.stage for annotating the stage being timed"""
+    description = None
+
+
+class StageTimer:
+    """Wall time of the named stages of one request, for its Server-Timing header and /metrics
+    
+    Stages may run on worker threads while the handler awaits them; one request
+    never times two stages at once, so appends need no lock.
+    """
+
+    def __init__(self, route):
+        self.route = route
+        self.stages = []  # [(name, seconds, description)] in the order they finished
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the block as stage `name`; it may set `.description`, e.g. to the engine used"""
+        entry = StageEntry()
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            self.stages.append((name, time.perf_counter() - start, entry.description))
+
+    def header(self):
+        entries = []
+        for name, seconds, description in self.stages:
+            desc = f';desc="{description}"' if description else ""
+            entries.append(f"{name}{desc};dur={seconds * 1000:.1f}")
+        total = time.perf_counter() - self._start
+        return ", ".join(entries + [f"total;dur={total * 1000:.1f}"])
+
+    def record(self, status_code, bytes_in, bytes_out):
+        metrics.inc("lsp_requests_total", route=self.route, status=status_code)
+        metrics.observe("lsp_request_seconds", time.perf_counter() - self._start, route=self.route)
+        for name, seconds, _ in self.stages:
+            metrics.observe("lsp_stage_seconds", seconds, route=self.route, stage=name)
+        metrics.inc("lsp_request_bytes_total", bytes_in, route=self.route)
+        metrics.inc("lsp_response_bytes_total", bytes_out, route=self.route)
+
+
+def timed_response(timer, result, bytes_in=0):
+    """Encode a handler's result, adding its Server-Timing header and recording its metrics"""
+    if isinstance(result, Response):
+        response = result
+    else:
+        with timer.stage("encode"):
+            response = JSONResponse(result)
+    response.headers["Server-Timing"] = timer.header()
+    timer.record(response.status_code, bytes_in, int(response.headers.get("content-length", 0)))
+    return response
+
+
+def record_parse(df, read_info):
+    """Count one sheet loaded into a dataset, with the engine that read it and those that failed first"""
+    if read_info is None:
+        return
+    workbook_format = read_info.get("format") or "unknown"
+    engine = read_info.get("engine") or "unknown"
+    metrics.inc("lsp_sheets_parsed_total", format=workbook_format, engine=engine)
+    metrics.inc("lsp_rows_parsed_total", df.height)
+    metrics.inc("lsp_columns_parsed_total", df.width)
+    if read_info.get("parse_ms") is not None:
+        metrics.observe("lsp_parse_seconds", read_info["parse_ms"] / 1000, format=workbook_format, engine=engine)
+    for fallback in read_info.get("fallbacks", []):
+        metrics.inc("lsp_engine_fallbacks_total", format=workbook_format, engine=fallback["engine"])
+
+
+class ExportCache:
+    """Exported files on local disk, keyed by dataset version, format and options
+    
+    Files are evicted least-recently-used once their total size passes `max_bytes`.
+    Callers get an open handle, so a file evicted mid-download still streams to the end.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.directory = tempfile.mkdtemp(prefix="lsp-light-exports-", dir=root)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (path, size)
+        self._building = {}  # key -> lock held while that artifact is written
+        self._lock = threading.Lock()
+        atexit.register(shutil.rmtree, self.directory, True)
+
+    def open(self, key, write):
+        """Open the cached artifact for `key`, calling `write(path)` to build it on a miss"""
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        
+        # One builder per key; concurrent requests for the same export wait for it
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return open(entry[0], 'rb')
+                self.misses += 1
+            
+            version, export_format, options = key
+            options_hash = hashlib.sha1(options.encode()).hexdigest()[:12]
+            path = os.path.join(self.directory, f"{version}-{export_format}-{options_hash}")
+            partial = f"{path}.{uuid.uuid4().hex}.partial"
+            try:
+                write(partial)
+                os.replace(partial, path)
+                handle = open(path, 'rb')
+                with self._lock:
+                    size = os.fstat(handle.fileno()).st_size
+                    self.total_bytes += size - self._entries.pop(key, (path, 0))[1]
+                    self._entries[key] = (path, size)
+                    self._evict()
+                return handle
+            finally:
+                # Only once the entry is registered may a later request take a fresh build lock
+                with self._lock:
+                    self._building.pop(key, None)
+                if os.path.exists(partial):
+                    os.unlink(partial)
+
+    def invalidate(self, version):
+        """Drop every artifact built from one dataset version"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == version]:
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        path, size = self._entries.pop(key)
+        self.total_bytes -= size
+        os.unlink(path)
+
+
+def private_directory(path):
+    """Create `path` (mode 0700) or tighten an existing one, refusing a directory another user owns"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise PermissionError(f"{path} belongs to another user; point the cache at a directory of your own")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+class ParseCache:
+    """Parsed sheets persisted as Arrow IPC files, keyed by workbook content hash and sheet name
+    
+    The directory outlives the process, so re-opening a file, restarting the server
+    or restoring an evicted session memory-maps the cached sheet instead of parsing
+    Excel again. A small JSON manifest per workbook records its name and sheet list.
+    The least recently used files are swept once their total size passes `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes):
+        private_directory(directory)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # file name -> size, least recently used first
+        self._lock = threading.Lock()
+        
+        # Pick up what earlier runs left, oldest use first; leftover partial writes are dropped
+        entries = sorted(os.scandir(directory), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if entry.name.endswith('.partial'):
+                os.unlink(entry.path)
+            elif entry.name.endswith(('.arrow', '.json')):
+                self._entries[entry.name] = entry.stat().st_size
+                self.total_bytes += entry.stat().st_size
+        with self._lock:
+            self._evict()
+
+    def sheet_file(self, content_hash, sheet_name):
+        return f"{content_hash}-{hashlib.sha1(sheet_name.encode()).hexdigest()[:16]}.arrow"
+
+    def partial_path(self, content_hash, sheet_name):
+        """A unique path to write a sheet to before handing it over with `adopt`"""
+        name = self.sheet_file(content_hash, sheet_name)
+        return os.path.join(self.directory, f"{name}.{uuid.uuid4().hex}.partial")
+
+    def contains(self, content_hash, sheet_name):
+        with self._lock:
+            return self.sheet_file(content_hash, sheet_name) in self._entries
+
+    def load_sheet(self, content_hash, sheet_name):
+        """The cached sheet as a memory-mapped DataFrame, or None"""
+        path = self._use(self.sheet_file(content_hash, sheet_name))
+        if path is None:
+            return None
+        try:
+            return pl.read_ipc(path, memory_map=True)
+        except Exception as e:
+            background_failure("parse-cache-read", "Dropping unreadable cached sheet %s: %s", path, e)
+            self._forget(os.path.basename(path))
+            return None
+
+    def store_sheet(self, content_hash, sheet_name, df):
+        partial = self.partial_path(content_hash, sheet_name)
+        try:
+            df.write_ipc(partial)
+        except OSError as e:
+            background_failure("parse-cache-write", "Could not cache parsed sheet %r: %s", sheet_name, e)
+            if os.path.exists(partial):
+                os.unlink(partial)
+            return
+        self.adopt(content_hash, sheet_name, partial)
+
+    def adopt(self, content_hash, sheet_name, partial):
+        """Move a finished IPC file into the cache and return its cached path"""
+        return self._add(self.sheet_file(content_hash, sheet_name), partial)
+
+    def load_manifest(self, content_hash):
+        path = self._use(f"{content_hash}.json")
+        if path is None:
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def store_manifest(self, content_hash, manifest):
+        partial = os.path.join(self.directory, f"{content_hash}.json.{uuid.uuid4().hex}.partial")
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        self._add(f"{content_hash}.json", partial)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _use(self, name):
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+        path = os.path.join(self.directory, name)
+        
+        # Recency is read back from mtimes after a restart
+        try:
+            os.utime(path)
+        except OSError:
+            self._forget(name)
+            return None
+        return path
+
+    def _add(self, name, partial):
+        path = os.path.join(self.directory, name)
+        try:
+            os.replace(partial, path)
+        except OSError:
+            # The existing file is memory-mapped (Windows); it holds the same content anyway
+            os.unlink(partial)
+            return path
+        
+        size = os.path.getsize(path)
+        with self._lock:
+            self.total_bytes += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict(keep=name)
+        return path
+
+    def _forget(self, name):
+        with self._lock:
+            self.total_bytes -= self._entries.pop(name, 0)
+
+    def _evict(self, keep=None):
+        for name in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            self.total_bytes -= self._entries.pop(name)
+            self.evictions += 1
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                pass  # memory-mapped on Windows; swept again on a later start
+
+
+def schema_dtype_name(dtype):
+    """The SCHEMA_DTYPES name of a dtype (any time unit), or None if it cannot be remembered"""
+    for name, known in SCHEMA_DTYPES.items():
+        if dtype.base_type() == known.base_type():
+            return name
+    return None
+
+
+class SchemaCache:
+    """Column dtypes per workbook identity (file name and sheet), persisted as one JSON file
+    
+    Each entry records the header and engine its dtypes were inferred with, and the
+    dtypes each session pinned on a given header. A later parse of the same identity is
+    still inferred, then cast back to the remembered dtypes where that loses no value,
+    keeping dtypes stable between syncs while the header matches. Pins are cast the same
+    way, and only for the session that made them.
+    """
+
+    def __init__(self, path, max_entries):
+        private_directory(os.path.dirname(os.path.abspath(path)))
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # JSON [file name, sheet] -> {"header", "engine", "dtypes", "pinned": {owner: {"header", "dtypes"}}}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._entries.update(json.load(f))
+        except (OSError, ValueError):
+            pass  # nothing remembered yet; an unreadable file is replaced on the next change
+
+    def lookup(self, file_name, sheet_name):
+        """The entry for a workbook identity, or None"""
+        with self._lock:
+            entry = self._entries.get(self._key(file_name, sheet_name))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(json.dumps(entry))
+
+    def pinned(self, file_name, sheet_name, owner, header=None):
+        """Dtype names `owner` pinned by column on a workbook identity; given `header`, only pins made on it"""
+        with self._lock:
+            entry = self._entries.get(self._key(file_name, sheet_name))
+            pins = entry["pinned"].get(owner) if entry else None
+            if pins is None or (header is not None and pins["header"] != list(header)):
+                return {}
+            return dict(pins["dtypes"])
+
+    def remember(self, file_name, sheet_name, schema, engine):
+        """Record the dtypes a sheet was parsed with, keeping the pins made on it"""
+        key = self._key(file_name, sheet_name)
+        with self._lock:
+            previous = self._entries.get(key)
+            entry = {
+                "header": list(schema),
+                "engine": engine,
+                "dtypes": {name: schema_dtype_name(dtype) for name, dtype in schema.items()
+                           if schema_dtype_name(dtype) is not None},
+                "pinned": (previous or {}).get("pinned", {}),
+            }
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if entry != previous:
+                self._trim()
+                self._save()
+
+    def pin(self, file_name, sheet_name, owner, header, dtypes):
+        """Pin dtype names to columns of a sheet with `header`, for `owner` only; a None dtype unpins the column
+        
+        Pins `owner` made on another header are replaced.
+        """
+        key = self._key(file_name, sheet_name)
+        with self._lock:
+            entry = self._entries.setdefault(key, {"header": list(header), "engine": None, "dtypes": {}, "pinned": {}})
+            pins = entry["pinned"].get(owner)
+            if pins is None or pins["header"] != list(header):
+                pins = {"header": list(header), "dtypes": {}}
+            for name, dtype in dtypes.items():
+                if dtype is None:
+                    pins["dtypes"].pop(name, None)
+                else:
+                    pins["dtypes"][name] = dtype
+            if pins["dtypes"]:
+                entry["pinned"][owner] = pins
+            else:
+                entry["pinned"].pop(owner, None)
+            self._entries.move_to_end(key)
+            self._trim()
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _key(self, file_name, sheet_name):
+        return json.dumps([file_name, sheet_name])
+
+    def _trim(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        partial = f"{self.path}.{uuid.uuid4().hex}.partial"
+        try:
+            with open(partial, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(partial, self.path)
+        except OSError as e:
+            background_failure("schema-save", "Could not save remembered schemas: %s", e)
+            if os.path.exists(partial):
+                os.unlink(partial)
+
+
+class ChunkStore:
+    """Content-addressed upload chunks on local disk, namespaced per session
+    
+    Chunks outlive the upload that sent them, so a re-sync only transfers the chunks
+    that changed and an interrupted upload resumes with the ones still missing.
+    The least recently used chunks go once their total size passes `max_bytes`.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.directory = tempfile.mkdtemp(prefix="lsp-light-chunks-", dir=root)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # "<namespace>-<sha256>" -> size
+        self._lock = threading.Lock()
+        atexit.register(shutil.rmtree, self.directory, True)
+
+    def missing(self, namespace, hashes):
+        """The distinct hashes among `hashes` with no stored chunk, in order"""
+        with self._lock:
+            return [h for h in dict.fromkeys(hashes) if f"{namespace}-{h}" not in self._entries]
+
+    def put(self, namespace, chunk_hash, data):
+        if hashlib.sha256(data).hexdigest() != chunk_hash:
+            raise ValueError("Chunk content does not match its hash")
+        
+        name = f"{namespace}-{chunk_hash}"
+        path = os.path.join(self.directory, name)
+        partial = f"{path}.{uuid.uuid4().hex}.partial"
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+        
+        with self._lock:
+            self.total_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._evict(keep=name)
+
+    def read(self, namespace, chunk_hash):
+        """A stored chunk's bytes, or None if it was never sent or has been evicted"""
+        name = f"{namespace}-{chunk_hash}"
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None  # evicted since the lookup
+
+    def stats(self):
+        with self._lock:
+            return {
+                "chunks": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self, keep=None):
+        for name in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            self.total_bytes -= self._entries.pop(name)
+            self.evictions += 1
+            os.unlink(os.path.join(self.directory, name))
+
+
+class QueryCache:
+    """Row positions matched by recent /query specs, keyed by dataset version and spec
+    
+    Paging through a filtered or sorted view gathers rows at cached positions
+    instead of running the plan again.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (version, spec json) -> UInt32 Series of row positions
+        self._lock = threading.Lock()
+
+    def positions(self, dataset, spec):
+        key = (dataset.version, json.dumps(spec, sort_keys=True, default=str))
+        with self._lock:
+            positions = self._entries.get(key)
+            if positions is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return positions
+            self.misses += 1
+        
+        positions = compile_query(dataset.df, spec).collect().to_series()
+        with self._lock:
+            self._entries[key] = positions
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return positions
+
+    def invalidate(self, version):
+        """Drop every result computed over one dataset version"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == version]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class WatchHub:
+    """One watchfiles task per watched workbook, fanning content changes out to subscribers
+    
+    Subscribers hear about a change only when the file's content hash actually moved,
+    not for every write event. Used from the event loop only, so it needs no lock.
+    """
+
+    def __init__(self, debounce_ms):
+        self.debounce_ms = debounce_ms
+        self._watches = {}  # path -> {"content_hash", "queues", "task"}
+
+    def subscribe(self, path, content_hash):
+        """A queue receiving {"content_hash"} events for `path`, starting its watcher if needed"""
+        watch = self._watches.get(path)
+        if watch is None:
+            watch = {"content_hash": content_hash, "queues": set()}
+            watch["task"] = asyncio.create_task(self._watch(path, watch))
+            self._watches[path] = watch
+        
+        queue = asyncio.Queue()
+        watch["queues"].add(queue)
+        # The subscriber still shows a version older than the one the watcher last saw
+        if content_hash != watch["content_hash"]:
+            queue.put_nowait({"content_hash": watch["content_hash"]})
+        return queue
+
+    def unsubscribe(self, path, queue):
+        watch = self._watches.get(path)
+        if watch is None:
+            return
+        watch["queues"].discard(queue)
+        if not watch["queues"]:
+            watch["task"].cancel()
+            del self._watches[path]
+
+    def stats(self):
+        return {
+            "files": len(self._watches),
+            "subscribers": sum(len(watch["queues"]) for watch in self._watches.values()),
+        }
+
+    async def _watch(self, path, watch):
+        # Watch the directory: editors often save by renaming a new file over the old one
+        async for _ in awatch(
+            os.path.dirname(path),
+            watch_filter=lambda change, changed: os.path.realpath(changed) == path,
+            debounce=self.debounce_ms,
+        ):
+            content_hash = await self._content_hash(path)
+            if content_hash is None or content_hash == watch["content_hash"]:
+                continue
+            watch["content_hash"] = content_hash
+            for queue in watch["queues"]:
+                queue.put_nowait({"content_hash": content_hash})
+
+    async def _content_hash(self, path):
+        while True:
+            try:
+                return await worker_pool.run(file_sha256, path)
+            except PoolSaturated:
+                await asyncio.sleep(WORKER_RETRY_AFTER)
+            except (OSError, JobTimeout):
+                return None  # deleted or mid-save; the next write event catches up
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(EXPORT_CHUNK_BYTES), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def discard_workbook(workbook):
+    """Called when a workbook is replaced by a reload/sync or evicted from the store"""
+    for dataset in list(workbook.datasets.values()):
+        export_cache.invalidate(dataset.version)
+        query_cache.invalidate(dataset.version)
+    workbook.close()
+
+
+dataset_versions = count(1)
+parse_cache = ParseCache(PARSE_CACHE_DIR, PARSE_CACHE_MAX_BYTES)
+schema_cache = SchemaCache(SCHEMA_CACHE_PATH, SCHEMA_CACHE_ENTRIES)
+export_cache = ExportCache(EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_BYTES)
+query_cache = QueryCache(QUERY_CACHE_ENTRIES)
+chunk_store = ChunkStore(UPLOAD_DIR, CHUNK_STORE_MAX_BYTES)
+watch_hub = WatchHub(WATCH_DEBOUNCE_MS)
+dataset_store = DatasetStore(STORE_BUDGET_BYTES, on_discard=discard_workbook)
+
+
+def session_id(session):
+    """Stable per-browser key into the dataset store, kept in the signed session cookie"""
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+
+def session_workbook(session):
+    """The session's workbook, restored from the parse cache if it was evicted, or None"""
+    workbook = dataset_store.get(session_id(session))
+    if workbook is None and session.get('dataset_version') is not None:
+        workbook = restore_workbook(session)
+    return workbook
+
+
+def restore_workbook(session):
+    """Rebuild an evicted (or pre-restart) workbook from the parse cache, if its sheets are still there
+    
+    The workbook file itself is gone, so only sheets that were parsed before can be shown.
+    """
+    content_hash = session.get('content_hash')
+    manifest = parse_cache.load_manifest(content_hash) if content_hash else None
+    if manifest is None:
+        return None
+    
+    workbook = Workbook(None, manifest["file_name"], content_hash, manifest["sheets"], manifest["format"],
+                        session_id(session))
+    if session.get('sheet') in workbook.sheet_names():
+        workbook.active_sheet = session['sheet']
+    try:
+        dataset = workbook.load_sheet(workbook.active_sheet)
+    except WorkbookReadError:
+        return None
+    
+    dataset_store.put(session_id(session), workbook)
+    session['dataset_version'] = dataset.version
+    return workbook
+
+
+def session_dataset(session, sheet=None):
+    """The session's parsed dataset for `sheet` (default: the active sheet), or None"""
+    workbook = session_workbook(session)
+    if workbook is None:
+        return None
+    return workbook.datasets.get(sheet or workbook.active_sheet)
+
+
+def missing_dataset_response(session):
+    """Error for a session without data, telling apart never-loaded from evicted"""
+    if session.get('dataset_version') is not None:
+        return JSONResponse(
+            {"error": "Your data has expired from server memory. Please open the Excel file again.", "expired": True},
+            status_code=410
+        )
+    return {"error": "No data loaded. Please load an Excel file first."}
+
+
+def is_key_column(name, old, new):
+    """True if integer or string column `name` has no nulls and no duplicates in either frame"""
+    if not (new.schema[name].is_integer() or new.schema[name] == pl.String):
+        return False
+    return all(df[name].null_count() == 0 and df[name].is_unique().all() for df in (old, new))
+
+
+def detect_key_column(old, new):
+    """Pick a column that uniquely identifies rows in both frames, preferring id-like names"""
+    hinted = [c for c in new.columns if c.lower() in KEY_COLUMN_HINTS or c.lower().endswith(('_id', ' id'))]
+    for name in hinted + new.columns[:1]:
+        if is_key_column(name, old, new):
+            return name
+    return None
+
+
+def take_rows(df, positions):
+    """Rows of `df` at the given positions, in that order"""
+    return df.select(pl.all().gather(positions))
+
+
+def changed_cells(old_rows, new_rows, positions):
+    """[row, column index, cell html] for every differing cell of aligned row pairs"""
+    cells = []
+    for col_index, (name, dtype) in enumerate(new_rows.schema.items()):
+        changed = old_rows[name].ne_missing(new_rows[name]).arg_true()
+        if changed.is_empty():
+            continue
+        values = new_rows[name].gather(changed).to_frame().select(html_cell_expr(name, dtype)).to_series()
+        rows = positions.gather(changed)
+        cells.extend([row, col_index, value] for row, value in zip(rows, values))
+    return cells
+
+
+def positional_patch(old, new):
+    """Diff row-by-row by position, using row hashes to find the rows that differ"""
+    common = min(old.height, new.height)
+    old_hashes = old.slice(0, common).hash_rows()
+    new_hashes = new.slice(0, common).hash_rows()
+    changed = (old_hashes != new_hashes).arg_true()
+    if changed.len() + abs(new.height - old.height) > PATCH_MAX_ROWS:
+        return None
+    
+    return {
+        "updated": changed_cells(take_rows(old, changed), take_rows(new, changed), changed),
+        "inserted": list(range(common, new.height)),
+        "deleted": list(range(common, old.height)),
+        "shift_from": common if old.height != new.height else None,
+    }
+
+
+def keyed_patch(old, new, key):
+    """Diff rows matched by a unique key column; None if the rows were reordered"""
+    old_index = old.select(key, pl.int_range(pl.len(), dtype=pl.UInt32).alias("old_pos"), old.hash_rows().alias("old_hash"))
+    new_index = new.select(key, pl.int_range(pl.len(), dtype=pl.UInt32).alias("new_pos"), new.hash_rows().alias("new_hash"))
+    joined = new_index.join(old_index, on=key, how="full", coalesce=True)
+    
+    inserted = joined.filter(pl.col("old_pos").is_null())["new_pos"].sort()
+    deleted = joined.filter(pl.col("new_pos").is_null())["old_pos"].sort()
+    matched = joined.filter(pl.col("old_pos").is_not_null() & pl.col("new_pos").is_not_null()).sort("new_pos")
+    
+    # Rows that kept their key must keep their relative order, or positions are meaningless
+    if not matched["old_pos"].is_sorted():
+        return None
+    
+    updated = matched.filter(pl.col("old_hash") != pl.col("new_hash"))
+    if updated.height + inserted.len() + deleted.len() > PATCH_MAX_ROWS:
+        return None
+    
+    # Rows before the first insert/delete sit at the same position in both frames
+    shifts = [s.min() for s in (inserted, deleted) if not s.is_empty()]
+    
+    return {
+        "updated": changed_cells(take_rows(old, updated["old_pos"]), take_rows(new, updated["new_pos"]), updated["new_pos"]),
+        "inserted": inserted.to_list(),
+        "deleted": deleted.to_list(),
+        "shift_from": min(shifts) if shifts else None,
+    }
+
+
+def dataset_patch(old, new, key=None):
+    """Compact patch of inserted, deleted and updated cells turning `old` into `new`
+    
+    A chosen `key` with duplicates or nulls cannot match rows, so those frames are diffed by
+    position. Returns None when the schema changed or the patch would not be smaller than a
+    full reload.
+    """
+    if old.schema != new.schema:
+        return None
+    
+    if key not in new.columns:
+        key = detect_key_column(old, new)
+    elif not is_key_column(key, old, new):
+        key = None
+    patch = keyed_patch(old, new, key) if key else positional_patch(old, new)
+    if patch is None or len(patch["updated"]) > PATCH_MAX_CELLS:
+        return None
+    
+    patch["key"] = key
+    patch["rows"] = new.height
+    return patch
+
+
+class QueryError(Exception):
+    """A /query spec names an unknown column or an unsupported filter"""
+
+
+def query_spec(data):
+    """The parts of a /query request that decide which rows match and in what order"""
+    sort = data.get('sort') or []
+    filters = data.get('filters') or []
+    if not isinstance(sort, list) or not isinstance(filters, list):
+        raise QueryError("sort and filters must be lists")
+    return {
+        "sort": [{"column": key.get('column'), "descending": bool(key.get('descending'))} for key in sort],
+        "filters": filters,
+        "search": str(data.get('search') or '').strip(),
+    }
+
+
+def searchable_text(name):
+    return pl.col(name).cast(pl.String).str.to_lowercase()
+
+
+def query_plan(plan, schema, spec):
+    """Apply a query spec's filters, search and sort to `plan`, a LazyFrame over a frame of `schema`
+    
+    Filters are {"column", "op", ...} with op 'equals' (value), 'range' (min and/or
+    max, inclusive), 'contains' (case-insensitive substring) or 'regex'. Values are
+    cast to the column's dtype, so dates and numbers compare as such. The global
+    search matches a case-insensitive substring in any non-nested column.
+    """
+    def column(name):
+        if name not in schema:
+            raise QueryError(f"Unknown column: {name}")
+        return pl.col(name)
+    
+    def typed(name, value):
+        return pl.lit(value).cast(schema[name], strict=False)
+    
+    predicates = []
+    for query_filter in spec["filters"]:
+        name, op = query_filter.get('column'), query_filter.get('op')
+        col = column(name)
+        if op == 'equals':
+            predicates.append(col == typed(name, query_filter.get('value')))
+        elif op == 'range':
+            if query_filter.get('min') is not None:
+                predicates.append(col >= typed(name, query_filter['min']))
+            if query_filter.get('max') is not None:
+                predicates.append(col <= typed(name, query_filter['max']))
+        elif op == 'contains':
+            value = str(query_filter.get('value') or '').lower()
+            predicates.append(searchable_text(name).str.contains(value, literal=True))
+        elif op == 'regex':
+            predicates.append(col.cast(pl.String).str.contains(str(query_filter.get('value') or '')))
+        else:
+            raise QueryError(f"Unsupported filter: {op}")
+    
+    if spec["search"]:
+        search = spec["search"].lower()
+        searchable = [name for name, dtype in schema.items() if not dtype.is_nested() and dtype != pl.Object]
+        if searchable:
+            predicates.append(pl.any_horizontal(
+                searchable_text(name).str.contains(search, literal=True) for name in searchable
+            ))
+        else:
+            predicates.append(pl.lit(False))
+    
+    if predicates:
+        plan = plan.filter(predicates)
+    if spec["sort"]:
+        plan = plan.sort(
+            [column(key["column"]) for key in spec["sort"]],
+            descending=[key["descending"] for key in spec["sort"]],
+            nulls_last=True,
+            maintain_order=True,
+        )
+    return plan
+
+
+def compile_query(df, spec):
+    """Compile a query spec into a LazyFrame plan yielding matching row positions in display order"""
+    plan = df.lazy().with_row_index(QUERY_ROW_INDEX)
+    return query_plan(plan, df.schema, spec).select(QUERY_ROW_INDEX)
+
+
+def query_page(dataset, spec, offset, limit, transport="html", compression="uncompressed"):
+    """One window of a filtered/sorted view as HTML table rows or Arrow IPC, plus the match count"""
+    positions = query_cache.positions(dataset, spec)
+    window = take_rows(dataset.df, positions.slice(offset, limit))
+    if transport == "arrow":
+        return arrow_response(window, compression, offset=offset, rows=positions.len(),
+                              total_rows=dataset.df.height)
+    return {
+        "html": polars_to_html_rows(window),
+        "offset": offset,
+        "limit": limit,
+        "rows": positions.len(),
+        "total_rows": dataset.df.height,
+    }
+
+
+def profile_exprs(schema):
+    """Every aggregation of a column profile, to be computed in a single select
+    
+    Aliases are '<column index>:<statistic>' so any column name is safe. Run lazily,
+    so common-subexpression elimination shares each value_counts between the
+    distinct count and the top values.
+    """
+    exprs = []
+    for index, (name, dtype) in enumerate(schema.items()):
+        col = pl.col(name)
+        exprs.append(col.null_count().alias(f"{index}:nulls"))
+        if dtype.is_nested() or dtype in (pl.Object, pl.Null):
+            continue
+        
+        if not (dtype.is_numeric() or dtype.is_temporal()):
+            counts = col.drop_nulls().alias("value").value_counts(sort=True, name="count")
+            exprs.append(counts.len().alias(f"{index}:distinct"))
+            exprs.append(counts.head(PROFILE_TOP_VALUES).implode().alias(f"{index}:top_values"))
+            continue
+        
+        # approx_n_unique has no temporal kernels; the physical integers count the same.
+        # It counts null as a value, so nulls are dropped first, as for the other columns.
+        exprs.append(col.drop_nulls().to_physical().approx_n_unique().alias(f"{index}:distinct"))
+        exprs.append(col.min().alias(f"{index}:min"))
+        exprs.append(col.max().alias(f"{index}:max"))
+        if dtype.is_numeric():
+            # hist has no Decimal kernel
+            values = col.cast(pl.Float64) if dtype.is_decimal() else col
+            exprs.append(values.mean().alias(f"{index}:mean"))
+            exprs.extend(values.quantile(q).alias(f"{index}:p{round(q * 100)}") for q in PROFILE_QUANTILES)
+            exprs.append(values.hist(bin_count=PROFILE_HISTOGRAM_BINS, include_breakpoint=True)
+                         .implode().alias(f"{index}:histogram"))
+    return exprs
+
+
+def json_value(value):
+    """A profile statistic as a JSON-safe value"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (decimal.Decimal, datetime.timedelta)):
+        return float(value) if isinstance(value, decimal.Decimal) else str(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, list):
+        return [json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: json_value(item) for key, item in value.items()}
+    return value
+
+
+def dataset_profile(dataset):
+    """Per-column dtype, null count, distinct count, range, mean, quantiles and distribution
+    
+    One vectorized pass over the frame, kept on the dataset so each version is profiled once.
+    """
+    if dataset.profile is None:
+        df = dataset.df
+        start = time.perf_counter()
+        row = df.lazy().select(profile_exprs(df.schema)).collect().row(0, named=True) if df.width else {}
+        
+        columns = [{"name": name, "dtype": str(dtype)} for name, dtype in df.schema.items()]
+        for alias, value in row.items():
+            index, stat = alias.split(":", 1)
+            columns[int(index)][stat] = json_value(value)
+        for column in columns:
+            # hist invents 0..1 bins for a column without values
+            if column.get("distinct") == 0 and "histogram" in column:
+                column["histogram"] = []
+        
+        dataset.profile = {
+            "sheet": dataset.sheet_name,
+            "rows": df.height,
+            "columns": columns,
+            "profile_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+    return dataset.profile
+
+
+class WorkbookReadError(Exception):
+    """No engine could parse an uploaded workbook"""
+
+
+def readable(source):
+    """A fresh file-like object (or path) for workbook bytes or a workbook path"""
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def sniff_workbook_format(source):
+    """Detect the workbook format from its magic bytes: 'xlsx', 'xlsb', 'xls', 'ods' or None"""
+    if isinstance(source, bytes):
+        head = source[:8]
+    else:
+        with open(source, 'rb') as f:
+            head = f.read(8)
+    
+    if head == OLE_MAGIC:
+        return 'xls'
+    if not head.startswith(ZIP_MAGIC):
+        return None
+    
+    # xlsx, xlsb and ods are all ZIP containers; the member names tell them apart
+    try:
+        with zipfile.ZipFile(readable(source)) as archive:
+            names = set(archive.namelist())
+            if 'xl/workbook.bin' in names:
+                return 'xlsb'
+            if 'xl/workbook.xml' in names:
+                return 'xlsx'
+            if 'mimetype' in names and archive.read('mimetype').startswith(ODS_MIMETYPE):
+                return 'ods'
+    except zipfile.BadZipFile:
+        pass
+    return None
+
+
+def read_xls_with_xlrd(source, sheet_name=None):
+    """Read one sheet of a legacy .xls workbook with xlrd (Polars has no xlrd engine)"""
+    import xlrd
+    
+    if isinstance(source, bytes):
+        book = xlrd.open_workbook(file_contents=source, on_demand=True)
+    else:
+        book = xlrd.open_workbook(source, on_demand=True)
+    sheet = book.sheet_by_index(0) if sheet_name is None else book.sheet_by_name(sheet_name)
+    if sheet.nrows == 0:
+        return pl.DataFrame()
+    
+    def cell_value(cell):
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+            return None
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            return xlrd.xldate_as_datetime(cell.value, book.datemode)
+        return cell.value
+    
+    header = [str(value) for value in sheet.row_values(0)]
+    rows = [[cell_value(cell) for cell in sheet.row(i)] for i in range(1, sheet.nrows)]
+    return pl.DataFrame(rows, schema=header, orient="row", strict=False, infer_schema_length=None)
+
+
+def read_with_engine(source, engine, sheet_name=None):
+    if engine == 'xlrd':
+        return read_xls_with_xlrd(source, sheet_name)
+    return pl.read_excel(readable(source), engine=engine, sheet_name=sheet_name)
+
+
+def read_workbook(source, sheet_name=None):
+    """Parse one sheet (default: the first) with the fastest engine that fits the sniffed format
+    
+    Returns the DataFrame and a record of the format, the engine that succeeded,
+    its parse time and every engine that was skipped or failed before it.
+    """
+    workbook_format = sniff_workbook_format(source)
+    if workbook_format is None:
+        raise WorkbookReadError("Not a recognised Excel workbook (xlsx, xlsm, xlsb, xls or ods)")
+    
+    read_info = {"format": workbook_format, "engine": None, "parse_ms": None, "fallbacks": []}
+    for engine in READ_ENGINES[workbook_format]:
+        module = ENGINE_MODULES[engine]
+        if importlib.util.find_spec(module) is None:
+            read_info["fallbacks"].append({"engine": engine, "error": f"{module} is not installed"})
+            continue
+        
+        start = time.perf_counter()
+        try:
+            df = read_with_engine(source, engine, sheet_name)
+        except Exception as e:
+            read_info["fallbacks"].append({"engine": engine, "error": str(e)})
+            continue
+        
+        read_info["engine"] = engine
+        read_info["parse_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return df, read_info
+    
+    raise WorkbookReadError("; ".join(f"{f['engine']}: {f['error']}" for f in read_info["fallbacks"])
+                            or "No engine can read this workbook")
+
+
+def lossless_cast(series, dtype):
+    """`series` cast to `dtype`, or None if the cast fails or would change any value"""
+    try:
+        cast = series.cast(dtype)
+        return cast if cast.cast(series.dtype).equals(series) else None
+    except pl.exceptions.PolarsError:
+        return None
+
+
+def apply_remembered_dtypes(df, entry, read_info, pinned=()):
+    """Cast an inferred sheet back to its remembered dtypes, column by column, where nothing is lost
+    
+    Only applies while the header matches the remembered one, and not to `pinned` columns.
+    A column whose new values do not fit its remembered dtype keeps the inferred one and
+    is listed in read_info.
+    """
+    if entry is None or entry["header"] != df.columns:
+        read_info["schema"] = "inferred"
+        return df
+    
+    casts, changed = [], []
+    for name, dtype_name in entry["dtypes"].items():
+        if name in pinned or schema_dtype_name(df.schema[name]) == dtype_name:
+            continue
+        cast = lossless_cast(df[name], SCHEMA_DTYPES[dtype_name])
+        if cast is None:
+            changed.append(name)
+        else:
+            casts.append(cast)
+    read_info["schema"] = "remembered"
+    if changed:
+        read_info["schema_changed"] = changed
+    return df.with_columns(casts) if casts else df
+
+
+def apply_pinned_dtypes(df, pinned, read_info):
+    """Cast columns to the dtypes a user pinned, where nothing is lost
+    
+    A pin never nulls or truncates values: a column that does not fit its pinned dtype
+    keeps the one it has and is listed in read_info["pins_rejected"].
+    """
+    casts, rejected = [], []
+    for name, dtype_name in pinned.items():
+        cast = lossless_cast(df[name], SCHEMA_DTYPES[dtype_name])
+        if cast is None:
+            rejected.append(name)
+        else:
+            casts.append(cast)
+    if rejected:
+        read_info["pins_rejected"] = rejected
+    return df.with_columns(casts) if casts else df
+
+
+def apply_schema(df, read_info, file_name, sheet_name, owner=None):
+    """Give a freshly parsed sheet its remembered dtypes and `owner`'s pins, and remember its schema
+    
+    The schema remembered for everyone is the one before `owner`'s pins are applied.
+    """
+    entry = schema_cache.lookup(file_name, sheet_name)
+    pinned = schema_cache.pinned(file_name, sheet_name, owner, df.columns)
+    df = apply_remembered_dtypes(df, entry, read_info, pinned)
+    schema_cache.remember(file_name, sheet_name, df.schema, read_info["engine"])
+    return apply_pinned_dtypes(df, pinned, read_info)
+
+
+def read_with_schema(source, file_name, sheet_name, owner=None):
+    """Parse a sheet with inference in a single engine call, then apply its remembered and pinned dtypes"""
+    df, read_info = read_workbook(source, sheet_name)
+    return apply_schema(df, read_info, file_name, sheet_name, owner), read_info
+
+
+def sheet_dimensions(ref):
+    """Data rows (below the header) and columns from an A1-style range such as 'A1:J5001'"""
+    match = re.fullmatch(r"([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?", ref or "")
+    if not match:
+        return None, None
+    
+    first_col, first_row, last_col, last_row = match.groups()
+    last_col, last_row = last_col or first_col, last_row or first_row
+    return int(last_row) - int(first_row), column_number(last_col) - column_number(first_col) + 1
+
+
+def column_number(letters):
+    """1-based number of a column from its letters: A is 1, Z is 26, AA is 27"""
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+
+def xlsx_sheet_members(archive):
+    """(name, zip member) of each worksheet of an open xlsx archive, in workbook order"""
+    workbook_xml = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    rels_xml = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {
+        rel.get('Id'): rel.get('Target')
+        for rel in rels_xml
+        if rel.get('Type', '').endswith('/worksheet')
+    }
+    
+    members = []
+    for sheet in workbook_xml.iter(f'{{{XLSX_MAIN_NS}}}sheet'):
+        target = targets.get(sheet.get(f'{{{XLSX_REL_NS}}}id'))
+        if target is None:
+            continue  # chartsheets and other non-grid sheets cannot be loaded
+        members.append((sheet.get('name'), target.lstrip('/') if target.startswith('/') else f'xl/{target}'))
+    return members
+
+
+def list_xlsx_sheets(source):
+    """Sheet names and dimensions of an xlsx, read from workbook.xml and each sheet's <dimension>"""
+    with zipfile.ZipFile(readable(source)) as archive:
+        sheets = []
+        for name, member in xlsx_sheet_members(archive):
+            # <dimension> sits at the top of the sheet XML, so the first few KB are enough
+            with archive.open(member) as sheet_xml:
+                head = sheet_xml.read(SHEET_XML_PEEK_BYTES).decode('utf-8', 'ignore')
+            ref = re.search(r'<dimension ref="([^"]+)"', head)
+            rows, columns = sheet_dimensions(ref.group(1) if ref else None)
+            sheets.append({"name": name, "rows": rows, "columns": columns})
+        return sheets
+
+
+def xlsx_date_styles(archive):
+    """Cell style index -> "date" or "datetime", for the styles of an open xlsx archive that show a serial as such"""
+    try:
+        styles = ElementTree.fromstring(archive.read('xl/styles.xml'))
+    except KeyError:
+        return {}
+    
+    kinds = {number: "date" for number in XLSX_DATE_FORMAT_IDS} | {number: "datetime" for number in XLSX_TIME_FORMAT_IDS}
+    for number_format in styles.iter(f'{{{XLSX_MAIN_NS}}}numFmt'):
+        # Quoted text, escapes and [colour]/[locale] sections hold letters that are no date parts
+        code = re.sub(r'"[^"]*"|\\.|\[[^\]]*\]', '', number_format.get('formatCode', '')).lower()
+        if re.search(r'[hs]', code):
+            kinds[int(number_format.get('numFmtId'))] = "datetime"
+        elif re.search(r'[dmy]', code):
+            kinds[int(number_format.get('numFmtId'))] = "date"
+    
+    cell_styles = styles.find(f'{{{XLSX_MAIN_NS}}}cellXfs')
+    return {
+        index: kinds[int(style.get('numFmtId', 0))]
+        for index, style in enumerate(cell_styles if cell_styles is not None else [])
+        if int(style.get('numFmtId', 0)) in kinds
+    }
+
+
+def xlsx_text(element):
+    """Text of a shared or inline string: its <t>, or its rich-text runs joined (phonetic hints left out)"""
+    ns = f'{{{XLSX_MAIN_NS}}}'
+    return ''.join(t.text or '' for t in element.findall(f'{ns}t') + element.findall(f'{ns}r/{ns}t'))
+
+
+def xlsx_shared_strings(archive, indices):
+    """The shared strings at `indices`, reading sharedStrings.xml no further than the last of them"""
+    strings = {}
+    if not indices:
+        return strings
+    
+    last = max(indices)
+    position = 0
+    with archive.open('xl/sharedStrings.xml') as strings_xml:
+        for _, element in ElementTree.iterparse(strings_xml):
+            if element.tag != f'{{{XLSX_MAIN_NS}}}si':
+                continue
+            if position in indices:
+                strings[position] = xlsx_text(element)
+            element.clear()
+            if position == last:
+                break
+            position += 1
+    return strings
+
+
+def read_xlsx_preview(source, sheet_name, num_rows):
+    """The header and first `num_rows` rows of an xlsx sheet, streamed from its XML
+    
+    The engines load a whole sheet before returning any of it, so a bounded read
+    through them costs as much as the full parse. This stops after `num_rows` rows and
+    reads only the shared strings they use; dtypes are inferred from those rows alone.
+    """
+    ns = f'{{{XLSX_MAIN_NS}}}'
+    with zipfile.ZipFile(readable(source)) as archive:
+        members = dict(xlsx_sheet_members(archive))
+        date_styles = xlsx_date_styles(archive)
+        
+        # Cells with a value as (type, raw text, style) by column, one dict per sheet row from
+        # the first row with a value, gaps included
+        rows = []
+        first_row = None
+        with archive.open(members[sheet_name]) as sheet_xml:
+            for _, element in ElementTree.iterparse(sheet_xml):
+                if element.tag != f'{ns}row':
+                    continue
+                number = int(element.get('r', 0)) or (first_row or 1) + len(rows)
+                cells = {}
+                for position, cell in enumerate(element.iter(f'{ns}c')):
+                    ref = re.match(r'[A-Z]+', cell.get('r', ''))
+                    column = column_number(ref.group()) - 1 if ref else position
+                    kind = cell.get('t', 'n')
+                    text = xlsx_text(cell.find(f'{ns}is')) if kind == 'inlineStr' else cell.findtext(f'{ns}v')
+                    if text is not None:
+                        cells[column] = (kind, text, int(cell.get('s', 0)))
+                element.clear()
+                if not cells and first_row is None:
+                    continue  # the engines' range starts at the first used cell
+                first_row = first_row or number
+                rows.extend({} for _ in range(number - first_row - len(rows)))
+                rows.append(cells)
+                if len(rows) > num_rows:
+                    break
+        rows = rows[:num_rows + 1]
+        
+        shared = xlsx_shared_strings(archive, {
+            int(text) for cells in rows for kind, text, _ in cells.values() if kind == 's' and text is not None
+        })
+    
+    def cell_value(kind, text, style):
+        if text is None or kind == 'e':
+            return None
+        if kind == 's':
+            return shared.get(int(text))
+        if kind == 'b':
+            return text == '1'
+        if kind in ('str', 'inlineStr', 'd'):
+            return text
+        value = float(text)
+        if style in date_styles:
+            moment = EXCEL_EPOCH + datetime.timedelta(milliseconds=round(value * 86_400_000))
+            return moment.date() if date_styles[style] == "date" else moment
+        return int(value) if value.is_integer() else value
+    
+    if not rows:
+        return pl.DataFrame()
+    used = [column for cells in rows for column in cells]
+    first_column, width = min(used), max(used) + 1
+    values = [[cell_value(*cells[column]) if column in cells else None for column in range(first_column, width)]
+              for cells in rows]
+    
+    # Header names as the engines give them: blanks become __UNNAMED__n, repeats get a _n suffix
+    header = []
+    for index, value in enumerate(values[0]):
+        name = f"__UNNAMED__{index}" if value is None or value == "" else str(value)
+        base, suffix = name, 0
+        while name in header:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        header.append(name)
+    df = pl.DataFrame(values[1:], schema=header, orient="row", strict=False, infer_schema_length=None)
+    return df.with_columns(pl.col(pl.Datetime).dt.cast_time_unit("ms"))
+
+
+def list_sheets(source, workbook_format):
+    """Sheet names (and dimensions where the format records them) without parsing any cells"""
+    if workbook_format == 'xlsx':
+        try:
+            return list_xlsx_sheets(source)
+        except (KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+            pass  # unusual package layout; let the engine enumerate the sheets
+    
+    if workbook_format == 'xls' and importlib.util.find_spec('fastexcel') is None:
+        import xlrd
+        book = xlrd.open_workbook(file_contents=source, on_demand=True) if isinstance(source, bytes) \
+            else xlrd.open_workbook(source, on_demand=True)
+        names = book.sheet_names()
+    else:
+        import fastexcel
+        names = fastexcel.read_excel(source).sheet_names
+    return [{"name": name, "rows": None, "columns": None} for name in names]
+
+
+def prefetch_sheet(workbook, name, key):
+    try:
+        workbook.load_sheet(name)
+    except WorkbookReadError as e:
+        background_failure("prefetch", "Prefetching sheet %r failed: %s", name, e)
+        return
+    dataset_store.refresh(key)
+
+
+def start_progressive_load(workbook, name, key):
+    """A preview of a sheet with its full parse queued behind it, or None where there is no preview"""
+    dataset = workbook.preview_sheet(name)
+    if dataset is None:
+        return None
+    try:
+        workbook.track_loading(name, worker_pool.submit(finish_loading, workbook, name, key))
+    except PoolSaturated:
+        return workbook.reload_sheet(name)  # no room to parse in the background, so parse now
+    return dataset
+
+
+def finish_loading(workbook, name, key):
+    """Parse the whole of a previewed sheet in the background and swap it in for the preview"""
+    try:
+        dataset = workbook.reload_sheet(name)
+    except Exception as e:
+        background_failure("full-load", "Loading sheet %r in full failed: %s", name, e)
+        raise
+    dataset_store.refresh(key)
+    if EXPORT_PREBUILD_FORMATS:
+        prebuild_exports(dataset)
+    return dataset
+
+
+async def full_dataset(dataset, timeout=None):
+    """The Dataset of `dataset`'s sheet once parsed in full, waiting on its background load if any"""
+    future = dataset.workbook.loading.get(dataset.sheet_name)
+    if future is None:
+        return dataset
+    try:
+        # Shielded: a waiter giving up must not cancel the load others wait on
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout or worker_pool.timeout)
+    except asyncio.TimeoutError:
+        raise JobTimeout() from None
+
+
+def prefetch_adjacent_sheets(workbook, name, key):
+    """Parse the sheets either side of `name` in the background, when enabled"""
+    if not PREFETCH_ADJACENT_SHEETS:
+        return
+    names = workbook.sheet_names()
+    index = names.index(name)
+    for neighbour in names[max(index - 1, 0):index + 2]:
+        if neighbour in workbook.datasets:
+            continue
+        try:
+            worker_pool.submit(prefetch_sheet, workbook, neighbour, key)
+        except PoolSaturated:
+            return  # prefetching is opportunistic
+
+
+sheet_processes = None
+sheet_processes_lock = threading.Lock()
+
+
+def sheet_process_pool():
+    """The process pool for parallel sheet parsing, started on first use"""
+    global sheet_processes
+    with sheet_processes_lock:
+        if sheet_processes is None:
+            # Spawn rather than fork: forking a process already running Polars threads can deadlock
+            sheet_processes = ProcessPoolExecutor(SHEET_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+        return sheet_processes
+
+
+def load_all_sheets(workbook):
+    """Parse every sheet not parsed yet, spread over the sheet worker processes
+    
+    Workers read the workbook from its temp file and write each sheet straight into
+    the parse cache as an Arrow IPC file, which is memory-mapped here instead of
+    being unpickled. Sheets already cached are simply mapped, and sheets a worker
+    fails on are retried in-process with the usual engine fallbacks.
+    Returns the names of the sheets this call loaded.
+    """
+    pending = [name for name in workbook.sheet_names() if name not in workbook.datasets]
+    cache_names = {name: workbook.cache_name(name) for name in pending}
+    uncached = [name for name in pending if not parse_cache.contains(workbook.content_hash, cache_names[name])]
+    engine = next((
+        engine for engine in READ_ENGINES.get(workbook.format, [])
+        if engine != 'xlrd' and importlib.util.find_spec(ENGINE_MODULES[engine]) is not None
+    ), None)
     
-    # Add header
-    html.append('<thead>')
-    html.append('<tr style="background-color: #f2f2f2;">')
-    for col in df.columns:
-        html.append(f'<th style="border: 1px solid #ddd; padding: 8px; text-align: left;">{col}</th>')
-    html.append('</tr>')
-    html.append('</thead>')
+    # A single sheet is not worth a process round trip, and xlrd is not a Polars engine
+    if len(uncached) < 2 or engine is None or workbook.content_hash is None or workbook.source is None:
+        for name in pending:
+            workbook.load_sheet(name)
+        return pending
     
-    # Add body
-    html.append('<tbody>')
-    for row in df.iter_rows():
-        html.append('<tr>')
-        for value in row:
-            # Handle None/null values
-            display_value = "" if value is None else str(value)
-            html.append(f'<td style="border: 1px solid #ddd; padding: 8px;">{display_value}</td>')
-        html.append('</tr>')
-    html.append('</tbody>')
-    html.append('</table>')
+    source_path = workbook.source_path()
+    jobs = {}
+    for name in uncached:
+        ipc_path = parse_cache.partial_path(workbook.content_hash, cache_names[name])
+        future = sheet_process_pool().submit(sheet_worker.parse_sheet_to_ipc, source_path, name, engine, ipc_path)
+        jobs[name] = (future, ipc_path)
     
-    return ''.join(html)
+    for name in pending:
+        if name not in jobs:
+            workbook.load_sheet(name)
+    
+    for name, (future, ipc_path) in jobs.items():
+        try:
+            parse_ms = future.result()
+            df = pl.read_ipc(parse_cache.adopt(workbook.content_hash, cache_names[name], ipc_path), memory_map=True)
+        except Exception as e:
+            background_failure("worker-parse", "Parsing sheet %r in a worker process failed: %s", name, e)
+            if os.path.exists(ipc_path):
+                os.unlink(ipc_path)
+            workbook.load_sheet(name)
+            continue
+        
+        read_info = {"format": workbook.format, "engine": engine, "parse_ms": parse_ms,
+                     "fallbacks": [], "process": True}
+        cast = apply_schema(df, read_info, workbook.file_name, name, workbook.owner)
+        if cast is not df:
+            parse_cache.store_sheet(workbook.content_hash, cache_names[name], cast)  # cache what is served
+        workbook.add_parsed_sheet(name, cast, read_info)
+    return pending
 
 
-@rt("/load_excel")
-async def post(data: dict):
-    """Handle Excel file upload and processing"""
-    global current_data, current_file_path
+def load_excel_source(source, file_name, content_hash, session, diff=False, key=None, sheet=None,
+                      all_sheets=False, transport="html", preview=False, timer=None):
+    """Store an uploaded workbook as the session's dataset, parse one sheet and build the response
+    
+    `source` is the workbook bytes or a temp file path, which the stored workbook takes
+    over. Only `sheet` (default: the first) is parsed; the others wait until selected,
+    unless `all_sheets` asks for every sheet to be parsed up front across processes.
+    With `diff`, a re-sync of the session's dataset answers with a patch against the
+    previous version instead of a fresh first page, whenever that is possible.
+    With the "arrow" `transport` the first page is left out; the client fetches it as Arrow.
+    With `preview`, a long xlsx sheet answers with its first PREVIEW_ROWS rows while the
+    whole sheet is parsed in the background; /load_status waits for it to be swapped in.
+    Each step is timed as a stage of `timer`, when given.
+    """
+    timer = timer or StageTimer(None)
+    try:
+        with timer.stage("sheets"):
+            workbook_format = sniff_workbook_format(source)
+            if workbook_format is None:
+                raise WorkbookReadError("Not a recognised Excel workbook (xlsx, xlsm, xlsb, xls or ods)")
+            sheets = list_sheets(source, workbook_format)
+            if not sheets:
+                raise WorkbookReadError("The workbook has no worksheets")
+            
+            workbook = Workbook(source, file_name, content_hash, sheets, workbook_format, session_id(session))
+            parse_cache.store_manifest(content_hash, {
+                "file_name": file_name, "format": workbook_format, "sheets": sheets,
+            })
+            if sheet in workbook.sheet_names():
+                workbook.active_sheet = sheet
+        
+        # Read the selected sheet with Polars, picking the engine from the sniffed format
+        with timer.stage("parse") as stage:
+            if all_sheets:
+                load_all_sheets(workbook)
+            dataset = None
+            if preview and not (all_sheets or diff):
+                dataset = start_progressive_load(workbook, workbook.active_sheet, session_id(session))
+            dataset = dataset or workbook.load_sheet(workbook.active_sheet)
+            stage.description = (dataset.read_info or {}).get("engine")
+    except Exception as e:
+        if isinstance(source, str):
+            os.unlink(source)
+        return {"error": f"Error reading Excel file: {str(e)}"}
+    
+    previous = session_workbook(session) if diff else None
+    
+    # Store the workbook for this session; the cache key lets it be restored after eviction
+    dataset_store.put(session_id(session), workbook)
+    session['dataset_version'] = dataset.version
+    session['content_hash'] = content_hash
+    session['sheet'] = workbook.active_sheet
+    if not all_sheets:
+        prefetch_adjacent_sheets(workbook, workbook.active_sheet, session_id(session))
+    
+    # A preview's exports are prebuilt once its full parse is in
+    if EXPORT_PREBUILD_FORMATS and not dataset.preview:
+        try:
+            worker_pool.submit(prebuild_exports, dataset)
+        except PoolSaturated:
+            pass  # prebuilding is opportunistic; exports still build on demand
+    
+    previous_dataset = previous.datasets.get(dataset.sheet_name) if previous is not None else None
+    if previous_dataset is not None and not previous_dataset.preview:
+        with timer.stage("diff"):
+            patch = dataset_patch(previous_dataset.df, dataset.df, key)
+        if patch is not None:
+            return {**dataset_summary(dataset), "patch": patch}
+    
+    with timer.stage("render"):
+        return dataset_response(dataset, transport)
+
+
+def dataset_summary(dataset):
+    """Describe a dataset for the client: schema, dimensions and content hash"""
+    df = dataset.df
+    
+    # Get DataFrame dimensions
+    num_rows = df.height
+    num_cols = df.width
+    
+    return {
+        "rows": num_rows,
+        "columns": num_cols,
+        "schema": [{"name": name, "dtype": str(dtype)} for name, dtype in df.schema.items()],
+        "page_size": PAGE_SIZE,
+        "sheet": dataset.sheet_name,
+        "sheets": dataset.workbook.sheets,
+        "file_name": dataset.file_name,
+        "content_hash": dataset.workbook.content_hash,
+        "reader": dataset.read_info,
+        "loading": dataset.preview,
+        "success": True
+    }
+
+
+def dataset_response(dataset, transport="html"):
+    """Dataset summary plus the first page; the grid fetches the rest from /rows on scroll"""
+    if transport == "arrow":
+        return {**dataset_summary(dataset), "transport": "arrow"}
+    return {
+        **dataset_summary(dataset),
+        "html": polars_to_html_table(dataset.df.slice(0, PAGE_SIZE)),
+    }
+
+
+@rt("/rows")
+def get_rows(session, offset: int = 0, limit: int = PAGE_SIZE, sheet: str = None,
+             transport: str = "html", compression: str = "uncompressed"):
+    """Return one window of rows of the session's dataset as HTML table rows or an Arrow IPC stream"""
+    dataset = session_dataset(session, sheet)
+    if dataset is None:
+        return missing_dataset_response(session)
+    error = transport_error(transport, compression)
+    if error:
+        return {"error": error}
+    
+    offset = max(offset, 0)
+    limit = min(max(limit, 0), MAX_PAGE_SIZE)
+    
+    # slice() is zero-copy, so only the requested window is ever rendered
+    window = dataset.df.slice(offset, limit)
+    if transport == "arrow":
+        return arrow_response(window, compression, offset=offset, rows=dataset.df.height)
+    
+    return {
+        "html": polars_to_html_rows(window),
+        "offset": offset,
+        "limit": limit,
+        "rows": dataset.df.height
+    }
+
+
+@rt("/query")
+async def post_query(data: dict, session):
+    """Return one window of the session's dataset sorted, filtered and searched as requested"""
+    dataset = session_dataset(session, data.get('sheet'))
+    if dataset is None:
+        return missing_dataset_response(session)
+    
+    try:
+        spec = query_spec(data)
+        offset = max(int(data.get('offset', 0)), 0)
+        limit = min(max(int(data.get('limit', PAGE_SIZE)), 0), MAX_PAGE_SIZE)
+        transport = data.get('transport', 'html')
+        compression = data.get('compression', 'uncompressed')
+        error = transport_error(transport, compression)
+        if error:
+            return {"error": error}
+        dataset = await full_dataset(dataset)
+        return await worker_pool.run(query_page, dataset, spec, offset, limit, transport, compression)
+        
+    except (PoolSaturated, JobTimeout) as e:
+        return pool_error_response(e)
+    except (QueryError, ValueError, pl.exceptions.PolarsError) as e:
+        return {"error": f"Invalid query: {str(e)}"}
+    except Exception as e:
+        error_msg = f"Query error: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        return {"error": error_msg}
+
+
+@rt("/profile")
+async def get_profile(session, sheet: str = None):
+    """Summarise every column of the session's dataset, computing the profile once per version"""
+    dataset = session_dataset(session, sheet)
+    if dataset is None:
+        return missing_dataset_response(session)
     
+    try:
+        return await worker_pool.run(dataset_profile, await full_dataset(dataset))
+        
+    except (PoolSaturated, JobTimeout) as e:
+        return pool_error_response(e)
+    except Exception as e:
+        error_msg = f"Profiling error: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        return {"error": error_msg}
+
+
+@rt("/upload_excel")
+async def post_upload(request: Request, session):
+    """Handle a raw binary Excel upload streamed in the request body"""
+    timer = StageTimer("/upload_excel")
+    bytes_in = 0
+    try:
+        file_name = request.query_params.get('file_name')
+        if not file_name:
+            result = {"error": "Missing filename"}
+        else:
+            # Stream the body into a spooled buffer instead of holding it as base64/JSON
+            with UploadBuffer(suffix=Path(file_name).suffix) as upload:
+                with timer.stage("receive"):
+                    async for chunk in request.stream():
+                        upload.write(chunk)
+                bytes_in = upload.size
+                
+                if upload.size == 0:
+                    result = {"error": "Missing file data"}
+                else:
+                    session.pop('watch_path', None)
+                    result = await worker_pool.run(
+                        load_upload,
+                        upload, file_name, session,
+                        diff=request.query_params.get('sync') == '1',
+                        key=request.query_params.get('key'),
+                        sheet=request.query_params.get('sheet'),
+                        all_sheets=request.query_params.get('all_sheets') == '1',
+                        transport=request.query_params.get('transport', 'html'),
+                        preview=request.query_params.get('preview') == '1',
+                        timer=timer
+                    )
+        
+    except (PoolSaturated, JobTimeout) as e:
+        result = pool_error_response(e)
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        result = {"error": error_msg}
+    return timed_response(timer, result, bytes_in)
+
+
+def chunk_hashes(value):
+    """Validate a chunk manifest: a list of lowercase hex SHA-256 digests"""
+    if not isinstance(value, list) or not all(isinstance(h, str) and CHUNK_HASH_PATTERN.fullmatch(h) for h in value):
+        raise ValueError("chunks must be a list of SHA-256 hex digests")
+    return value
+
+
+def missing_chunks_response(missing):
+    return JSONResponse({"error": "Some chunks are missing", "missing": missing}, status_code=409)
+
+
+def load_chunked_upload(namespace, hashes, file_name, session, **options):
+    """Join the stored chunks of a chunked upload in order and load the result like an upload
+    
+    Answers 409 with the chunks to send (again) if any is not stored, e.g. evicted meanwhile.
+    """
+    missing = chunk_store.missing(namespace, hashes)
+    if missing:
+        return missing_chunks_response(missing)
+    
+    timer = options.setdefault('timer', StageTimer(None))
+    with UploadBuffer(suffix=Path(file_name).suffix) as upload:
+        with timer.stage("assemble"):
+            for chunk_hash in hashes:
+                data = chunk_store.read(namespace, chunk_hash)
+                if data is None:
+                    return missing_chunks_response([chunk_hash])
+                upload.write(data)
+        
+        return load_upload(upload, file_name, session, **options)
+
+
+def load_upload(upload, file_name, session, **options):
+    """Load a received upload, taking it over from its buffer only once the job runs
+    
+    A job the pool refuses never detaches the upload, so the buffer still deletes its temp file.
+    """
+    return load_excel_source(upload.detach(), file_name, upload.sha256.hexdigest(), session, **options)
+
+
+@rt("/upload/init")
+def post_upload_init(data: dict, session):
+    """Start or resume a chunked upload: report which chunks of the manifest must be sent"""
+    try:
+        hashes = chunk_hashes(data.get('chunks'))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return {"missing": chunk_store.missing(session_id(session), hashes)}
+
+
+@rt("/upload/chunk")
+async def post_upload_chunk(request: Request, session):
+    """Store one chunk of a chunked upload, checking it against its SHA-256 `hash` parameter"""
+    try:
+        chunk_hash = request.query_params.get('hash', '')
+        if not CHUNK_HASH_PATTERN.fullmatch(chunk_hash):
+            return JSONResponse({"error": "Invalid chunk hash"}, status_code=400)
+        
+        data = bytearray()
+        async for part in request.stream():
+            data += part
+            if len(data) > UPLOAD_CHUNK_MAX_BYTES:
+                return JSONResponse({"error": "Chunk too large"}, status_code=413)
+        
+        await worker_pool.run(chunk_store.put, session_id(session), chunk_hash, bytes(data))
+        return {"stored": chunk_hash}
+        
+    except (PoolSaturated, JobTimeout) as e:
+        return pool_error_response(e)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        return {"error": error_msg}
+
+
+@rt("/upload/complete")
+async def post_upload_complete(request: Request, session):
+    """Assemble a chunked upload from its manifest and load it; takes the /upload_excel parameters"""
+    timer = StageTimer("/upload/complete")
+    try:
+        file_name = request.query_params.get('file_name')
+        hashes = None
+        if not file_name:
+            result = {"error": "Missing filename"}
+        else:
+            try:
+                hashes = chunk_hashes((await request.json()).get('chunks'))
+                if not hashes:
+                    result = {"error": "Missing file data"}
+            except ValueError as e:
+                result = JSONResponse({"error": str(e)}, status_code=400)
+        
+        if hashes:
+            session.pop('watch_path', None)
+            result = await worker_pool.run(
+                load_chunked_upload,
+                session_id(session), hashes, file_name, session,
+                diff=request.query_params.get('sync') == '1',
+                key=request.query_params.get('key'),
+                sheet=request.query_params.get('sheet'),
+                all_sheets=request.query_params.get('all_sheets') == '1',
+                transport=request.query_params.get('transport', 'html'),
+                preview=request.query_params.get('preview') == '1',
+                timer=timer
+            )
+        
+    except (PoolSaturated, JobTimeout) as e:
+        result = pool_error_response(e)
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        result = {"error": error_msg}
+    return timed_response(timer, result, int(request.headers.get('content-length', 0)))
+
+
+def load_base64_source(file_data, file_name, session, transport="html", preview=False, timer=None):
+    """Decode a base64 workbook payload and load it like a binary upload"""
+    timer = timer or StageTimer(None)
+    with timer.stage("decode"):
+        file_bytes = base64.b64decode(file_data)
+    with timer.stage("hash"):
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+    
+    return load_excel_source(file_bytes, file_name, content_hash, session, transport=transport, preview=preview,
+                             timer=timer)
+
+
+@rt("/load_excel")
+async def post(data: dict, session, request: Request):
+    """Handle Excel file upload and processing (base64-in-JSON compatibility route)"""
+    timer = StageTimer("/load_excel")
     try:
         file_data = data.get('file_data')
         file_name = data.get('file_name')
         
         if not file_data or not file_name:
-            return {"error": "Missing file data or filename"}
+            result = {"error": "Missing file data or filename"}
+        else:
+            result = await worker_pool.run(load_base64_source, file_data, file_name, session,
+                                           transport=data.get('transport', 'html'),
+                                           preview=bool(data.get('preview')), timer=timer)
         
-        # Decode base64 data
-        file_bytes = base64.b64decode(file_data)
+    except (PoolSaturated, JobTimeout) as e:
+        result = pool_error_response(e)
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        result = {"error": error_msg}
+    return timed_response(timer, result, int(request.headers.get('content-length', 0)))
+
+
+def watchable_path(path):
+    """The real path of `path` if it lies inside one of WATCH_ROOTS, else None"""
+    resolved = os.path.realpath(path)
+    for root in WATCH_ROOTS:
+        try:
+            if os.path.commonpath([root, resolved]) == root:
+                return resolved
+        except ValueError:
+            continue  # on another drive (Windows)
+    return None
+
+
+def load_watched_file(path, session, sync=False, diff=False, key=None, sheet=None):
+    """Read a watched workbook from disk and load it like an upload
+    
+    With `sync`, a file whose content hash matches the stored workbook is not parsed again.
+    """
+    with open(path, 'rb') as f:
+        file_bytes = f.read()
+    content_hash = hashlib.sha256(file_bytes).hexdigest()
+    
+    workbook = session_workbook(session) if sync else None
+    if workbook is not None and workbook.content_hash == content_hash:
+        return {"unchanged": True}
+    return load_excel_source(file_bytes, os.path.basename(path), content_hash, session,
+                             diff=diff, key=key, sheet=sheet)
+
+
+@rt("/watch")
+async def post_watch(data: dict, session):
+    """Load a workbook the server can read directly and start watching it for changes"""
+    try:
+        if not WATCH_ROOTS:
+            return {"error": "Watch mode is not enabled on this server"}
+        
+        path = watchable_path(data.get('path') or '')
+        if path is None or not os.path.isfile(path):
+            return {"error": "No such workbook in a watchable directory"}
+        
+        result = await worker_pool.run(load_watched_file, path, session)
+        if result.get('success'):
+            session['watch_path'] = path
+        return result
+        
+    except (PoolSaturated, JobTimeout) as e:
+        return pool_error_response(e)
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        return {"error": error_msg}
+
+
+@rt("/watch/sync")
+async def post_watch_sync(data: dict, session):
+    """Reload the session's watched workbook after a change event, as a patch where possible"""
+    try:
+        path = session.get('watch_path')
+        if path is None:
+            return {"error": "No file is being watched"}
         
-        # Create a temporary file-like object
-        file_like = io.BytesIO(file_bytes)
+        return await worker_pool.run(
+            load_watched_file, path, session,
+            sync=True,
+            diff=bool(data.get('diff')),
+            key=data.get('key'),
+            sheet=data.get('sheet')
+        )
         
-        # Read Excel file with Polars
+    except (PoolSaturated, JobTimeout) as e:
+        return pool_error_response(e)
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        return {"error": error_msg}
+
+
+@rt("/events")
+async def get_events(session):
+    """Server-sent events announcing each new version of the session's watched workbook"""
+    path = session.get('watch_path')
+    if path is None:
+        return {"error": "No file is being watched"}
+    
+    workbook = session_workbook(session)
+    queue = watch_hub.subscribe(path, workbook.content_hash if workbook is not None else None)
+    
+    async def events():
         try:
-            # Try reading as xlsx first - let Polars auto-detect the engine
-            if file_name.lower().endswith('.xlsx'):
-                df = pl.read_excel(file_like)  # Let Polars choose the best engine
-            else:
-                # For .xls files, try with openpyxl
-                df = pl.read_excel(file_like)
-                
-        except Exception as e:
-            # If that fails, try saving to a temporary file and reading from there
-            try:
-                import tempfile
-                import os
-                
-                # Create a temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx' if file_name.lower().endswith('.xlsx') else '.xls') as tmp_file:
-                    tmp_file.write(file_bytes)
-                    tmp_file_path = tmp_file.name
-                
-                # Try reading from the temporary file
-                df = pl.read_excel(tmp_file_path)
-                
-                # Clean up the temporary file
-                os.unlink(tmp_file_path)
-                
-            except Exception as e2:
-                return {"error": f"Error reading Excel file: {str(e)} | Fallback error: {str(e2)}"}
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), WATCH_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"  # stops proxies from closing an idle stream
+                    continue
+                yield f"event: changed\ndata: {json.dumps(event)}\n\n"
+        finally:
+            watch_hub.unsubscribe(path, queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@rt("/sheet")
+async def post_sheet(data: dict, session):
+    """Switch the session's workbook to another sheet, parsing it on first selection"""
+    timer = StageTimer("/sheet")
+    try:
+        workbook = session_workbook(session)
+        name = data.get('name')
+        if workbook is None:
+            result = missing_dataset_response(session)
+        elif name not in workbook.sheet_names():
+            result = {"error": f"Unknown sheet: {name}"}
+        else:
+            with timer.stage("parse") as stage:
+                dataset = await worker_pool.run(workbook.load_sheet, name)
+                stage.description = (dataset.read_info or {}).get("engine")
+            workbook.active_sheet = name
+            session['sheet'] = name
+            dataset_store.refresh(session_id(session))
+            prefetch_adjacent_sheets(workbook, name, session_id(session))
+            
+            with timer.stage("render"):
+                result = dataset_response(dataset, data.get('transport', 'html'))
         
-        # Store the data globally
-        current_data = df
-        current_file_path = file_name
+    except (PoolSaturated, JobTimeout) as e:
+        result = pool_error_response(e)
+    except Exception as e:
+        error_msg = f"Error reading sheet: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        result = {"error": error_msg}
+    return timed_response(timer, result)
+
+
+@rt("/load_status")
+async def get_load_status(session, sheet: str = None, transport: str = "html"):
+    """Long poll for a previewed sheet: once it is parsed in full, the dataset like a load response"""
+    try:
+        dataset = session_dataset(session, sheet)
+        if dataset is None:
+            return missing_dataset_response(session)
         
-        # Convert to HTML table
-        html_table = polars_to_html_table(df)
+        try:
+            dataset = await full_dataset(dataset, LOAD_STATUS_WAIT_SECONDS)
+        except JobTimeout:
+            return {"loading": True, "sheet": dataset.sheet_name, "rows": dataset.df.height}
+        if dataset.workbook.active_sheet == dataset.sheet_name:
+            session['dataset_version'] = dataset.version
+        return dataset_response(dataset, transport)
         
-        # Get DataFrame dimensions
-        num_rows = df.height
-        num_cols = df.width
+    except Exception as e:
+        error_msg = f"Error loading sheet: {str(e)}"
+        print(f"DEBUG: {error_msg}")
+        return {"error": error_msg}
+
+
+@rt("/schema")
+def get_schema(session, sheet: str = None):
+    """The dtypes of a sheet of the session's workbook, its pinned dtypes and those one can pin"""
+    dataset = session_dataset(session, sheet)
+    if dataset is None:
+        return missing_dataset_response(session)
+    
+    pinned = schema_cache.pinned(dataset.file_name, dataset.sheet_name, session_id(session), dataset.df.columns)
+    return {
+        "sheet": dataset.sheet_name,
+        "columns": [{"name": name, "dtype": str(dtype), "pinned": pinned.get(name)}
+                    for name, dtype in dataset.df.schema.items()],
+        "dtypes": list(SCHEMA_DTYPES),
+    }
+
+
+@rt("/schema/pin")
+async def post_schema_pin(data: dict, session):
+    """Pin column dtypes (null unpins) for this session's loads of this file name and sheet, re-parsing the sheet
+    
+    Pins hold while the sheet keeps this header, and never cast away values: see apply_pinned_dtypes.
+    """
+    try:
+        dataset = session_dataset(session, data.get('sheet'))
+        if dataset is None:
+            return missing_dataset_response(session)
         
-        response_data = {
-            "html": html_table,
-            "rows": num_rows,
-            "columns": num_cols,
-            "success": True
-        }
+        dataset = await full_dataset(dataset)
+        dtypes = data.get('dtypes')
+        if not isinstance(dtypes, dict) or not dtypes:
+            return {"error": "dtypes must map column names to a dtype name or null"}
+        unknown = [name for name in dtypes if name not in dataset.df.columns]
+        if unknown:
+            return {"error": f"Unknown column(s): {', '.join(unknown)}"}
+        invalid = [dtype for dtype in dtypes.values() if dtype is not None and dtype not in SCHEMA_DTYPES]
+        if invalid:
+            return {"error": f"Unsupported dtype(s): {', '.join(map(str, invalid))}; choose from {', '.join(SCHEMA_DTYPES)}"}
         
-        return response_data
+        schema_cache.pin(dataset.file_name, dataset.sheet_name, session_id(session), dataset.df.columns, dtypes)
+        reloaded = await worker_pool.run(dataset.workbook.reload_sheet, dataset.sheet_name)
+        if dataset.workbook.active_sheet == reloaded.sheet_name:
+            session['dataset_version'] = reloaded.version
+        dataset_store.refresh(session_id(session))
+        return dataset_response(reloaded, data.get('transport', 'html'))
         
+    except (PoolSaturated, JobTimeout) as e:
+        return pool_error_response(e)
     except Exception as e:
-        error_msg = f"Server error: {str(e)}"
+        error_msg = f"Error applying dtypes: {str(e)}"
         print(f"DEBUG: {error_msg}")
         return {"error": error_msg}
 
 
+@rt("/sync_check")
+def post_sync_check(data: dict, session):
+    """Tell the client whether its file fingerprint matches the dataset already parsed"""
+    workbook = session_workbook(session)
+    
+    # Size and mtime only let the client skip hashing; the content hash decides
+    unchanged = (
+        workbook is not None
+        and workbook.content_hash is not None
+        and workbook.content_hash == data.get('sha256')
+    )
+    return {"unchanged": unchanged}
+
+
+def xlsx_cell_writer(worksheet, dtype, date_format, datetime_format):
+    """The xlsxwriter call for one column's values, picked once per column instead of per cell"""
+    if dtype.is_numeric():
+        return worksheet.write_number
+    if dtype == pl.Boolean:
+        return worksheet.write_boolean
+    if dtype == pl.Date:
+        return lambda row, col, value: worksheet.write_datetime(row, col, value, date_format)
+    if isinstance(dtype, pl.Datetime):
+        return lambda row, col, value: worksheet.write_datetime(row, col, value, datetime_format)
+    if dtype == pl.String:
+        return worksheet.write_string
+    return lambda row, col, value: worksheet.write_string(row, col, str(value))
+
+
+def write_xlsx_streaming(df, path):
+    """Write an xlsx row by row in xlsxwriter's constant_memory mode
+    
+    Rows are flushed to disk as they are written, so memory stays flat however long the
+    sheet is. There is no autofit and no per-cell formatting (dates share one format).
+    Past XLSX_MAX_DATA_ROWS the rows continue on Sheet2, Sheet3, ... under the same header.
+    """
+    # xlsxwriter only takes naive datetimes, and floats for decimals
+    casts = []
+    for name, dtype in df.schema.items():
+        if isinstance(dtype, pl.Datetime) and dtype.time_zone is not None:
+            casts.append(pl.col(name).dt.replace_time_zone(None))
+        elif isinstance(dtype, pl.Decimal):
+            casts.append(pl.col(name).cast(pl.Float64))
+    if casts:
+        df = df.with_columns(casts)
+    
+    options = {
+        "constant_memory": True,
+        "nan_inf_to_errors": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    }
+    with xlsxwriter.Workbook(path, options) as workbook:
+        date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+        datetime_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        worksheet, writers, sheet_row = None, None, 0
+        for offset in range(0, max(df.height, 1), XLSX_STREAM_BATCH_ROWS):
+            batch = df.slice(offset, XLSX_STREAM_BATCH_ROWS)
+            for row in zip(*(column.to_list() for column in batch.get_columns())):
+                if worksheet is None or sheet_row > XLSX_MAX_DATA_ROWS:
+                    worksheet = workbook.add_worksheet()
+                    worksheet.write_row(0, 0, df.columns)
+                    writers = [xlsx_cell_writer(worksheet, dtype, date_format, datetime_format)
+                               for dtype in df.dtypes]
+                    sheet_row = 1
+                for col, (write, value) in enumerate(zip(writers, row)):
+                    if value is not None:
+                        write(sheet_row, col, value)
+                sheet_row += 1
+        if worksheet is None:
+            workbook.add_worksheet().write_row(0, 0, df.columns)
+
+
+# Export format -> (file extension, content type, writer taking a LazyFrame, a path and writer options).
+# CSV and Parquet are sunk straight from the plan, so only the selected columns and rows are built.
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv', lambda plan, path, options: plan.sink_csv(path, **options)),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+             lambda plan, path, options: plan.collect().write_excel(path)),
+    'xlsx_fast': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                  lambda plan, path, options: write_xlsx_streaming(plan.collect(), path)),
+    'parquet': ('parquet', 'application/octet-stream', lambda plan, path, options: plan.sink_parquet(path, **options)),
+}
+
+# Alternative names accepted in export requests
+EXPORT_FORMAT_ALIASES = {'excel': 'xlsx', 'excel_fast': 'xlsx_fast'}
+
+# Writer options an export request may set for each format; the Parquet codecs with the
+# compression levels each accepts (None: no levels), and the CSV quoting styles
+EXPORT_WRITER_OPTIONS = {
+    'csv': ('separator', 'quote_style'),
+    'parquet': ('compression', 'compression_level', 'row_group_size', 'statistics'),
+}
+PARQUET_COMPRESSION_LEVELS = {
+    'zstd': (1, 22), 'gzip': (0, 9), 'brotli': (0, 11), 'snappy': None, 'lz4': None, 'uncompressed': None,
+}
+CSV_QUOTE_STYLES = ('necessary', 'always', 'never', 'non_numeric')
+
+
+class ExportOptionsError(Exception):
+    """An export request asks for an unknown column or an invalid writer option"""
+
+
+def option_int(data, name, low, high=None):
+    value = data[name]
+    if not isinstance(value, int) or isinstance(value, bool) or value < low or (high is not None and value > high):
+        bounds = f"from {low} to {high}" if high is not None else f"of at least {low}"
+        raise ExportOptionsError(f"{name} must be an integer {bounds}")
+    return value
+
+
+def export_options(data, export_format, schema):
+    """Validate an export request's column subset, view query and writer options
+    
+    Returns a JSON-able dict ({} for a plain full export) that also keys the export cache.
+    """
+    options = {}
+    
+    columns = data.get('columns')
+    if columns is not None:
+        if not isinstance(columns, list) or not columns or not all(isinstance(name, str) for name in columns):
+            raise ExportOptionsError("columns must be a non-empty list of column names")
+        unknown = [name for name in columns if name not in schema]
+        if unknown:
+            raise ExportOptionsError(f"Unknown column(s): {', '.join(unknown)}")
+        options['columns'] = columns
+    
+    spec = query_spec(data)
+    if spec['filters'] or spec['sort'] or spec['search']:
+        query_plan(pl.LazyFrame(schema=schema), schema, spec)  # raises QueryError on a bad spec
+        options['query'] = spec
+    
+    allowed = EXPORT_WRITER_OPTIONS.get(export_format, ())
+    misplaced = [name for names in EXPORT_WRITER_OPTIONS.values() for name in names
+                 if name in data and name not in allowed]
+    if misplaced:
+        raise ExportOptionsError(f"{', '.join(misplaced)} does not apply to {export_format} exports")
+    
+    writer = {}
+    if export_format == 'parquet':
+        compression = data.get('compression', 'zstd')
+        if compression not in PARQUET_COMPRESSION_LEVELS:
+            raise ExportOptionsError(f"compression must be one of {', '.join(PARQUET_COMPRESSION_LEVELS)}")
+        if 'compression' in data:
+            writer['compression'] = compression
+        if 'compression_level' in data:
+            levels = PARQUET_COMPRESSION_LEVELS[compression]
+            if levels is None:
+                raise ExportOptionsError(f"{compression} compression takes no level")
+            writer['compression_level'] = option_int(data, 'compression_level', *levels)
+        if 'row_group_size' in data:
+            writer['row_group_size'] = option_int(data, 'row_group_size', 1)
+        if 'statistics' in data:
+            if not isinstance(data['statistics'], bool):
+                raise ExportOptionsError("statistics must be true or false")
+            writer['statistics'] = data['statistics']
+    elif export_format == 'csv':
+        if 'separator' in data:
+            separator = data['separator']
+            if not isinstance(separator, str) or len(separator.encode()) != 1 or separator in '"\r\n':
+                raise ExportOptionsError("separator must be a single one-byte character other than a quote or newline")
+            writer['separator'] = separator
+        if 'quote_style' in data:
+            if data['quote_style'] not in CSV_QUOTE_STYLES:
+                raise ExportOptionsError(f"quote_style must be one of {', '.join(CSV_QUOTE_STYLES)}")
+            writer['quote_style'] = data['quote_style']
+    if writer:
+        options['writer'] = writer
+    
+    return options
+
+
+def export_plan(df, options):
+    """The lazy plan of an export: the view's rows in view order, then the chosen columns"""
+    plan = df.lazy()
+    if 'query' in options:
+        plan = query_plan(plan, df.schema, options['query'])
+    if 'columns' in options:
+        plan = plan.select(options['columns'])
+    return plan
+
+
+def open_export(dataset, export_format, options=None):
+    """Open the exported file for a dataset, serving it from the export cache when built before"""
+    options = options or {}
+    _, _, writer = EXPORT_FORMATS[export_format]
+    return export_cache.open(
+        (dataset.version, export_format, json.dumps(options, sort_keys=True)),
+        lambda path: writer(export_plan(dataset.df, options), path, options.get('writer', {}))
+    )
+
+
+def prebuild_exports(dataset):
+    """Build the configured cheap export formats ahead of the first export click"""
+    for export_format in EXPORT_PREBUILD_FORMATS:
+        try:
+            open_export(dataset, export_format).close()
+        except Exception as e:
+            background_failure("export-prebuild", "Prebuilding %s export failed: %s", export_format, e)
+
+
+def file_chunks(output):
+    """Yield an open file back in fixed-size chunks, closing it when done"""
+    try:
+        output.seek(0)
+        while chunk := output.read(EXPORT_CHUNK_BYTES):
+            yield chunk
+    finally:
+        output.close()
+
+
+async def export_response(dataset, export_format, data, timer):
+    """Stream a dataset's export as a download, or an error if the export options are invalid"""
+    if dataset.preview:
+        with timer.stage("wait"):
+            dataset = await full_dataset(dataset)
+    
+    # Generate base filename from original file
+    if dataset.file_name:
+        base_name = Path(dataset.file_name).stem
+    else:
+        base_name = "exported_data"
+    if len(dataset.workbook.sheets) > 1:
+        base_name = f"{base_name}_{dataset.sheet_name}"
+    
+    try:
+        options = export_options(data, export_format, dataset.df.schema)
+    except (ExportOptionsError, QueryError) as e:
+        return {"error": f"Invalid export options: {str(e)}"}
+    
+    extension, content_type, _ = EXPORT_FORMATS[export_format]
+    filename = f"{base_name}_exported.{extension}"
+    
+    # Stream the cached (or freshly written) file from disk
+    with timer.stage("export") as stage:
+        output = await worker_pool.run(open_export, dataset, export_format, options)
+        stage.description = export_format
+    headers = {
+        "Content-Disposition": f"attachment; filename=\"{filename}\"",
+        "Content-Length": str(os.fstat(output.fileno()).st_size)
+    }
+    return StreamingResponse(file_chunks(output), media_type=content_type, headers=headers)
+
+
 @rt("/export_data")
-async def post_export(data: dict):
+async def post_export(data: dict, session):
     """Handle data export in various formats"""
-    global current_data, current_file_path
-    
+    timer = StageTimer("/export_data")
     try:
-        if current_data is None:
-            return {"error": "No data loaded. Please load an Excel file first."}
-        
+        dataset = session_dataset(session, data.get('sheet'))
         export_format = data.get('format', 'csv').lower()
+        export_format = EXPORT_FORMAT_ALIASES.get(export_format, export_format)
         
-        if export_format not in ['csv', 'excel', 'xlsx', 'parquet']:
-            return {"error": f"Unsupported export format: {export_format}"}
-        
-        # Generate base filename from original file
-        if current_file_path:
-            base_name = Path(current_file_path).stem
+        if dataset is None:
+            result = missing_dataset_response(session)
+        elif export_format not in EXPORT_FORMATS:
+            result = {"error": f"Unsupported export format: {export_format}"}
         else:
-            base_name = "exported_data"
-        
-        # Export based on format
-        if export_format == 'csv':
-            # Export as CSV
-            output = io.StringIO()
-            current_data.write_csv(output)
-            content = output.getvalue().encode('utf-8')
-            filename = f"{base_name}_exported.csv"
-            content_type = "text/csv"
-            
-        elif export_format in ['excel', 'xlsx']:
-            # Export as Excel
-            output = io.BytesIO()
-            current_data.write_excel(output)
-            content = output.getvalue()
-            filename = f"{base_name}_exported.xlsx"
-            content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            
-        elif export_format == 'parquet':
-            # Export as Parquet
-            output = io.BytesIO()
-            current_data.write_parquet(output)
-            content = output.getvalue()
-            filename = f"{base_name}_exported.parquet"
-            content_type = "application/octet-stream"
-        
-        # Return file response
-        from starlette.responses import Response
-        return Response(
-            content=content,
-            media_type=content_type,
-            headers={
-                "Content-Disposition": f"attachment; filename=\"{filename}\"",
-                "Content-Length": str(len(content))
-            }
-        )
+            result = await export_response(dataset, export_format, data, timer)
         
+    except (PoolSaturated, JobTimeout) as e:
+        result = pool_error_response(e)
     except Exception as e:
         error_msg = f"Export error: {str(e)}"
         print(f"DEBUG: {error_msg}")
-        return {"error": error_msg}
+        result = {"error": error_msg}
+    return timed_response(timer, result)
+
+
+@rt("/store_stats")
+def get_store_stats():
+    """Occupancy and counters of the dataset store, caches and worker pool, for sizing budgets"""
+    return {
+        **dataset_store.stats(),
+        "parse_cache": parse_cache.stats(),
+        "schema_cache": schema_cache.stats(),
+        "export_cache": export_cache.stats(),
+        "query_cache": query_cache.stats(),
+        "chunk_store": chunk_store.stats(),
+        "watch": watch_hub.stats(),
+        "worker_pool": worker_pool.stats(),
+    }
+
+
+@rt("/metrics")
+def get_metrics():
+    """Request, stage and parse counters and histograms in the Prometheus text format"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @rt("/")
@@ -369,8 +4078,32 @@ def get():
                    onclick="syncData()", 
                    disabled=True,
                    style="background-color: #008CBA; color: white; padding: 10px 20px; border: none; border-radius: 4px; margin-right: 10px;"),
+            Button("📋 Profile Columns",
+                   id="profile-button",
+                   onclick="showProfile()",
+                   disabled=True,
+                   style="background-color: #607D8B; color: white; padding: 10px 20px; border: none; border-radius: 4px; margin-right: 10px;"),
+            Label(
+                Input(type="checkbox", id="all-sheets"),
+                " Parse all sheets on load",
+                style="color: #555; margin-right: 10px;",
+            ),
+            Label(
+                Input(type="checkbox", id="arrow-transport"),
+                " Arrow rows (drawn in the browser)",
+                style="color: #555;",
+            ),
             style="margin-bottom: 15px;",
         ),
+        # Watch mode only exists when the server is configured with directories it may read
+        Div(
+            Input(type="text", id="watch-path", placeholder="Path of a workbook on the server",
+                  style="padding: 6px; width: 360px; margin-right: 10px;"),
+            Button("👁️ Watch File",
+                   onclick="watchServerFile()",
+                   style="background-color: #455A64; color: white; padding: 8px 16px; border: none; border-radius: 4px;"),
+            style="margin-bottom: 15px;",
+        ) if WATCH_ROOTS else "",
         Div(
             P("Export Options:", style="margin: 0 0 10px 0; font-weight: bold; color: #555;"),
             Button("💾 Export CSV", 
@@ -383,20 +4116,44 @@ def get():
                    onclick="exportData('excel')", 
                    disabled=True,
                    style="background-color: #2E7D32; color: white; padding: 8px 16px; border: none; border-radius: 4px; margin-right: 8px;"),
+            Button("⚡ Export Excel (fast)",
+                   id="export-excel-fast",
+                   onclick="exportData('excel_fast')",
+                   disabled=True,
+                   style="background-color: #558B2F; color: white; padding: 8px 16px; border: none; border-radius: 4px; margin-right: 8px;"),
             Button("🗂️ Export Parquet", 
                    id="export-parquet",
                    onclick="exportData('parquet')", 
                    disabled=True,
-                   style="background-color: #7B1FA2; color: white; padding: 8px 16px; border: none; border-radius: 4px;"),
+                   style="background-color: #7B1FA2; color: white; padding: 8px 16px; border: none; border-radius: 4px; margin-right: 8px;"),
+            Label(
+                Input(type="checkbox", id="export-view"),
+                " Only rows of the current sort/search",
+                style="color: #555;",
+            ),
             style="margin-bottom: 20px; padding: 15px; background-color: #f9f9f9; border-radius: 8px;",
         ),
         Hr(),
+        Div(
+            Select(id="sheet-select", onchange="selectSheet(this.value)",
+                   style="display: none; margin-right: 10px; padding: 6px;"),
+            Select(id="diff-key", onchange="diffKeyColumn = this.value || null",
+                   title="Column whose values identify a row when a sync is shown as changes",
+                   style="display: none; margin-right: 10px; padding: 6px;"),
+            Input(type="search", id="grid-search", placeholder="Search rows...", disabled=True,
+                  oninput="searchGrid(this.value)", style="padding: 6px; margin-right: 10px;"),
+            Span(id="match-count", style="color: #666;"),
+            style="margin-bottom: 10px;",
+        ),
         Div(id="status", style="font-style: italic; margin-bottom: 10px; color: #666;"),
+        Div(id="profile-container",
+            style="display: none; max-height: 400px; overflow: auto; margin-bottom: 10px;"),
         Div(
             id="data-container", 
             style="max-height: 600px; overflow: auto; border: 1px solid #ddd; padding: 10px; background-color: #fafafa;",
             content="Select an Excel file to view its data here..."
         ),
+        Style(table_css),
         Script(js_code),
     )
 
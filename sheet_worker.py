@@ -0,0 +1,20 @@
+"""Process-pool worker that parses one workbook sheet into an Arrow IPC file
+
+Kept out of main.py so pickled jobs refer to a small importable module, not the app's __main__.
+"""
+import time
+
+import polars as pl
+
+
+def parse_sheet_to_ipc(source_path, sheet_name, engine, ipc_path):
+    """Parse `sheet_name` from the workbook at `source_path` and write it to `ipc_path`
+
+    The parent memory-maps the IPC file, so the frame never goes through pickle.
+    Returns the parse time in milliseconds.
+    """
+    start = time.perf_counter()
+    df = pl.read_excel(source_path, sheet_name=sheet_name, engine=engine)
+    parse_ms = round((time.perf_counter() - start) * 1000, 1)
+    df.write_ipc(ipc_path)
+    return parse_ms
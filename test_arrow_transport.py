@@ -0,0 +1,32 @@
+import asyncio
+
+import polars as pl
+
+import main
+
+
+def test_arrow_pages_carry_typed_columns_and_row_counts(client, workbook_bytes):
+    workbook = workbook_bytes({"id": range(500), "score": [i * 0.25 for i in range(500)], "name": [f"<r{i}>" for i in range(500)]})
+
+    async def scenario():
+        async with client() as http:
+            load = await http.post("/upload_excel?file_name=arrow.xlsx&transport=arrow", content=workbook)
+            page = await http.get("/rows?offset=100&limit=50&transport=arrow&compression=zstd")
+            query = await http.post("/query", json={
+                "sort": [{"column": "id", "descending": True}], "limit": 10, "transport": "arrow",
+            })
+            return load.json(), page, query
+
+    load, page, query = asyncio.run(scenario())
+
+    assert load["transport"] == "arrow" and "html" not in load
+
+    assert page.headers["Content-Type"] == main.ARROW_STREAM_MEDIA_TYPE
+    assert page.headers["X-Rows"] == "500"
+    window = pl.read_ipc_stream(page.content)
+    assert window.schema == {"id": pl.Int64, "score": pl.Float64, "name": pl.String}
+    assert window["id"].to_list() == list(range(100, 150))
+    assert window["name"][0] == "<r100>"  # no HTML escaping; the browser sets text, not markup
+
+    assert query.headers["X-Total-Rows"] == "500"
+    assert pl.read_ipc_stream(query.content)["id"].to_list() == list(range(499, 489, -1))
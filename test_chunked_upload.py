@@ -0,0 +1,37 @@
+import asyncio
+import hashlib
+
+
+def split(data, size):
+    chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    return chunks, [hashlib.sha256(chunk).hexdigest() for chunk in chunks]
+
+
+def test_chunked_upload_sends_only_missing_chunks(client, workbook_bytes):
+    chunks, hashes = split(workbook_bytes(rows=2000), 16 * 1024)
+
+    async def scenario():
+        async with client() as http:
+            init = await http.post("/upload/init", json={"chunks": hashes})
+            corrupt = await http.post(f"/upload/chunk?hash={hashes[0]}", content=chunks[1])
+
+            # The first chunk "fails", so completing reports it as missing
+            for chunk, chunk_hash in list(zip(chunks, hashes))[1:]:
+                await http.post(f"/upload/chunk?hash={chunk_hash}", content=chunk)
+            incomplete = await http.post("/upload/complete?file_name=big.xlsx", json={"chunks": hashes})
+
+            # Resuming only sends what is still missing
+            resumed = await http.post("/upload/init", json={"chunks": hashes})
+            await http.post(f"/upload/chunk?hash={hashes[0]}", content=chunks[0])
+            complete = await http.post("/upload/complete?file_name=big.xlsx", json={"chunks": hashes})
+            again = await http.post("/upload/init", json={"chunks": hashes})
+            return init.json(), corrupt, incomplete, resumed.json(), complete.json(), again.json()
+
+    init, corrupt, incomplete, resumed, complete, again = asyncio.run(scenario())
+    assert init["missing"] == list(dict.fromkeys(hashes))
+    assert corrupt.status_code == 400
+    assert incomplete.status_code == 409 and incomplete.json()["missing"] == [hashes[0]]
+    assert resumed["missing"] == [hashes[0]]
+    assert complete["rows"] == 2000
+    assert complete["content_hash"] == hashlib.sha256(b"".join(chunks)).hexdigest()
+    assert again["missing"] == []
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+import main
+
+
+async def index_latencies(http, until=None, count=20):
+    """Time index page requests, `count` of them or for as long as `until` is pending"""
+    latencies = []
+    while (until is None and len(latencies) < count) or (until is not None and not until.done()):
+        start = time.perf_counter()
+        response = await http.get("/")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+def test_light_requests_stay_fast_during_heavy_loads(client, workbook_bytes):
+    workbook = workbook_bytes(rows=40_000)
+
+    async def scenario():
+        async with client() as http:
+            idle = await index_latencies(http)
+
+            async def upload():
+                async with client() as uploader:
+                    start = time.perf_counter()
+                    response = await uploader.post("/upload_excel?file_name=heavy.xlsx", content=workbook)
+                    assert response.json()["rows"] == 40_000
+                    return time.perf_counter() - start
+
+            uploads = asyncio.ensure_future(asyncio.gather(*(upload() for _ in range(4))))
+            busy = await index_latencies(http, until=uploads)
+            return idle, busy, await uploads
+
+    idle, busy, upload_times = asyncio.run(scenario())
+
+    # Parsing happens off the event loop, so the index page never waits on it
+    assert len(busy) > 1
+    assert statistics.median(busy) < max(5 * statistics.median(idle), 0.05)
+    assert max(busy) < 0.25 * max(upload_times)
+
+
+def test_saturated_pool_answers_503_with_retry_after(client, workbook_bytes):
+    release = threading.Event()
+    original_limit = main.worker_pool.queue_limit
+    main.worker_pool.queue_limit = 1
+    blocker = main.worker_pool.submit(release.wait)
+    try:
+        async def scenario():
+            async with client() as http:
+                return await http.post("/upload_excel?file_name=small.xlsx", content=workbook_bytes(rows=8))
+
+        response = asyncio.run(scenario())
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(main.WORKER_RETRY_AFTER)
+    finally:
+        release.set()
+        blocker.result()
+        main.worker_pool.queue_limit = original_limit
+
+
+def test_refused_upload_leaves_no_temp_file_behind(client, workbook_bytes):
+    release = threading.Event()
+    original_limit, original_spool = main.worker_pool.queue_limit, main.UPLOAD_SPOOL_MAX_BYTES
+    main.worker_pool.queue_limit = 1
+    main.UPLOAD_SPOOL_MAX_BYTES = 1024  # spill even a small upload to disk
+    blocker = main.worker_pool.submit(release.wait)
+    before = set(os.listdir(main.UPLOAD_DIR))
+    try:
+        async def scenario():
+            async with client() as http:
+                return await http.post("/upload_excel?file_name=spilled.xlsx", content=workbook_bytes(rows=500))
+
+        assert asyncio.run(scenario()).status_code == 503
+        assert set(os.listdir(main.UPLOAD_DIR)) == before
+    finally:
+        release.set()
+        blocker.result()
+        main.worker_pool.queue_limit = original_limit
+        main.UPLOAD_SPOOL_MAX_BYTES = original_spool
+
+
+def test_all_sheets_load_parses_every_sheet_in_worker_processes(client, sheets_workbook_bytes):
+    async def scenario():
+        async with client() as http:
+            response = await http.post(
+                "/upload_excel?file_name=multi.xlsx&all_sheets=1", content=sheets_workbook_bytes([50] * 4)
+            )
+            return response.json()
+
+    result = asyncio.run(scenario())
+    assert result["rows"] == 50
+    assert [sheet["rows"] for sheet in result["sheets"]] == [50] * 4
+
+    workbook = next(w for w in main.dataset_store._datasets.values() if w.content_hash == result["content_hash"])
+    assert sorted(workbook.datasets) == [f"Sheet {i}" for i in range(4)]
+    assert all(dataset.read_info.get("process") for dataset in workbook.datasets.values())
+    assert workbook.datasets["Sheet 3"].df["sheet"].unique().to_list() == ["Sheet 3"]
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import main
+
+
+def test_store_evicts_the_least_recently_used_past_its_budget():
+    discarded = []
+    store = main.DatasetStore(100, on_discard=discarded.append)
+    a, b, c = (SimpleNamespace(name=name, size=40) for name in "abc")
+    store.put("a", a)
+    store.put("b", b)
+    assert store.get("a") is a
+    assert store.get("missing") is None
+
+    store.put("c", c)
+    assert discarded == [b]
+    assert store.get("b") is None
+    assert store.stats() == {"datasets": 2, "total_bytes": 80, "budget_bytes": 100,
+                             "hits": 1, "misses": 2, "evictions": 1}
+
+
+def test_store_replaces_and_remeasures_workbooks():
+    discarded = []
+    store = main.DatasetStore(100, on_discard=discarded.append)
+    old, new, other = SimpleNamespace(size=30), SimpleNamespace(size=50), SimpleNamespace(size=20)
+    store.put("a", old)
+    store.put("a", new)
+    store.put("b", other)
+    assert discarded == [old]
+    assert store.stats()["total_bytes"] == 70
+
+    # More sheets parsed: "b" grows past the budget, and the older "a" goes
+    other.size = 90
+    store.refresh("b")
+    assert discarded == [old, new]
+    assert (store.stats()["total_bytes"], store.stats()["evictions"]) == (90, 1)
+
+    # The most recently used workbook stays even on its own past the budget
+    other.size = 500
+    store.refresh("b")
+    assert store.get("b") is other
+    assert store.stats()["total_bytes"] == 500
+
+
+def test_evicted_sessions_are_restored_from_the_parse_cache_until_it_is_gone(monkeypatch, client, workbook_bytes):
+    async def scenario():
+        async with client() as http, client() as other:
+            loaded = (await http.post("/upload_excel?file_name=evicted.xlsx", content=workbook_bytes(rows=10))).json()
+            # Another session's upload pushes this one out of a store with no budget
+            monkeypatch.setattr(main.dataset_store, "budget_bytes", 0)
+            await other.post("/upload_excel?file_name=other.xlsx", content=workbook_bytes(rows=5))
+            restored = await http.post("/export_data", json={"format": "csv"})
+
+            await other.post("/upload_excel?file_name=other.xlsx", content=workbook_bytes(rows=6))
+            os.unlink(os.path.join(main.parse_cache.directory, f"{loaded['content_hash']}.json"))
+            expired = await http.post("/export_data", json={"format": "csv"})
+            return restored, expired
+
+    restored, expired = asyncio.run(scenario())
+    assert restored.status_code == 200
+    assert restored.text.count("\n") == 11
+    assert expired.status_code == 410
+    assert expired.json()["expired"] is True
+
+
+def test_sessions_that_never_loaded_get_no_expiry_answer(client):
+    async def scenario():
+        async with client() as http:
+            return await http.post("/export_data", json={"format": "csv"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert "expired" not in response.json()
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+
+import pytest
+
+import main
+
+KEY = (1, "csv", "{}")
+
+
+def test_concurrent_builders_of_one_key_are_counted_once(tmp_path):
+    cache = main.ExportCache(str(tmp_path), max_bytes=1024 * 1024)
+    partials = []
+    a_started, release_a = threading.Event(), threading.Event()
+    b_writing, release_b = threading.Event(), threading.Event()
+
+    def failing_write(partial):
+        a_started.set()
+        release_a.wait()
+        raise OSError("disk full")
+
+    def slow_write(partial):
+        partials.append(partial)
+        b_writing.set()
+        release_b.wait()
+        with open(partial, "wb") as f:
+            f.write(b"x" * 100)
+
+    def write(partial):
+        partials.append(partial)
+        with open(partial, "wb") as f:
+            f.write(b"x" * 100)
+
+    def run(write):
+        try:
+            cache.open(KEY, write).close()
+        except OSError:
+            pass
+
+    # A's build fails while B waits on its build lock; B then rebuilds, and C arrives meanwhile
+    a = threading.Thread(target=run, args=(failing_write,))
+    a.start()
+    a_started.wait()
+    b = threading.Thread(target=run, args=(slow_write,))
+    b.start()
+    time.sleep(0.05)
+    release_a.set()
+    a.join()
+    assert b_writing.wait(5)
+    run(write)
+    release_b.set()
+    b.join()
+
+    assert len(partials) == 2 and partials[0] != partials[1]
+    assert cache.stats()["files"] == 1
+    assert cache.stats()["total_bytes"] == 100
+    assert not any(name.endswith(".partial") for name in os.listdir(cache.directory))
+
+
+def test_cached_exports_are_built_once_and_evicted_by_size(tmp_path):
+    cache = main.ExportCache(str(tmp_path), max_bytes=250)
+    builds = []
+
+    def write(partial):
+        builds.append(partial)
+        with open(partial, "wb") as f:
+            f.write(b"x" * 100)
+
+    for version in (1, 2, 1, 3):
+        with cache.open((version, "csv", "{}"), write) as handle:
+            assert handle.read() == b"x" * 100
+
+    stats = cache.stats()
+    assert (len(builds), stats["hits"], stats["misses"]) == (3, 1, 3)
+    # Version 2 was the least recently used once version 3 pushed the total past 250 bytes
+    assert (stats["files"], stats["total_bytes"], stats["evictions"]) == (2, 200, 1)
+
+
+def test_a_failed_build_leaves_nothing_behind(tmp_path):
+    cache = main.ExportCache(str(tmp_path), max_bytes=1024)
+
+    def write(partial):
+        with open(partial, "wb") as f:
+            f.write(b"half")
+        raise ValueError("bad options")
+
+    with pytest.raises(ValueError):
+        cache.open(KEY, write)
+    assert os.listdir(cache.directory) == []
+    assert cache.stats()["total_bytes"] == 0
@@ -0,0 +1,37 @@
+import asyncio
+import io
+
+import polars as pl
+
+
+def test_export_writes_only_the_requested_view_with_writer_options(client, workbook_bytes):
+    df = pl.DataFrame({
+        "id": range(300),
+        "dept": [["Sales", "R&D", "Ops"][i % 3] for i in range(300)],
+        "salary": [30_000 + i for i in range(300)],
+    })
+
+    async def scenario():
+        async with client() as http:
+            await http.post("/upload_excel?file_name=staff.xlsx", content=workbook_bytes(df))
+            parquet = await http.post("/export_data", json={
+                "format": "parquet",
+                "columns": ["id", "salary"],
+                "filters": [{"column": "dept", "op": "equals", "value": "R&D"}],
+                "sort": [{"column": "salary", "descending": True}],
+                "compression": "zstd",
+                "compression_level": 10,
+                "row_group_size": 25,
+            })
+            csv = await http.post("/export_data", json={"format": "csv", "separator": ";", "columns": ["id", "dept"]})
+            invalid = await http.post("/export_data", json={"format": "csv", "row_group_size": 10})
+            return parquet, csv, invalid.json()
+
+    parquet, csv, invalid = asyncio.run(scenario())
+
+    exported = pl.read_parquet(io.BytesIO(parquet.content))
+    expected = df.filter(pl.col("dept") == "R&D").sort("salary", descending=True).select("id", "salary")
+    assert exported.equals(expected)
+
+    assert csv.text.splitlines()[:2] == ["id;dept", "0;Sales"]
+    assert "row_group_size does not apply to csv" in invalid["error"]
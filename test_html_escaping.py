@@ -0,0 +1,37 @@
+import asyncio
+
+import polars as pl
+
+import main
+
+PAYLOAD = '<script>alert("x")</script> & &lt;'
+ESCAPED = '&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt; &amp; &amp;lt;'
+
+
+def test_cells_and_headers_are_escaped():
+    df = pl.DataFrame({
+        '<b>"name"</b>': [PAYLOAD, None],
+        "tag": pl.Series([PAYLOAD, "plain"], dtype=pl.Categorical),
+        "n": [1, 2],
+    })
+    table = main.polars_to_html_table(df)
+    assert "<script>" not in table and "<b>" not in table
+    assert "<th>&lt;b&gt;&quot;name&quot;&lt;/b&gt;</th>" in table
+    assert f"<tr><td>{ESCAPED}</td><td>{ESCAPED}</td><td>1</td></tr>" in table
+    assert "<tr><td></td><td>plain</td><td>2</td></tr>" in table
+
+
+def test_rows_pages_and_query_results_are_escaped(client, workbook_bytes):
+    workbook = workbook_bytes({"text": [PAYLOAD, "safe"]})
+
+    async def scenario():
+        async with client() as http:
+            loaded = await http.post("/upload_excel?file_name=xss.xlsx", content=workbook)
+            rows = await http.get("/rows?offset=0&limit=10")
+            query = await http.post("/query", json={"search": "alert"})
+            return loaded.json(), rows.json(), query.json()
+
+    loaded, rows, query = asyncio.run(scenario())
+    for html in (loaded["html"], rows["html"], query["html"]):
+        assert "<script>" not in html
+        assert f"<td>{ESCAPED}</td>" in html
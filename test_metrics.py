@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import re
+from types import SimpleNamespace
+
+import main
+
+
+def test_load_reports_stage_timings_and_metrics(client, workbook_bytes):
+    workbook = workbook_bytes({"id": range(30), "name": [f"row {i}" for i in range(30)]})
+
+    async def scenario():
+        async with client() as http:
+            upload = await http.post("/upload_excel?file_name=timed.xlsx", content=workbook)
+            export = await http.post("/export_data", json={"format": "csv"})
+            return upload, export, await http.get("/metrics")
+
+    upload, export, scrape = asyncio.run(scenario())
+
+    stages = [entry.split(";")[0] for entry in upload.headers["Server-Timing"].split(", ")]
+    assert stages[:3] == ["receive", "sheets", "parse"]
+    assert "render" in stages and stages[-1] == "total"
+    assert "export" in export.headers["Server-Timing"]
+
+    text = scrape.text
+    assert re.search(r'^lsp_requests_total\{route="/upload_excel",status="200"\} [1-9]', text, re.M)
+    assert re.search(r'^lsp_stage_seconds_count\{route="/upload_excel",stage="parse"\} [1-9]', text, re.M)
+    assert re.search(r'^lsp_request_bytes_total\{route="/upload_excel"\} [1-9]', text, re.M)
+    assert re.search(r'^lsp_sheets_parsed_total\{engine="\S+",format="xlsx"\} [1-9]', text, re.M)
+
+
+def test_rejected_requests_are_timed_and_counted(client, workbook_bytes):
+    async def scenario():
+        async with client() as http:
+            rejected = [
+                await http.post("/sheet", json={"name": "Sheet1"}),
+                await http.post("/export_data", json={"format": "csv"}),
+                await http.post("/upload_excel"),
+                await http.post("/upload_excel?file_name=empty.xlsx"),
+                await http.post("/upload/complete", json={"chunks": []}),
+                await http.post("/upload/complete?file_name=chunked.xlsx", json={"chunks": ["nope"]}),
+                await http.post("/upload/complete?file_name=chunked.xlsx", json={"chunks": []}),
+                await http.post("/load_excel", json={"file_name": "missing.xlsx"}),
+            ]
+            await http.post("/upload_excel?file_name=loaded.xlsx", content=workbook_bytes(rows=5))
+            rejected += [
+                await http.post("/sheet", json={"name": "Nope"}),
+                await http.post("/export_data", json={"format": "docx"}),
+                await http.post("/export_data", json={"format": "csv", "columns": ["nope"]}),
+            ]
+            return rejected, (await http.get("/metrics")).text
+
+    rejected, text = asyncio.run(scenario())
+    # Only timed_response sets Server-Timing, so every early error went through it
+    for response in rejected:
+        assert "error" in response.json()
+        assert "total;dur=" in response.headers["Server-Timing"]
+    assert re.search(r'^lsp_requests_total\{route="/upload/complete",status="400"\} [1-9]', text, re.M)
+
+
+def test_background_failures_are_logged_and_counted(monkeypatch, caplog):
+    def unreadable(name):
+        raise main.WorkbookReadError("no engine could read it")
+
+    def failing_export(dataset, export_format):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(main, "metrics", main.Metrics(main.METRICS_BUCKETS))
+    monkeypatch.setattr(main, "EXPORT_PREBUILD_FORMATS", ["csv", "json"])
+    monkeypatch.setattr(main, "open_export", failing_export)
+    with caplog.at_level(logging.WARNING, logger="lsp"):
+        main.prefetch_sheet(SimpleNamespace(load_sheet=unreadable), "Sheet2", None)
+        main.prebuild_exports(None)
+
+    assert "Prefetching sheet 'Sheet2' failed: no engine could read it" in caplog.messages
+    assert "Prebuilding json export failed: disk full" in caplog.messages
+    text = main.metrics.render()
+    assert re.search(r'^lsp_background_failures_total\{job="prefetch"\} 1$', text, re.M)
+    assert re.search(r'^lsp_background_failures_total\{job="export-prebuild"\} 2$', text, re.M)
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def make_workbook(workbook_bytes):
+    def make(num_rows, label):
+        return workbook_bytes({"id": range(num_rows), "label": [label] * num_rows})
+    return make
+
+
+def test_evicted_session_is_restored_from_the_parse_cache(client, make_workbook):
+    original_budget = main.dataset_store.budget_bytes
+    main.dataset_store.budget_bytes = 1
+    try:
+        async def scenario():
+            async with client() as first, client() as second:
+                loaded = await first.post("/upload_excel?file_name=first.xlsx", content=make_workbook(300, "first"))
+                # Only the most recent workbook fits the budget, so this evicts the first one
+                await second.post("/upload_excel?file_name=second.xlsx", content=make_workbook(10, "second"))
+                rows = await first.get("/rows?offset=250&limit=100")
+                return loaded.json(), rows
+
+        loaded, rows = asyncio.run(scenario())
+    finally:
+        main.dataset_store.budget_bytes = original_budget
+
+    assert loaded["reader"]["engine"] != "ipc-cache"
+    assert rows.status_code == 200
+    assert rows.json()["rows"] == 300
+    assert rows.json()["html"].count("<tr>") == 50
+
+    workbook = next(w for w in main.dataset_store._datasets.values() if w.content_hash == loaded["content_hash"])
+    assert workbook.source is None
+    assert workbook.active.read_info["engine"] == "ipc-cache"
+
+
+def test_reopening_a_file_maps_the_cached_sheet_instead_of_parsing(client, make_workbook):
+    workbook = make_workbook(100, "again")
+
+    async def scenario():
+        async with client() as http:
+            first = await http.post("/upload_excel?file_name=again.xlsx", content=workbook)
+            second = await http.post("/upload_excel?file_name=again.xlsx", content=workbook)
+            return first.json(), second.json()
+
+    first, second = asyncio.run(scenario())
+    assert first["reader"]["engine"] != "ipc-cache"
+    assert second["reader"]["engine"] == "ipc-cache"
+    assert second["html"] == first["html"]
+
+
+def test_cache_directories_are_private_to_the_server_user(tmp_path):
+    created = main.private_directory(str(tmp_path / "new"))
+    assert os.stat(created).st_mode & 0o777 == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o755)
+    main.private_directory(str(shared))
+    assert os.stat(shared).st_mode & 0o777 == 0o700
+
+    if os.getuid() == 0:
+        foreign = tmp_path / "foreign"
+        foreign.mkdir(mode=0o700)
+        os.chown(foreign, 12345, 12345)
+        with pytest.raises(PermissionError):
+            main.private_directory(str(foreign))
@@ -0,0 +1,65 @@
+import asyncio
+import datetime
+import decimal
+
+import polars as pl
+
+import main
+
+
+def profile_of(df):
+    return {column["name"]: column for column in main.dataset_profile(main.Dataset(df, None, "Sheet1"))["columns"]}
+
+
+def test_decimal_columns_are_profiled_as_numbers():
+    amount = profile_of(pl.DataFrame({"amount": [decimal.Decimal("1.50"), decimal.Decimal("2.25"), None]}))["amount"]
+    assert (amount["nulls"], amount["distinct"], amount["min"], amount["max"]) == (1, 2, 1.5, 2.25)
+    assert amount["mean"] == 1.875
+    assert sum(bin["count"] for bin in amount["histogram"]) == 2
+
+
+def test_nulls_are_not_counted_as_distinct_values():
+    columns = profile_of(pl.DataFrame({
+        "empty": pl.Series([None, None, None], dtype=pl.Int64),
+        "day": [datetime.date(2024, 1, 1), None, datetime.date(2024, 1, 1)],
+        "label": ["a", None, "a"],
+    }))
+    assert [columns[name]["distinct"] for name in ("empty", "day", "label")] == [0, 1, 1]
+    assert columns["empty"]["nulls"] == 3
+    assert (columns["empty"]["min"], columns["empty"]["mean"], columns["empty"]["histogram"]) == (None, None, [])
+
+
+def test_empty_frames_profile_without_values():
+    columns = profile_of(pl.DataFrame({"n": pl.Series([], dtype=pl.Int64), "s": pl.Series([], dtype=pl.String)}))
+    assert (columns["n"]["distinct"], columns["n"]["histogram"]) == (0, [])
+    assert (columns["s"]["distinct"], columns["s"]["top_values"]) == (0, [])
+    assert main.dataset_profile(main.Dataset(pl.DataFrame(), None, "Sheet1"))["columns"] == []
+
+
+def test_profiles_are_computed_once_per_dataset_version(monkeypatch, client, workbook_bytes):
+    calls = []
+    profile_exprs = main.profile_exprs
+    monkeypatch.setattr(main, "profile_exprs", lambda schema: calls.append(schema) or profile_exprs(schema))
+
+    async def scenario():
+        async with client() as http:
+            await http.post("/upload_excel?file_name=profiled.xlsx", content=workbook_bytes(rows=10))
+            first = (await http.get("/profile")).json()
+            again = (await http.get("/profile")).json()
+            await http.post("/upload_excel?file_name=profiled.xlsx", content=workbook_bytes(rows=20))
+            reloaded = (await http.get("/profile")).json()
+            return first, again, reloaded
+
+    first, again, reloaded = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert again == first
+    assert (first["rows"], reloaded["rows"]) == (10, 20)
+    assert {column["name"]: column["distinct"] for column in first["columns"]} == {"id": 10, "name": 10, "score": 10}
+
+
+def test_profile_without_data_is_an_error(client):
+    async def scenario():
+        async with client() as http:
+            return (await http.get("/profile")).json()
+
+    assert "error" in asyncio.run(scenario())
@@ -0,0 +1,55 @@
+import asyncio
+
+import polars as pl
+
+import main
+
+
+def test_preview_matches_the_engine_on_its_rows(workbook_bytes):
+    workbook = workbook_bytes(rows=3_000)
+    preview = main.read_xlsx_preview(workbook, "Sheet1", 100)
+    full, _ = main.read_workbook(workbook)
+    assert preview.equals(full.head(100))
+
+
+def test_preview_starts_at_the_first_used_cell_like_the_engine(workbook_bytes):
+    workbook = workbook_bytes({"id": range(200), "name": [f"n{i}" for i in range(200)]},
+                              worksheet="Offset", position="B3")
+    preview = main.read_xlsx_preview(workbook, "Offset", 50)
+    full, _ = main.read_workbook(workbook, "Offset")
+    assert preview.columns == full.columns == ["id", "name"]
+    assert preview.equals(full.head(50))
+
+
+def test_preview_answers_first_and_the_full_sheet_follows(client, workbook_bytes):
+    num_rows = 3 * main.PREVIEW_ROWS
+
+    async def scenario():
+        async with client() as http:
+            loaded = await http.post("/upload_excel?file_name=progressive.xlsx&preview=1",
+                                     content=workbook_bytes(rows=num_rows))
+            # Queued behind the full parse, so the export holds every row, not the preview's
+            exported = await http.post("/export_data", json={"format": "csv"})
+            status = await http.get("/load_status")
+            return loaded.json(), exported, status.json()
+
+    loaded, exported, status = asyncio.run(scenario())
+    assert loaded["loading"] is True
+    assert loaded["rows"] == main.PREVIEW_ROWS
+    assert loaded["reader"]["engine"] == "preview"
+    assert pl.read_csv(exported.content).height == num_rows
+    assert status["loading"] is False
+    assert status["rows"] == num_rows
+    assert [sheet["rows"] for sheet in status["sheets"]] == [num_rows]
+
+
+def test_short_sheets_are_parsed_in_full_at_once(client, workbook_bytes):
+    async def scenario():
+        async with client() as http:
+            response = await http.post("/upload_excel?file_name=short.xlsx&preview=1",
+                                       content=workbook_bytes(rows=50))
+            return response.json()
+
+    result = asyncio.run(scenario())
+    assert result["loading"] is False
+    assert result["rows"] == 50
@@ -0,0 +1,116 @@
+import datetime
+
+import polars as pl
+import pytest
+
+import main
+
+
+@pytest.fixture
+def df():
+    return pl.DataFrame({
+        "id": [1, 2, 3, 4, 5],
+        "name": ["Alpha", "beta", None, "Gamma", "alphabet"],
+        "score": [2.5, None, 1.0, 2.5, 9.0],
+        "day": [datetime.date(2024, 1, d) for d in (3, 1, 2, 5, 4)],
+    })
+
+
+def matches(df, **data):
+    """Row positions a /query request body selects, in display order"""
+    return main.compile_query(df, main.query_spec(data)).collect().to_series().to_list()
+
+
+def test_equals_casts_the_value_to_the_column_dtype(df):
+    assert matches(df, filters=[{"column": "id", "op": "equals", "value": "2"}]) == [1]
+    assert matches(df, filters=[{"column": "score", "op": "equals", "value": 2.5}]) == [0, 3]
+    assert matches(df, filters=[{"column": "day", "op": "equals", "value": "2024-01-04"}]) == [4]
+    # A value that does not cast matches nothing instead of failing
+    assert matches(df, filters=[{"column": "id", "op": "equals", "value": "two"}]) == []
+
+
+def test_range_is_inclusive_and_either_bound_is_optional(df):
+    assert matches(df, filters=[{"column": "id", "op": "range", "min": 2, "max": "4"}]) == [1, 2, 3]
+    assert matches(df, filters=[{"column": "score", "op": "range", "min": 2.5}]) == [0, 3, 4]
+    assert matches(df, filters=[{"column": "day", "op": "range", "max": "2024-01-02"}]) == [1, 2]
+    assert matches(df, filters=[{"column": "id", "op": "range"}]) == [0, 1, 2, 3, 4]
+
+
+def test_contains_is_a_case_insensitive_substring_and_regex_is_not(df):
+    assert matches(df, filters=[{"column": "name", "op": "contains", "value": "ALPHA"}]) == [0, 4]
+    assert matches(df, filters=[{"column": "name", "op": "regex", "value": "^[A-Z]"}]) == [0, 3]
+    # Non-string columns are matched on their text
+    assert matches(df, filters=[{"column": "score", "op": "contains", "value": ".5"}]) == [0, 3]
+
+
+def test_filters_and_search_all_apply(df):
+    assert matches(df, search=" ALPHA ") == [0, 4]
+    assert matches(df, search="2024-01-05") == [3]
+    assert matches(df, search="alpha", filters=[{"column": "id", "op": "range", "min": 2}]) == [4]
+
+
+def test_sort_keeps_nulls_last_in_both_directions(df):
+    assert matches(df, sort=[{"column": "score"}]) == [2, 0, 3, 4, 1]
+    assert matches(df, sort=[{"column": "score", "descending": True}]) == [4, 0, 3, 2, 1]
+    assert matches(df, sort=[{"column": "name"}]) == [0, 3, 4, 1, 2]
+
+
+def test_sort_ties_keep_sheet_order_or_fall_to_the_next_key(df):
+    assert matches(df, sort=[{"column": "score", "descending": True}])[1:3] == [0, 3]
+    assert matches(df, sort=[{"column": "score", "descending": True},
+                             {"column": "day", "descending": True}]) == [4, 3, 0, 2, 1]
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"filters": [{"column": "missing", "op": "equals", "value": 1}]}, "Unknown column: missing"),
+    ({"sort": [{"column": "missing"}]}, "Unknown column: missing"),
+    ({"filters": [{"column": "id", "op": "between", "value": 1}]}, "Unsupported filter: between"),
+    ({"filters": [{"column": "id"}]}, "Unsupported filter: None"),
+])
+def test_unknown_columns_and_ops_raise_query_error(df, data, message):
+    with pytest.raises(main.QueryError, match=message):
+        matches(df, **data)
+
+
+def test_specs_must_be_lists():
+    with pytest.raises(main.QueryError):
+        main.query_spec({"sort": {"column": "id"}})
+
+
+def test_query_cache_reuses_positions_per_dataset_version(monkeypatch, df):
+    cache = main.QueryCache(max_entries=2)
+    dataset = main.Dataset(df, None, "Sheet1")
+    spec = main.query_spec({"sort": [{"column": "score"}]})
+    assert cache.positions(dataset, spec).to_list() == [2, 0, 3, 4, 1]
+
+    # A hit never compiles the plan again, whatever the key order of the spec
+    def fail(*args):
+        raise AssertionError("query compiled again")
+    monkeypatch.setattr(main, "compile_query", fail)
+    reordered = {"search": spec["search"], "filters": spec["filters"], "sort": spec["sort"]}
+    assert cache.positions(dataset, reordered).to_list() == [2, 0, 3, 4, 1]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+    # A new version of the sheet, or an invalidated one, runs the plan again
+    monkeypatch.undo()
+    newer = main.Dataset(df.head(2), None, "Sheet1")
+    assert cache.positions(newer, spec).to_list() == [0, 1]
+    cache.invalidate(dataset.version)
+    assert cache.stats()["entries"] == 1
+    cache.positions(dataset, spec)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 3)
+
+
+def test_query_cache_evicts_the_least_recently_used(df):
+    cache = main.QueryCache(max_entries=2)
+    dataset = main.Dataset(df, None, "Sheet1")
+    specs = [main.query_spec({"search": term}) for term in ("a", "b", "c")]
+    cache.positions(dataset, specs[0])
+    cache.positions(dataset, specs[1])
+    cache.positions(dataset, specs[0])
+    cache.positions(dataset, specs[2])
+    assert cache.stats()["entries"] == 2
+
+    cache.positions(dataset, specs[0])
+    cache.positions(dataset, specs[1])
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 4)
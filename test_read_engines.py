@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+import io
+import zipfile
+
+import polars as pl
+import pytest
+import xlrd
+
+import main
+
+
+def zip_bytes(members):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return output.getvalue()
+
+
+def test_formats_are_sniffed_from_magic_bytes_and_zip_members(tmp_path, workbook_bytes):
+    xlsx = workbook_bytes(rows=3)
+    assert main.sniff_workbook_format(xlsx) == "xlsx"
+    assert main.sniff_workbook_format(zip_bytes({"xl/workbook.bin": b""})) == "xlsb"
+    assert main.sniff_workbook_format(zip_bytes({"mimetype": main.ODS_MIMETYPE, "content.xml": b""})) == "ods"
+    assert main.sniff_workbook_format(main.OLE_MAGIC + b"\x00" * 504) == "xls"
+
+    # Other ZIPs, broken ZIPs and anything else are not workbooks
+    assert main.sniff_workbook_format(zip_bytes({"word/document.xml": b""})) is None
+    assert main.sniff_workbook_format(main.ZIP_MAGIC + b"not really a zip") is None
+    assert main.sniff_workbook_format(b"id,name\n1,a\n") is None
+
+    path = tmp_path / "book.xlsx"
+    path.write_bytes(xlsx)
+    assert main.sniff_workbook_format(str(path)) == "xlsx"
+
+
+def test_non_workbooks_are_refused_before_any_engine_runs(client):
+    with pytest.raises(main.WorkbookReadError, match="Not a recognised Excel workbook"):
+        main.read_workbook(zip_bytes({"word/document.xml": b""}))
+
+    async def scenario():
+        async with client() as http:
+            response = await http.post("/upload_excel?file_name=report.xlsx", content=zip_bytes({"a.txt": b"a"}))
+            return response.json()
+
+    assert "Not a recognised Excel workbook" in asyncio.run(scenario())["error"]
+
+
+def test_engines_are_tried_fastest_first(workbook_bytes):
+    df, read_info = main.read_workbook(workbook_bytes(rows=3))
+    assert (read_info["format"], read_info["engine"], read_info["fallbacks"]) == ("xlsx", "calamine", [])
+    assert read_info["parse_ms"] >= 0
+    assert df.height == 3
+
+
+def test_a_missing_engine_module_is_skipped_and_recorded(monkeypatch, workbook_bytes):
+    monkeypatch.setitem(main.ENGINE_MODULES, "calamine", "no_such_engine_module")
+    df, read_info = main.read_workbook(workbook_bytes(rows=3))
+    assert read_info["engine"] == "openpyxl"
+    assert read_info["fallbacks"] == [{"engine": "calamine", "error": "no_such_engine_module is not installed"}]
+    assert df.columns == ["id", "name", "score"]
+
+
+def test_a_failing_engine_falls_back_to_the_next(monkeypatch, workbook_bytes):
+    read_with_engine = main.read_with_engine
+
+    def flaky(source, engine, sheet_name=None):
+        if engine == "calamine":
+            raise ValueError("corrupt shared strings")
+        return read_with_engine(source, engine, sheet_name)
+    monkeypatch.setattr(main, "read_with_engine", flaky)
+
+    workbook = workbook_bytes(rows=3)
+    df, read_info = main.read_workbook(workbook)
+    assert read_info["engine"] == "openpyxl"
+    assert read_info["fallbacks"] == [{"engine": "calamine", "error": "corrupt shared strings"}]
+    assert df.equals(pl.read_excel(workbook, engine="openpyxl"))
+
+    monkeypatch.setitem(main.ENGINE_MODULES, "openpyxl", "no_such_engine_module")
+    with pytest.raises(main.WorkbookReadError, match="calamine: corrupt shared strings; openpyxl: no_such"):
+        main.read_workbook(workbook)
+
+
+class FakeCell:
+    def __init__(self, ctype, value):
+        self.ctype = ctype
+        self.value = value
+
+
+class FakeSheet:
+    rows = [
+        [FakeCell(xlrd.XL_CELL_TEXT, "id"), FakeCell(xlrd.XL_CELL_TEXT, "when"), FakeCell(xlrd.XL_CELL_TEXT, "note")],
+        [FakeCell(xlrd.XL_CELL_NUMBER, 1.0), FakeCell(xlrd.XL_CELL_DATE, 45000.5), FakeCell(xlrd.XL_CELL_TEXT, "a")],
+        [FakeCell(xlrd.XL_CELL_NUMBER, 2.0), FakeCell(xlrd.XL_CELL_EMPTY, ""), FakeCell(xlrd.XL_CELL_BLANK, "")],
+    ]
+    nrows = len(rows)
+
+    def row(self, i):
+        return self.rows[i]
+
+    def row_values(self, i):
+        return [cell.value for cell in self.rows[i]]
+
+
+class FakeBook:
+    datemode = 0
+
+    def sheet_by_index(self, index):
+        return FakeSheet()
+
+    def sheet_by_name(self, name):
+        if name != "Data":
+            raise xlrd.XLRDError(f"No sheet named <{name!r}>")
+        return FakeSheet()
+
+
+def test_legacy_xls_falls_back_to_xlrd(monkeypatch):
+    # No .xls writer is installed, so xlrd gets a stand-in book; calamine fails on the bytes for real
+    monkeypatch.setattr(xlrd, "open_workbook", lambda *args, **kwargs: FakeBook())
+    source = main.OLE_MAGIC + b"\x00" * 504
+
+    df, read_info = main.read_workbook(source, "Data")
+    assert read_info["format"] == "xls"
+    assert read_info["engine"] == "xlrd"
+    assert [fallback["engine"] for fallback in read_info["fallbacks"]] == ["calamine"]
+    assert df.columns == ["id", "when", "note"]
+    assert df["id"].to_list() == [1.0, 2.0]
+    assert df["when"].to_list() == [datetime.datetime(2023, 3, 15, 12, 0), None]
+    assert df["note"].to_list() == ["a", None]
@@ -0,0 +1,135 @@
+import asyncio
+
+import polars as pl
+import pytest
+
+import main
+
+
+@pytest.fixture
+def make_workbook(workbook_bytes):
+    def make(num_rows, label, extra=False):
+        columns = {"id": range(num_rows), "label": [label] * num_rows}
+        if extra:
+            columns["extra"] = [1.5] * num_rows
+        return workbook_bytes(columns)
+    return make
+
+
+def schema_of(response):
+    return {column["name"]: column["dtype"] for column in response.json()["columns"]}
+
+
+def test_reloading_a_file_name_reuses_its_remembered_schema(client, make_workbook):
+    async def scenario():
+        async with client() as http:
+            first = await http.post("/upload_excel?file_name=remember.xlsx", content=make_workbook(20, "first"))
+            first_schema = schema_of(await http.get("/schema"))
+            second = await http.post("/upload_excel?file_name=remember.xlsx", content=make_workbook(30, "second"))
+            second_schema = schema_of(await http.get("/schema"))
+            return first.json(), first_schema, second.json(), second_schema
+
+    first, first_schema, second, second_schema = asyncio.run(scenario())
+    assert first["reader"]["schema"] == "inferred"
+    assert second["reader"]["schema"] == "remembered"
+    assert second["rows"] == 30
+    assert second_schema == first_schema
+
+
+def test_pinned_dtype_applies_now_and_to_later_loads(client, make_workbook):
+    async def scenario():
+        async with client() as http:
+            await http.post("/upload_excel?file_name=pinned.xlsx", content=make_workbook(10, "first"))
+            pinned = await http.post("/schema/pin", json={"dtypes": {"id": "String"}})
+            await http.post("/upload_excel?file_name=pinned.xlsx", content=make_workbook(12, "second"))
+            return pinned.json(), (await http.get("/schema")).json()
+
+    pinned, schema = asyncio.run(scenario())
+    assert "error" not in pinned
+    assert {column["name"]: (column["dtype"], column["pinned"]) for column in schema["columns"]}["id"] == \
+        ("String", "String")
+
+    workbook = next(w for w in main.dataset_store._datasets.values() if w.file_name == "pinned.xlsx"
+                    and w.active.df.height == 12)
+    assert workbook.active.df["id"].to_list()[:2] == ["0", "1"]
+
+
+def test_changed_header_falls_back_to_inference(client, make_workbook):
+    async def scenario():
+        async with client() as http:
+            await http.post("/upload_excel?file_name=changed.xlsx", content=make_workbook(10, "first"))
+            changed = await http.post("/upload_excel?file_name=changed.xlsx",
+                                      content=make_workbook(10, "second", extra=True))
+            return changed.json()
+
+    changed = asyncio.run(scenario())
+    assert changed["reader"]["schema"] == "inferred"
+    assert changed["columns"] == 3
+
+
+def test_remembered_dtype_never_loses_new_values(client, workbook_bytes):
+    async def scenario():
+        async with client() as http:
+            responses = []
+            for values in ([1, 2, 3], [1.5, 2.7, 3.9], ["x", "2", "3"], [4, 5, 6]):
+                responses.append((await http.post("/upload_excel?file_name=drift.xlsx", content=workbook_bytes({"v": values}))).json())
+            return responses
+
+    ints, floats, text, back = asyncio.run(scenario())
+    assert ints["reader"]["schema"] == "inferred"
+    assert floats["reader"]["schema"] == "remembered"
+    assert floats["reader"]["schema_changed"] == ["v"]
+    assert floats["schema"] == [{"name": "v", "dtype": "Float64"}]
+    assert all(f"<td>{value}</td>" in floats["html"] for value in ("1.5", "2.7", "3.9"))
+    assert text["reader"]["schema_changed"] == ["v"]
+    assert text["schema"] == [{"name": "v", "dtype": "String"}]
+    assert all(f"<td>{value}</td>" in text["html"] for value in ("x", "2", "3"))
+    # Whole numbers in a column remembered as text stay text, so "4" does not become 4.0 or back to Int64
+    assert back["schema"] == [{"name": "v", "dtype": "String"}]
+
+
+def test_pins_never_cast_values_away(client, workbook_bytes):
+    workbook = workbook_bytes({"id": ["a1", "b2", "3"], "v": [1.5, 2.0, 3.0]})
+
+    async def scenario():
+        async with client() as http:
+            await http.post("/upload_excel?file_name=lossy.xlsx", content=workbook)
+            pinned = await http.post("/schema/pin", json={"dtypes": {"id": "Int64", "v": "Int64"}})
+            return pinned.json()
+
+    pinned = asyncio.run(scenario())
+    assert pinned["reader"]["pins_rejected"] == ["id", "v"]
+    assert pinned["schema"] == [{"name": "id", "dtype": "String"}, {"name": "v", "dtype": "Float64"}]
+    assert all(f"<td>{value}</td>" in pinned["html"] for value in ("a1", "b2", "1.5"))
+
+
+def test_pins_hold_for_their_session_and_header_only(client, make_workbook):
+    async def scenario():
+        async with client() as owner, client() as other:
+            await owner.post("/upload_excel?file_name=scoped.xlsx", content=make_workbook(5, "first"))
+            await owner.post("/schema/pin", json={"dtypes": {"id": "String"}})
+            others = await other.post("/upload_excel?file_name=scoped.xlsx", content=make_workbook(5, "first"))
+            again = await owner.post("/upload_excel?file_name=scoped.xlsx", content=make_workbook(6, "first"))
+            changed = await owner.post("/upload_excel?file_name=scoped.xlsx",
+                                       content=make_workbook(6, "first", extra=True))
+            return others.json(), again.json(), changed.json()
+
+    others, again, changed = asyncio.run(scenario())
+    dtypes = [{column["name"]: column["dtype"] for column in result["schema"]}["id"]
+              for result in (others, again, changed)]
+    assert dtypes == ["Int64", "String", "Int64"]
+
+
+def test_pinned_sheets_are_parsed_once(monkeypatch, make_workbook):
+    source = make_workbook(10, "first")
+    main.read_with_schema(source, "once.xlsx", "Sheet1", "owner")
+    main.schema_cache.pin("once.xlsx", "Sheet1", "owner", ["id", "label"], {"id": "Float64"})
+    calls = []
+    read_workbook = main.read_workbook
+    monkeypatch.setattr(main, "read_workbook", lambda *args: calls.append(args) or read_workbook(*args))
+
+    df, read_info = main.read_with_schema(source, "once.xlsx", "Sheet1", "owner")
+    assert len(calls) == 1
+    assert df.schema["id"] == pl.Float64
+    # The remembered schema stays the inferred one, for sessions without the pin
+    assert main.schema_cache.lookup("once.xlsx", "Sheet1")["dtypes"]["id"] == "Int64"
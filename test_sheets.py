@@ -0,0 +1,45 @@
+import asyncio
+
+import main
+
+
+def stored_workbook(content_hash):
+    return next(w for w in main.dataset_store._datasets.values() if w.content_hash == content_hash)
+
+
+def test_sheets_are_listed_from_metadata_and_parsed_when_selected(monkeypatch, client, sheets_workbook_bytes):
+    monkeypatch.setattr(main, "PREFETCH_ADJACENT_SHEETS", False)
+
+    async def scenario():
+        async with client() as http:
+            loaded = await http.post("/upload_excel?file_name=sheets.xlsx", content=sheets_workbook_bytes([30, 10, 20]))
+            parsed_on_load = sorted(stored_workbook(loaded.json()["content_hash"]).datasets)
+            selected = await http.post("/sheet", json={"name": "Sheet 2"})
+            return loaded.json(), parsed_on_load, selected.json()
+
+    loaded, parsed_on_load, selected = asyncio.run(scenario())
+    assert [(sheet["name"], sheet["rows"], sheet["columns"]) for sheet in loaded["sheets"]] == \
+        [("Sheet 0", 30, 2), ("Sheet 1", 10, 2), ("Sheet 2", 20, 2)]
+    assert (loaded["sheet"], loaded["rows"]) == ("Sheet 0", 30)
+    assert parsed_on_load == ["Sheet 0"]
+
+    assert (selected["sheet"], selected["rows"]) == ("Sheet 2", 20)
+    assert "<td>Sheet 2</td>" in selected["html"]
+    assert sorted(stored_workbook(loaded["content_hash"]).datasets) == ["Sheet 0", "Sheet 2"]
+
+
+def test_selecting_a_sheet_prefetches_its_neighbours(client, sheets_workbook_bytes):
+    async def scenario():
+        async with client() as http:
+            loaded = (await http.post("/upload_excel?file_name=prefetch.xlsx",
+                                      content=sheets_workbook_bytes([5, 6, 7, 8, 9]))).json()
+            await http.post("/sheet", json={"name": "Sheet 2"})
+            workbook = stored_workbook(loaded["content_hash"])
+            for _ in range(100):
+                if {"Sheet 1", "Sheet 3"} <= set(workbook.datasets):
+                    break
+                await asyncio.sleep(0.05)
+            return sorted(workbook.datasets)
+
+    # The first sheet was loaded, the selected one parsed, and only those either side of it prefetched
+    assert asyncio.run(scenario()) == ["Sheet 0", "Sheet 1", "Sheet 2", "Sheet 3"]
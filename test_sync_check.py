@@ -0,0 +1,30 @@
+import asyncio
+import hashlib
+
+import main
+
+
+def test_sync_check_matches_the_content_hash_without_parsing(monkeypatch, client, workbook_bytes):
+    workbook = workbook_bytes(rows=10)
+    sha256 = hashlib.sha256(workbook).hexdigest()
+
+    async def scenario():
+        async with client() as http:
+            before = (await http.post("/sync_check", json={"sha256": sha256})).json()
+            loaded = (await http.post("/upload_excel?file_name=synced.xlsx", content=workbook)).json()
+
+            def no_parse(*args):
+                raise AssertionError("sync_check parsed the workbook")
+            monkeypatch.setattr(main, "read_workbook", no_parse)
+            same = (await http.post("/sync_check", json={"sha256": sha256, "size": len(workbook)})).json()
+            # Size and mtime alone never count as a match
+            changed = (await http.post("/sync_check", json={"sha256": "0" * 64, "size": len(workbook)})).json()
+            missing = (await http.post("/sync_check", json={"size": len(workbook)})).json()
+            return before, loaded, same, changed, missing
+
+    before, loaded, same, changed, missing = asyncio.run(scenario())
+    assert loaded["content_hash"] == sha256
+    assert before == {"unchanged": False}
+    assert same == {"unchanged": True}
+    assert changed == {"unchanged": False}
+    assert missing == {"unchanged": False}
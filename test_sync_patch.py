@@ -0,0 +1,130 @@
+import polars as pl
+import pytest
+
+import main
+
+
+def frame(**columns):
+    return pl.DataFrame(columns)
+
+
+def test_key_column_prefers_id_like_names_that_are_unique_and_non_null():
+    old = frame(name=["a", "b", "c"], id=[1, 2, 3], code=["x", "y", "z"])
+    assert main.detect_key_column(old, old) == "id"
+
+    duplicated = frame(name=["a", "b", "c"], id=[1, 1, 3], code=["x", "y", "z"])
+    assert main.detect_key_column(old, duplicated) == "code"
+
+    nulls = frame(name=["a", "b", "c"], id=[1, None, 3], code=["x", "y", None])
+    assert main.detect_key_column(old, nulls) == "name"
+
+    # Floats never key rows, and neither does a first column with duplicates
+    unkeyed = frame(label=["a", "a", "b"], score=[0.5, 1.5, 2.5])
+    assert main.detect_key_column(unkeyed, unkeyed) is None
+
+
+def test_keyed_patch_reports_changed_cells_by_key():
+    old = frame(id=[1, 2, 3], name=["a", "b", "c"])
+    new = frame(id=[1, 2, 3], name=["a", "B", "c"])
+    patch = main.dataset_patch(old, new)
+    assert patch == {"updated": [[1, 1, "B"]], "inserted": [], "deleted": [], "shift_from": None,
+                     "key": "id", "rows": 3}
+
+
+def test_keyed_patch_shifts_from_the_first_insert_or_delete():
+    old = frame(id=[1, 2, 3, 4], name=["a", "b", "c", "d"])
+    new = frame(id=[1, 3, 10, 4], name=["a", "c", "new", "D"])
+    patch = main.dataset_patch(old, new)
+    assert patch["key"] == "id"
+    assert patch["inserted"] == [2]
+    assert patch["deleted"] == [1]
+    assert patch["shift_from"] == 1
+    assert patch["updated"] == [[3, 1, "D"]]
+    assert patch["rows"] == 4
+
+
+def test_keyed_diff_survives_an_insert_at_the_top_where_positions_would_not():
+    old = frame(id=[1, 2, 3], name=["a", "b", "c"])
+    new = frame(id=[0, 1, 2, 3], name=["z", "a", "b", "c"])
+    keyed = main.dataset_patch(old, new)
+    assert (keyed["inserted"], keyed["deleted"], keyed["updated"], keyed["shift_from"]) == ([0], [], [], 0)
+
+    # Every row moved down by one, so a positional diff sees every cell changed
+    positional = main.positional_patch(old, new)
+    assert sorted(cell[:2] for cell in positional["updated"]) == [[0, 0], [0, 1], [1, 0], [1, 1], [2, 0], [2, 1]]
+    assert positional["inserted"] == [3]
+    assert positional["shift_from"] == 3
+
+
+def test_reordered_keys_fall_back_to_a_full_reload():
+    old = frame(id=[1, 2, 3], name=["a", "b", "c"])
+    new = frame(id=[3, 1, 2], name=["c", "a", "b"])
+    assert main.keyed_patch(old, new, "id") is None
+    assert main.dataset_patch(old, new) is None
+
+
+def test_frames_without_a_key_are_diffed_by_position():
+    old = frame(label=["a", "a", "b"], score=[0.5, 1.5, 2.5])
+    grown = frame(label=["a", "x", "b", "c"], score=[0.5, 1.5, 2.5, 3.5])
+    patch = main.dataset_patch(old, grown)
+    assert patch["key"] is None
+    assert patch["updated"] == [[1, 0, "x"]]
+    assert (patch["inserted"], patch["deleted"], patch["shift_from"]) == ([3], [], 3)
+
+    shrunk = frame(label=["a", "a"], score=[0.5, 1.5])
+    patch = main.dataset_patch(old, shrunk)
+    assert (patch["updated"], patch["inserted"], patch["deleted"], patch["shift_from"]) == ([], [], [2], 2)
+
+    assert main.dataset_patch(old, old)["shift_from"] is None
+
+
+def test_an_unknown_key_parameter_falls_back_to_detection():
+    old = frame(id=[1, 2], name=["a", "b"])
+    new = frame(id=[1, 2], name=["a", "c"])
+    assert main.dataset_patch(old, new, key="missing")["key"] == "id"
+    assert main.dataset_patch(old, new, key="name")["key"] == "name"
+
+
+@pytest.mark.parametrize("new", [
+    frame(id=[1, 2], name=["a", "b"], extra=[0, 0]),
+    frame(id=["1", "2"], name=["a", "b"]),
+    frame(key=[1, 2], name=["a", "b"]),
+])
+def test_schema_changes_fall_back_to_a_full_reload(new):
+    assert main.dataset_patch(frame(id=[1, 2], name=["a", "b"]), new) is None
+
+
+@pytest.mark.parametrize("old, new", [
+    # Keyed: three updated rows, or two inserts and a delete
+    (frame(id=[1, 2, 3], name=["a", "b", "c"]), frame(id=[1, 2, 3], name=["A", "B", "C"])),
+    (frame(id=[1, 2, 3], name=["a", "b", "c"]), frame(id=[1, 2, 4, 5], name=["a", "b", "d", "e"])),
+    # Positional: three changed rows, or three appended rows
+    (frame(label=["a", "a", "b"]), frame(label=["x", "y", "z"])),
+    (frame(label=["a", "a"]), frame(label=["a", "a", "b", "b", "c"])),
+])
+def test_patches_past_the_row_limit_fall_back_to_a_full_reload(monkeypatch, old, new):
+    assert main.dataset_patch(old, new) is not None
+    monkeypatch.setattr(main, "PATCH_MAX_ROWS", 2)
+    assert main.dataset_patch(old, new) is None
+
+
+def test_patches_past_the_cell_limit_fall_back_to_a_full_reload(monkeypatch):
+    old = frame(id=[1, 2], a=["a", "a"], b=["b", "b"], c=["c", "c"])
+    new = frame(id=[1, 2], a=["A", "a"], b=["B", "b"], c=["C", "c"])
+    monkeypatch.setattr(main, "PATCH_MAX_CELLS", 3)
+    assert len(main.dataset_patch(old, new)["updated"]) == 3
+
+    monkeypatch.setattr(main, "PATCH_MAX_CELLS", 2)
+    assert main.dataset_patch(old, new) is None
+
+
+def test_a_chosen_key_with_duplicates_or_nulls_is_diffed_by_position():
+    old = frame(x=[1, 1, 2], name=["a", "b", "c"])
+    new = frame(x=[1, 2], name=["a", "c"])
+    patch = main.dataset_patch(old, new, key="x")
+    assert patch["key"] is None
+    assert (patch["deleted"], patch["shift_from"], patch["rows"]) == ([2], 2, 2)
+    assert sorted(cell[:2] for cell in patch["updated"]) == [[1, 0], [1, 1]]
+
+    nulls = frame(x=[1, None, 3], name=["a", "b", "c"])
+    assert main.dataset_patch(nulls, nulls, key="x")["key"] is None
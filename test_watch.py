@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def write_workbook(workbook_bytes):
+    def write(path, values):
+        with open(path, 'wb') as f:
+            f.write(workbook_bytes({"id": range(len(values)), "value": values}))
+    return write
+
+
+def test_watch_hub_reports_content_changes_only(tmp_path, write_workbook):
+    path = str(tmp_path / "shared.xlsx")
+    write_workbook(path, ["a", "b"])
+    hub = main.WatchHub(debounce_ms=50)
+
+    async def scenario():
+        queue = hub.subscribe(os.path.realpath(path), main.file_sha256(path))
+        await asyncio.sleep(0.3)  # let the watcher start
+
+        # Touching the file without changing its content is not a change
+        os.utime(path)
+        try:
+            await asyncio.wait_for(queue.get(), 1)
+            touched = True
+        except asyncio.TimeoutError:
+            touched = False
+
+        write_workbook(path, ["a", "c"])
+        event = await asyncio.wait_for(queue.get(), 5)
+        hub.unsubscribe(os.path.realpath(path), queue)
+        return touched, event
+
+    touched, event = asyncio.run(scenario())
+    assert not touched
+    assert event == {"content_hash": main.file_sha256(path)}
+    assert hub.stats() == {"files": 0, "subscribers": 0}
+
+
+def test_watched_file_syncs_as_a_patch(tmp_path, monkeypatch, client, write_workbook):
+    path = tmp_path / "shared.xlsx"
+    write_workbook(path, ["a", "b", "c"])
+    monkeypatch.setattr(main, "WATCH_ROOTS", [os.path.realpath(tmp_path)])
+
+    async def scenario():
+        async with client() as http:
+            outside = await http.post("/watch", json={"path": str(tmp_path / ".." / "elsewhere.xlsx")})
+            loaded = await http.post("/watch", json={"path": str(path)})
+            unchanged = await http.post("/watch/sync", json={"diff": True})
+            write_workbook(path, ["a", "B", "c"])
+            synced = await http.post("/watch/sync", json={"diff": True})
+            return outside.json(), loaded.json(), unchanged.json(), synced.json()
+
+    outside, loaded, unchanged, synced = asyncio.run(scenario())
+    assert "error" in outside
+    assert loaded["rows"] == 3 and loaded["file_name"] == "shared.xlsx"
+    assert unchanged == {"unchanged": True}
+    assert [cell[:2] for cell in synced["patch"]["updated"]] == [[1, 1]]
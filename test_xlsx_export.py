@@ -0,0 +1,31 @@
+import asyncio
+import datetime
+import io
+
+import polars as pl
+
+import main
+
+
+def test_fast_xlsx_export_streams_and_splits_past_the_row_limit(monkeypatch, client, workbook_bytes):
+    monkeypatch.setattr(main, "XLSX_MAX_DATA_ROWS", 40)
+    monkeypatch.setattr(main, "XLSX_STREAM_BATCH_ROWS", 16)
+    df = pl.DataFrame({
+        "id": range(100),
+        "name": [None if i % 10 == 0 else f"row {i}" for i in range(100)],
+        "day": [datetime.date(2024, 1, 1) + datetime.timedelta(days=i) for i in range(100)],
+        "flag": [i % 2 == 0 for i in range(100)],
+    })
+
+    async def scenario():
+        async with client() as http:
+            await http.post("/upload_excel?file_name=long.xlsx", content=workbook_bytes(df))
+            return await http.post("/export_data", json={"format": "excel_fast"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"] == 'attachment; filename="long_exported.xlsx"'
+
+    sheets = pl.read_excel(io.BytesIO(response.content), sheet_id=0)
+    assert [sheet.height for sheet in sheets.values()] == [40, 40, 20]
+    assert pl.concat(list(sheets.values())).equals(df)